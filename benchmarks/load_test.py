@@ -0,0 +1,585 @@
+# load_test.py
+"""
+End-to-end load test of the scraping workflow against a local stand-in of
+vlaamsparlement.be.
+
+A local HTTP server serves synthetic listing, meeting, question and verslag
+pages (see synthetic_pages.py) with configurable counts, latency, 429/5xx
+rates and slow bodies. The config's base URLs are pointed at it, the normal
+workflow (main.main) runs for the configured commissions in a temporary data
+directory, and the harness reports end-to-end throughput, time per stage and
+the rows produced against the rows the site holds.
+
+With --frontier the crawl goes through the shared frontier instead
+(frontier.py): it is seeded, drained by --workers worker processes and
+merged. Before the workers start, one batch of tasks is leased by a worker
+that never finishes it, so the run only completes when those leases expire
+and are handed out again; with few --retries per request the site's 503s
+reach the frontier's retry with backoff. The report adds the frontier's
+task counts and whether the abandoned tasks were done in the end.
+
+
+    python benchmarks/load_test.py --meetings 1000 --latency 0.05 --error-rate 0.01
+    python benchmarks/load_test.py --meetings 200 --stream --rate 20 --concurrency 16
+    python benchmarks/load_test.py --meetings 200 --frontier --workers 3 --error-rate 0.1 --retries 1
+    python benchmarks/load_test.py --serve --port 8000    # only run the site
+"""
+import argparse
+import functools
+import glob
+import json
+import os
+import multiprocessing
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic_pages  # noqa: E402
+
+LISTING_PATH = "/nl/parlementair-werk/plenaire-vergadering/vergaderingen"
+
+
+class SyntheticSite:
+    """
+    Deterministic model of the site: which meetings each commission has,
+    their agenda items, and the verslag of each item.
+
+    Args:
+        meetings: Meetings per commission
+        agenda_items: Agenda items per meeting
+        speeches: Average speeches per verslag
+        no_verslag_share: Share of questions whose verslag is not published yet
+        page_size: Meetings per listing page (0: all on one page)
+        seed: Seed of all generated content
+    """
+    def __init__(self, meetings=100, agenda_items=4, speeches=20, no_verslag_share=0.1, page_size=0, seed=0):
+        self.meetings = meetings
+        self.agenda_items = agenda_items
+        self.speeches = speeches
+        self.no_verslag_share = no_verslag_share
+        self.page_size = page_size
+        self.seed = seed
+
+    def meeting_ids(self, commission_type):
+        base = (int(commission_type) % 10000) * 10000
+        return [base + number for number in range(self.meetings)]
+
+    def item_ids(self, meeting_id):
+        return [meeting_id * 100 + number for number in range(self.agenda_items)]
+
+    def verslag_id(self, item_id):
+        """The verslag of an agenda item, or None when it is not published yet."""
+        if random.Random(self.seed * 7919 + item_id).random() < self.no_verslag_share:
+            return None
+        return item_id
+
+    def speech_count(self, verslag_id):
+        rng = random.Random(self.seed * 104729 + verslag_id)
+        return max(2, int(self.speeches * rng.uniform(0.5, 1.5)))
+
+    def speeches_for(self, verslag_id):
+        return synthetic_pages.make_speeches(self.speech_count(verslag_id), seed=self.seed + verslag_id)
+
+    # --- Pages ----------------------------------------------------------------
+
+    def listing(self, commission_type, page):
+        meeting_ids = self.meeting_ids(commission_type)
+        if self.page_size:
+            start = page * self.page_size
+            meeting_ids = meeting_ids[start:start + self.page_size]
+            has_next = start + self.page_size < self.meetings
+        else:
+            has_next = False
+        meetings = []
+        for meeting_id in meeting_ids:
+            meeting = synthetic_pages.make_meetings(meeting_id, 1, seed=self.seed + meeting_id)[0]
+            meetings.append(meeting)
+        next_href = None
+        if has_next:
+            next_href = "?type=%s&page=%d" % (commission_type, page + 1)
+        return synthetic_pages.listing_page(meetings, next_href)
+
+    def meeting(self, meeting_id):
+        items = synthetic_pages.make_agenda_items(meeting_id, self.agenda_items, seed=self.seed)
+        return synthetic_pages.meeting_page(meeting_id, items)
+
+    def question(self, item_id):
+        verslag_id = self.verslag_id(item_id)
+        link = synthetic_pages.VERSLAG_PATH % (item_id // 100, verslag_id) if verslag_id else None
+        return synthetic_pages.question_page(item_id, "Vraag om uitleg %d" % item_id, link)
+
+    def verslag(self, meeting_id, verslag_id):
+        return synthetic_pages.verslag_page(meeting_id, verslag_id, "Verslag %d" % verslag_id,
+                                            "donderdag 27 februari 2025", self.speeches_for(verslag_id))
+
+    # --- Expected output ----------------------------------------------------------
+
+    def expected_rows(self, commission_types):
+        """Rows a complete scrape of these commissions produces (speeches after cleaning)."""
+        counts = Counter()
+        for commission_type in commission_types:
+            for meeting_id in self.meeting_ids(commission_type):
+                counts["meetings"] += 1
+                for item_id in self.item_ids(meeting_id):
+                    counts["agenda_items"] += 1
+                    verslag_id = self.verslag_id(item_id)
+                    if verslag_id is None:
+                        continue
+                    counts["speeches"] += sum(1 for speaker, _ in self.speeches_for(verslag_id)
+                                              if speaker != "De voorzitter")
+        return dict(counts)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing pooled keep-alive connections are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class SiteServer:
+    """
+    Threaded HTTP server for a SyntheticSite with injected faults.
+
+    Args:
+        site: The SyntheticSite to serve
+        latency: Mean extra response delay in seconds (exponentially distributed)
+        error_rate: Share of requests answered with a 5xx error
+        throttle_rate: Share of requests answered with 429 and a Retry-After header
+        slow_body_rate: Share of responses whose body trickles in over slow_body_seconds
+        slow_body_seconds: Time over which a slow body is sent
+        seed: Seed of the fault injection
+    """
+    def __init__(self, site, latency=0.0, error_rate=0.0, throttle_rate=0.0, slow_body_rate=0.0,
+                 slow_body_seconds=2.0, port=0, seed=0):
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.slow_body_rate = slow_body_rate
+        self.slow_body_seconds = slow_body_seconds
+        self.stats = Counter()
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._render = functools.lru_cache(maxsize=4096)(self._render_page)
+        self.httpd = _QuietHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:%d" % self.httpd.server_port
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='synthetic-site', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _draw(self):
+        with self._lock:
+            return (self._rng.random(), self._rng.random(), self._rng.random(),
+                    self._rng.expovariate(1 / self.latency) if self.latency else 0.0)
+
+    def _render_page(self, path, query):
+        """Return (page type, body) for a path, or (None, None) when it does not exist."""
+        parts = [part for part in path.split('/') if part]
+        params = parse_qs(query)
+        if path.rstrip('/') == LISTING_PATH:
+            commission_type = params.get('type', ['0'])[0]
+            page = int(params.get('page', ['0'])[0])
+            return 'listing', self.site.listing(commission_type, page)
+        if path.startswith('/nl/parlementair-werk/commissies/commissievergaderingen/'):
+            if len(parts) == 5 and parts[4].isdigit():
+                return 'meeting', self.site.meeting(int(parts[4]))
+            if len(parts) == 7 and parts[5] == 'verslag' and parts[4].isdigit() and parts[6].isdigit():
+                return 'verslag', self.site.verslag(int(parts[4]), int(parts[6]))
+        if path.startswith('/nl/parlementaire-documenten/vragen-en-interpellaties/') and parts[-1].isdigit():
+            return 'question', self.site.question(int(parts[-1]))
+        return None, None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=()):
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                return body
+
+            def do_GET(self):
+                # The scrapers join base URLs and links with a double slash,
+                # which urlsplit would read as a host name
+                url = urlsplit('/' + self.path.lstrip('/'))
+                path = url.path
+                error_draw, throttle_draw, slow_draw, delay = server._draw()
+                if delay:
+                    time.sleep(delay)
+                page_type, body = server._render(path, url.query)
+                if page_type is None:
+                    server._count('404')
+                    self.wfile.write(self._send(404))
+                    return
+                if throttle_draw < server.throttle_rate:
+                    server._count('429', page_type)
+                    self.wfile.write(self._send(429, headers=[('Retry-After', '1')]))
+                    return
+                if error_draw < server.error_rate:
+                    server._count('503', page_type)
+                    self.wfile.write(self._send(503))
+                    return
+                data = body.encode('utf-8')
+                self._send(200, data, headers=[('Cache-Control', 'max-age=0')])
+                server._count('200', page_type, len(data))
+                if slow_draw < server.slow_body_rate:
+                    server._count('slow', page_type)
+                    pieces = 10
+                    size = len(data) // pieces + 1
+                    for start in range(0, len(data), size):
+                        self.wfile.write(data[start:start + size])
+                        self.wfile.flush()
+                        time.sleep(server.slow_body_seconds / pieces)
+                else:
+                    self.wfile.write(data)
+
+        return Handler
+
+    def _count(self, status, page_type='-', size=0):
+        with self._lock:
+            self.stats[status] += 1
+            self.stats["%s %s" % (page_type, status)] += 1
+            self.bytes_sent += size
+
+
+def point_config_at(base_url, data_dir, args):
+    """Point the scraper's config at the local site and a temporary data directory."""
+    import config
+    config.BASE_COMMISSION_URL = (base_url + LISTING_PATH +
+                                  "?period_search=custom&type={commission_id}&start_period={start_date}"
+                                  "&end_period={end_date}")
+    config.BASE_MEETING_URL = base_url + "/nl/parlementair-werk/commissies/commissievergaderingen/"
+    config.BASE_QUESTIONS_URL = base_url + "/nl/parlementaire-documenten/vragen-en-interpellaties/"
+    config.BASE_URL_PREFIX = base_url + "/"
+    config.DATA_DIR = data_dir
+    config.STATE_DIR = os.path.join(data_dir, '.state')
+    config.CACHE_DIR = os.path.join(data_dir, '.cache')
+    config.STORAGE_DB = os.path.join(data_dir, 'commissions.sqlite')
+    config.BACKFILL_DB = os.path.join(config.STATE_DIR, 'backfill.sqlite')
+    config.PARSE_MEMO_DB = os.path.join(config.STATE_DIR, 'parse_memo.sqlite')
+    config.FRONTIER_DB = os.path.join(config.STATE_DIR, 'frontier.sqlite')
+    config.SEARCH_DB = os.path.join(data_dir, 'search.sqlite')
+    config.BLOB_DIR = os.path.join(data_dir, 'blobs')
+    config.COMPACTED_DIR = os.path.join(data_dir, 'compacted')
+    config.METRICS_DIR = os.path.join(data_dir, 'metrics')
+    config.METRICS_TEXTFILE = os.path.join(config.METRICS_DIR, 'scraper.prom')
+    config.CACHE_ENABLED = args.cache
+    config.REQUESTS_PER_SECOND_PER_HOST = args.rate
+    config.MAX_REQUESTS_PER_SECOND_PER_HOST = max(args.rate, args.max_rate or args.rate)
+    # Scale the adaptive rate's bounds and step to the rates of the test
+    config.MIN_REQUESTS_PER_SECOND_PER_HOST = args.rate / 10
+    config.AIMD_RATE_INCREASE = config.MAX_REQUESTS_PER_SECOND_PER_HOST / 20
+    config.ADAPTIVE_RATE = not args.fixed_rate
+    config.RETRY_BACKOFF_BASE = args.backoff
+    config.REQUEST_BURST = args.burst
+    config.MAX_CONCURRENT_REQUESTS = args.concurrency
+    config.HTTP_POOL_SIZE = args.concurrency
+    config.MAX_COMMISSION_WORKERS = args.commission_workers
+    if args.storage:
+        config.STORAGE_BACKEND = args.storage
+    if args.commissions:
+        config.COMMISSIONS = dict(list(config.COMMISSIONS.items())[:args.commissions])
+    if args.retries is not None:
+        config.RETRY_ATTEMPTS = args.retries
+    # Frontier budget, leases and retries on the time scale of the test
+    config.FRONTIER_REQUESTS_PER_SECOND = config.MAX_REQUESTS_PER_SECOND_PER_HOST
+    config.FRONTIER_LEASE_SECONDS = args.lease_seconds
+    config.FRONTIER_RETRY_DELAY = args.backoff
+    config.FRONTIER_IDLE_SECONDS = 0.1
+    return config
+
+
+class StageTimer:
+    """Times calls of the workflow's stage functions (total seconds and calls per stage)."""
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, module, name, stage):
+        function = getattr(module, name)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - started
+                    self.calls[stage] += 1
+        setattr(module, name, timed)
+
+
+def frontier_worker(base_url, data_dir, args, worker_id):
+    """
+    Run one frontier worker against the site (the target of worker processes).
+
+    Spawned processes start from a fresh config, so the test's settings
+    are applied again before the scraper modules are imported.
+    """
+    point_config_at(base_url, data_dir, args)
+    import frontier
+    return frontier.run_worker(None, worker_id)
+
+
+def run_frontier_crawl(args, config, server, data_dir, timer):
+    """
+    Seed the frontier, drain it with worker processes and merge it.
+
+    Returns:
+        dict: Frontier task counts and the lease expiry check
+    """
+    import frontier
+    crawl = frontier.Frontier(config.FRONTIER_DB)
+    started = time.perf_counter()
+    frontier.seed(crawl, full=args.full)
+    timer.seconds['seed'] += time.perf_counter() - started
+    timer.calls['seed'] += 1
+
+    # A worker that dies right after leasing: its tasks must come back once the lease expires
+    abandoned = [task["task_id"] for task in crawl.lease('load-test:abandoned', config.FRONTIER_LEASE_BATCH)]
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=frontier_worker, args=(server.base_url, data_dir, args, 'load-test:%d' % number),
+                               name='frontier-worker-%d' % number)
+               for number in range(args.workers)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    timer.seconds['workers'] += time.perf_counter() - started
+    timer.calls['workers'] += len(workers)
+
+    stats = crawl.stats()
+    open_tasks = crawl.open_tasks()
+    done = {task["task_id"] for commission, run_date in crawl.mergeable_runs()
+            for task in crawl.results(commission, run_date)}
+    started = time.perf_counter()
+    frontier.merge(crawl)
+    timer.seconds['merge'] += time.perf_counter() - started
+    timer.calls['merge'] += 1
+    crawl.close()
+    return {
+        "tasks": stats["tasks"],
+        "retried": stats["retried"],
+        "failed": sum(counts.get('failed', 0) for counts in stats["tasks"].values()),
+        "open": open_tasks,
+        "workers_failed": sum(process.exitcode != 0 for process in workers),
+        "abandoned": len(abandoned),
+        "abandoned_done": sum(task_id in done for task_id in abandoned),
+    }
+
+
+def count_output_rows(data_dir):
+    counts = Counter()
+    import pandas as pd
+    for meetings_csv in glob.glob(os.path.join(data_dir, '*', '*', '*_meetings.csv')):
+        df = pd.read_csv(meetings_csv)
+        is_agenda = df['data_type'] == 'agenda_item' if 'data_type' in df.columns else pd.Series(False, index=df.index)
+        counts["meetings"] += int((~is_agenda).sum())
+        counts["agenda_items"] += int(is_agenda.sum())
+    for content_csv in glob.glob(os.path.join(data_dir, '*', '*', '*_content.csv')):
+        df = pd.read_csv(content_csv)
+        if 'content_type' in df.columns:
+            counts["speeches"] += int((df['content_type'] == 'speech').sum())
+    return dict(counts)
+
+
+def run_load_test(args):
+    site = SyntheticSite(args.meetings, args.agenda_items, args.speeches, args.no_verslag_share,
+                         args.page_size, args.seed)
+    server = SiteServer(site, args.latency, args.error_rate, args.throttle_rate, args.slow_body_rate,
+                        args.slow_body_seconds, seed=args.seed).start()
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='load_test_')
+    config = point_config_at(server.base_url, data_dir, args)
+
+    # The scraper modules read the config above when they are imported
+    import main
+    import clean_content
+    timer = StageTimer()
+    for name, stage in (('run_initial_scraping', 'listing'), ('run_agenda_scraper', 'agenda'),
+                        ('run_questions_scraper', 'questions'), ('run_speeches_scraper', 'speeches'),
+                        ('run_streaming_pipeline', 'streaming pipeline'), ('clean_content_csv', 'cleaning')):
+        timer.wrap(main, name, stage)
+    del clean_content
+
+    commission_types = [commission["id"] for commission in config.COMMISSIONS.values()]
+    expected = site.expected_rows(commission_types)
+    runs = []
+    frontier_runs = []
+    for run in range(args.runs):
+        requests_before = sum(server.stats[status] for status in ('200', '429', '503', '404'))
+        bytes_before = server.bytes_sent
+        started = time.perf_counter()
+        if args.frontier:
+            frontier_runs.append(run_frontier_crawl(args, config, server, data_dir, timer))
+        else:
+            main.main(full=args.full, streaming=args.stream)
+        elapsed = time.perf_counter() - started
+        requests = sum(server.stats[status] for status in ('200', '429', '503', '404')) - requests_before
+        runs.append({"run": run + 1, "seconds": elapsed, "requests": requests,
+                     "requests_per_sec": requests / elapsed if elapsed else 0.0,
+                     "mb_served": (server.bytes_sent - bytes_before) / 1e6,
+                     # ru_maxrss is in kilobytes on Linux; it includes the synthetic site served in-process
+                     "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+    produced = count_output_rows(data_dir)
+    report = {
+        "parameters": {key: value for key, value in vars(args).items() if key != 'output'},
+        "data_dir": data_dir,
+        "runs": runs,
+        "stages": {stage: {"seconds": round(seconds, 3), "calls": timer.calls[stage]}
+                   for stage, seconds in sorted(timer.seconds.items(), key=lambda item: -item[1])},
+        "server": dict(server.stats),
+        "expected_rows": expected,
+        "produced_rows": produced,
+    }
+    if args.frontier:
+        report["frontier"] = frontier_runs
+    server.stop()
+    return report
+
+
+def print_report(report):
+    print("\n=== Load test ===")
+    for run in report["runs"]:
+        print("Run %(run)d: %(seconds).2fs, %(requests)d requests (%(requests_per_sec).1f req/s), "
+              "%(mb_served).1f MB served, peak RSS %(peak_rss_mb).0f MB" % run)
+    print("\nTime per stage (summed over commissions):")
+    for stage, timing in report["stages"].items():
+        print("  %-20s %9.2fs  (%d calls)" % (stage, timing["seconds"], timing["calls"]))
+    print("\nServer responses:")
+    for key, count in sorted(report["server"].items()):
+        if ' ' not in key:
+            print("  %-8s %d" % (key, count))
+    print("\nRows (produced / on the site):")
+    for kind, expected in report["expected_rows"].items():
+        produced = report["produced_rows"].get(kind, 0)
+        print("  %-14s %8d / %-8d %s" % (kind, produced, expected, "" if produced == expected else "(missing %d)"
+                                          % (expected - produced)))
+    for run, crawl in enumerate(report.get("frontier", []), 1):
+        print("\nFrontier, run %d:" % run)
+        for kind, counts in sorted(crawl["tasks"].items()):
+            print("  %-8s %s" % (kind, ", ".join("%d %s" % (count, state) for state, count in sorted(counts.items()))))
+        print("  %d tasks needed more than one attempt, %d failed, %d still open, %d workers exited with an error"
+              % (crawl["retried"], crawl["failed"], crawl["open"], crawl["workers_failed"]))
+        print("  %d of %d abandoned tasks were done after their lease expired"
+              % (crawl["abandoned_done"], crawl["abandoned"]))
+    print("\nOutput in %s" % report["data_dir"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    site = parser.add_argument_group('synthetic site')
+    site.add_argument('--meetings', type=int, default=100, help="meetings per commission (default: %(default)s)")
+    site.add_argument('--agenda-items', type=int, default=4, help="agenda items per meeting (default: %(default)s)")
+    site.add_argument('--speeches', type=int, default=20, help="average speeches per verslag (default: %(default)s)")
+    site.add_argument('--no-verslag-share', type=float, default=0.1,
+                      help="share of questions without a published verslag (default: %(default)s)")
+    site.add_argument('--page-size', type=int, default=0,
+                      help="meetings per listing page, 0 for a single page (default: %(default)s)")
+    site.add_argument('--latency', type=float, default=0.02, help="mean response delay in seconds (default: %(default)s)")
+    site.add_argument('--error-rate', type=float, default=0.0, help="share of 503 responses (default: %(default)s)")
+    site.add_argument('--throttle-rate', type=float, default=0.0, help="share of 429 responses (default: %(default)s)")
+    site.add_argument('--slow-body-rate', type=float, default=0.0,
+                      help="share of responses with a slow body (default: %(default)s)")
+    site.add_argument('--slow-body-seconds', type=float, default=2.0,
+                      help="time over which a slow body is sent (default: %(default)s)")
+    site.add_argument('--seed', type=int, default=0, help="seed for content and faults (default: %(default)s)")
+    site.add_argument('--port', type=int, default=0, help="port for --serve (default: any free port)")
+    site.add_argument('--serve', action='store_true', help="only serve the site until interrupted")
+
+    scraper = parser.add_argument_group('scraper')
+    scraper.add_argument('--commissions', type=int, help="number of configured commissions to scrape (default: all)")
+    scraper.add_argument('--rate', type=float, default=50.0, help="requests per second per host (default: %(default)s)")
+    scraper.add_argument('--max-rate', type=float,
+                         help="upper bound of the adaptive request rate (default: --rate)")
+    scraper.add_argument('--fixed-rate', action='store_true', help="disable the adaptive rate and concurrency")
+    scraper.add_argument('--backoff', type=float, default=0.5,
+                         help="base of the retry backoff in seconds (default: %(default)s)")
+    scraper.add_argument('--burst', type=int, default=10, help="token bucket burst (default: %(default)s)")
+    scraper.add_argument('--concurrency', type=int, default=8, help="requests in flight (default: %(default)s)")
+    scraper.add_argument('--commission-workers', type=int, default=3,
+                         help="commissions scraped in parallel (default: %(default)s)")
+    scraper.add_argument('--stream', action='store_true', default=None, help="use the streaming pipeline")
+    scraper.add_argument('--storage', choices=('csv', 'sqlite'), help="storage backend (default: config)")
+    scraper.add_argument('--cache', action='store_true', help="enable the HTTP response cache")
+    scraper.add_argument('--full', action='store_true', help="pass --full to the workflow")
+    scraper.add_argument('--retries', type=int, help="retries per request (default: config RETRY_ATTEMPTS)")
+    scraper.add_argument('--frontier', action='store_true', help="crawl through the shared frontier (frontier.py)")
+    scraper.add_argument('--workers', type=int, default=3,
+                         help="--frontier: worker processes (default: %(default)s)")
+    scraper.add_argument('--lease-seconds', type=float, default=3.0,
+                         help="--frontier: task lease duration (default: %(default)s)")
+    scraper.add_argument('--runs', type=int, default=1,
+                         help="consecutive runs on the same data directory (default: %(default)s)")
+    scraper.add_argument('--data-dir', help="data directory (default: a new temporary directory)")
+    scraper.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        site_model = SyntheticSite(args.meetings, args.agenda_items, args.speeches, args.no_verslag_share,
+                                   args.page_size, args.seed)
+        server = SiteServer(site_model, args.latency, args.error_rate, args.throttle_rate, args.slow_body_rate,
+                            args.slow_body_seconds, port=args.port, seed=args.seed)
+        print("Serving the synthetic site on %s (listing: %s%s?type=<commission id>)"
+              % (server.base_url, server.base_url, LISTING_PATH))
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    report = run_load_test(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print("Report saved to %s" % args.output)
+    if args.frontier:
+        # The frontier crawl is a check: every row on the site and every abandoned task must come through
+        complete = all(report["produced_rows"].get(kind, 0) == expected
+                       for kind, expected in report["expected_rows"].items())
+        drained = all(crawl["abandoned_done"] == crawl["abandoned"] and not crawl["open"]
+                      and not crawl["workers_failed"] for crawl in report["frontier"])
+        return 0 if complete and drained else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
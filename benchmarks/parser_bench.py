@@ -0,0 +1,284 @@
+# parser_bench.py
+"""
+Offline micro-benchmark of the page extractors on saved HTML fixtures.
+
+For every fixture under benchmarks/fixtures/<page type>/ and every installed
+parser backend it measures pages/sec, per-page latency percentiles and the
+peak Python memory (tracemalloc) of one extraction, writes the results as
+JSON and optionally compares them with a baseline:
+
+    python benchmarks/parser_bench.py run --output benchmarks/results/parsers.json
+    python benchmarks/parser_bench.py run --baseline benchmarks/results/baseline.json
+    python benchmarks/parser_bench.py fixtures          # regenerate the synthetic fixtures
+    python benchmarks/parser_bench.py record verslag URL [NAME]   # save a real page
+
+The run exits with status 1 when an extractor got slower than the baseline
+by more than --threshold.
+"""
+import argparse
+import gc
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import config  # noqa: E402
+import html_parser  # noqa: E402
+from agenda_scraper import AgendaScraper  # noqa: E402
+from questions_scraper import QuestionsScraper  # noqa: E402
+from scrapers import CommissionScraper  # noqa: E402
+from speeches_scraper import SpeechesScraper  # noqa: E402
+import synthetic_pages  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+PAGE_TYPES = ('listing', 'meeting', 'question', 'verslag')
+
+PAGE_URL = "https://www.vlaamsparlement.be/nl/fixture"
+
+# Every iteration must parse its page, not take the rows from the parse memo
+config.PARSE_MEMO_ENABLED = False
+
+_agenda = AgendaScraper(None, None, config.BASE_MEETING_URL)
+_questions = QuestionsScraper(None, None, config.BASE_QUESTIONS_URL)
+_speeches = SpeechesScraper(None, None, config.BASE_URL_PREFIX)
+
+# Extractor per page type: (name, function of the page bytes returning the extracted rows)
+EXTRACTORS = {
+    'listing': ('CommissionScraper.scrape',
+                lambda content: CommissionScraper(html_parser.parse_html(content, page_type='listing')).scrape()[0]),
+    'meeting': ('AgendaScraper.extract_agenda_items',
+                lambda content: _agenda.extract_agenda_items('1', content)),
+    'question': ('QuestionsScraper.extract_question',
+                 lambda content: [_questions.extract_question('1', PAGE_URL, content)]),
+    'verslag': ('SpeechesScraper.extract_speeches',
+                lambda content: _speeches.extract_speeches(PAGE_URL, content, '1')),
+}
+
+
+def available_backends():
+    backends = ['html.parser']
+    if html_parser.LXML_AVAILABLE:
+        backends.append('lxml')
+    if html_parser.SELECTOLAX_AVAILABLE:
+        backends.append('selectolax')
+    return backends
+
+
+def load_fixtures(page_types=PAGE_TYPES):
+    """Return (page type, fixture name, bytes) for all saved fixtures."""
+    fixtures = []
+    for page_type in page_types:
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, page_type, '*.html'))):
+            with open(path, 'rb') as f:
+                fixtures.append((page_type, os.path.splitext(os.path.basename(path))[0], f.read()))
+    return fixtures
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def measure(extract, content, min_time, min_iterations, warmup=3):
+    """Time repeated extractions of one page and measure the peak memory of one."""
+    for _ in range(warmup):
+        rows = extract(content)
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_iterations or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        extract(content)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    extract(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "rows": len(rows),
+        "iterations": len(latencies),
+        "pages_per_sec": len(latencies) / total,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_benchmarks(backends, page_types, min_time, min_iterations):
+    results = []
+    fixtures = load_fixtures(page_types)
+    if not fixtures:
+        raise SystemExit("No fixtures found under %s (run the 'fixtures' command first)" % FIXTURES_DIR)
+    configured_backend = config.HTML_PARSER
+    try:
+        for backend in backends:
+            # The scrapers parse with the configured backend
+            config.HTML_PARSER = backend
+            for page_type, name, content in fixtures:
+                extractor, extract = EXTRACTORS[page_type]
+                result = measure(extract, content, min_time, min_iterations)
+                result.update({"extractor": extractor, "page_type": page_type, "fixture": name,
+                               "backend": backend, "page_kib": len(content) / 1024})
+                results.append(result)
+                print("%-36s %-20s %-11s %4d rows %9.1f pages/s  p50 %8.3f ms  p90 %8.3f ms  p99 %8.3f ms  peak %8.1f KiB"
+                      % (extractor, name, backend, result["rows"], result["pages_per_sec"], result["p50_ms"],
+                         result["p90_ms"], result["p99_ms"], result["peak_kib"]))
+    finally:
+        config.HTML_PARSER = configured_backend
+    return results
+
+
+def result_key(result):
+    return "%s/%s/%s" % (result["page_type"], result["fixture"], result["backend"])
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Print the change of every result against the baseline; return the regressions."""
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    print("\nCompared with baseline from %s:" % baseline.get("created", "?"))
+    for result in results:
+        key = result_key(result)
+        before = previous.get(key)
+        if before is None:
+            print("  %-44s new" % key)
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        memory_change = result["peak_kib"] / before["peak_kib"] - 1 if before["peak_kib"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(key)
+        elif change < -threshold:
+            flag = "  faster"
+        print("  %-44s p50 %+7.1f%%  peak memory %+7.1f%%%s" % (key, change * 100, memory_change * 100, flag))
+    return regressions
+
+
+def command_run(args):
+    # Keep extractor warnings out of the timings output
+    logging.getLogger().setLevel(logging.ERROR)
+    backends = args.backend or available_backends()
+    page_types = args.page_type or PAGE_TYPES
+    results = run_benchmarks(backends, page_types, args.min_time, args.min_iterations)
+
+    report = {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "min_time": args.min_time,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("\nResults saved to %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print("\n%d extractor(s) slower than the baseline by more than %.0f%%"
+                  % (len(regressions), args.threshold * 100))
+            return 1
+    return 0
+
+
+def command_fixtures(args):
+    """Write the synthetic fixture corpus (pages following the real site's markup)."""
+    pages = {
+        ('listing', 'listing_20'): synthetic_pages.listing_page(
+            synthetic_pages.make_meetings(1873000, 20, seed=1), next_page_href="?page=1"),
+        ('meeting', 'meeting_12_items'): synthetic_pages.meeting_page(
+            1873000, synthetic_pages.make_agenda_items(1873000, 12, seed=2)),
+        ('question', 'question'): synthetic_pages.question_page(
+            187300001, "Vraag om uitleg over de uitvoering van het klimaatplan",
+            synthetic_pages.VERSLAG_PATH % (1873000, 1874000)),
+        ('verslag', 'verslag_12_speeches'): synthetic_pages.verslag_page(
+            1873000, 1874000, "Vraag om uitleg over de uitvoering van het klimaatplan",
+            "donderdag 27 februari 2025", synthetic_pages.make_speeches(12, seed=3)),
+        ('verslag', 'verslag_400_speeches'): synthetic_pages.verslag_page(
+            1873001, 1874001, "Actualiteitsdebat over de energieprijzen",
+            "woensdag 12 maart 2025", synthetic_pages.make_speeches(400, seed=4)),
+    }
+    for (page_type, name), content in pages.items():
+        path = os.path.join(args.directory, page_type, name + '.html')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        print("Wrote %s (%.1f KiB)" % (path, len(content.encode('utf-8')) / 1024))
+    return 0
+
+
+def command_record(args):
+    """Download a real page into the fixture corpus."""
+    from request_helper import make_request
+    response = make_request(args.url)
+    if response is None:
+        print("Could not fetch %s" % args.url)
+        return 1
+    name = args.name or args.url.rstrip('/').split('/')[-1].split('?')[0] or args.page_type
+    path = os.path.join(FIXTURES_DIR, args.page_type, name + '.html')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    print("Saved %s (%.1f KiB)" % (path, len(response.content) / 1024))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="benchmark the extractors on the fixtures")
+    run.add_argument('--backend', action='append', choices=html_parser.BACKENDS,
+                     help="parser backend to benchmark (repeatable; default: all installed)")
+    run.add_argument('--page-type', action='append', choices=PAGE_TYPES,
+                     help="page type to benchmark (repeatable; default: all)")
+    run.add_argument('--min-time', type=float, default=1.0,
+                     help="seconds to run each extractor per fixture (default: %(default)s)")
+    run.add_argument('--min-iterations', type=int, default=20,
+                     help="minimum extractions per fixture (default: %(default)s)")
+    run.add_argument('--output', default=os.path.join(RESULTS_DIR, 'parsers.json'),
+                     help="where to save the results (default: %(default)s)")
+    run.add_argument('--baseline', help="results file to compare with")
+    run.add_argument('--threshold', type=float, default=0.10,
+                     help="p50 slowdown counted as a regression (default: %(default)s)")
+    run.set_defaults(func=command_run)
+
+    fixtures = commands.add_parser('fixtures', help="regenerate the synthetic fixture corpus")
+    fixtures.add_argument('--directory', default=FIXTURES_DIR, help="target directory (default: %(default)s)")
+    fixtures.set_defaults(func=command_fixtures)
+
+    record = commands.add_parser('record', help="save a page from the site as a fixture")
+    record.add_argument('page_type', choices=PAGE_TYPES)
+    record.add_argument('url')
+    record.add_argument('name', nargs='?', help="fixture name (default: last URL segment)")
+    record.set_defaults(func=command_record)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# records_memory.py
+"""
+Benchmark of the memory the scrapers' speech rows take: plain dicts, as the
+scrapers built them before, against records.Speech.
+
+Both hold the same synthetic speeches of a backfill: many speeches per
+verslag page, a few hundred speakers, texts of a few hundred characters.
+Memory is measured with tracemalloc over everything the rows allocate,
+shared texts included.
+
+    python benchmarks/records_memory.py --speeches 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from records import Speech  # noqa: E402
+
+VERSLAG_LINK = "https://www.vlaamsparlement.be/nl/parlementair-werk/commissies/commissievergaderingen/%d/verslag/%d"
+WORDS = "de het een van en in is dat op te voor met niet zijn om ook aan bij maar nog over".split()
+
+
+def make_pages(speeches, per_page, seed=0):
+    """Return (titel, datum, link, question ID, [(spreker, text)]) per verslag page, as extracted."""
+    rng = random.Random(seed)
+    pages = []
+    for page in range(max(1, speeches // per_page)):
+        verslag_id = 1900000 + page
+        speakers = [("Spreker %d (partij)" % rng.randrange(300), " ".join(rng.choice(WORDS) for _ in range(60)))
+                    for _ in range(per_page)]
+        # Every speech of a page repeats the page's titel, datum and link, as the scraper extracts them
+        pages.append(("Verslag over vraag %d" % verslag_id, "donderdag %d februari 2025" % (1 + page % 28),
+                      VERSLAG_LINK % (1800000 + page // 4, verslag_id), str(verslag_id), speakers))
+    return pages
+
+
+def as_dicts(pages):
+    # The speaker names are extracted from each speech's own HTML, so every row has its own copy
+    return [{"titel": titel, "spreker": "".join(spreker), "sprekertekst": text, "datum": datum,
+             "question_id": float(question_id), "content_type": "speech", "speech_link": link,
+             "commission": "omgeving"}
+            for titel, datum, link, question_id, speeches in pages for spreker, text in speeches]
+
+
+def as_records(pages):
+    return [Speech(titel=titel, spreker="".join(spreker), sprekertekst=text, datum=datum,
+                   question_id=question_id, speech_link=link, commission="omgeving")
+            for titel, datum, link, question_id, speeches in pages for spreker, text in speeches]
+
+
+def measure(build, pages):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = build(pages)
+    seconds = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--speeches', type=int, default=100000, help="number of speech rows")
+    parser.add_argument('--per-page', type=int, default=25, help="speeches per verslag page")
+    args = parser.parse_args()
+
+    pages = make_pages(args.speeches, args.per_page)
+    results = {}
+    for name, build in (('dicts', as_dicts), ('records', as_records)):
+        rows, size, seconds = measure(build, pages)
+        results[name] = size
+        print("%-8s %8d rows  %8.1f MB  %6.0f bytes/row  built in %.2fs"
+              % (name, len(rows), size / 1e6, size / max(1, len(rows)), seconds))
+        del rows
+    print("records use %.1fx less memory (speech texts, titels and links are shared by both and not counted)"
+          % (results['dicts'] / max(1, results['records'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# speeches_ingestion.py
+"""
+Benchmark of the input side of SpeechesScraper on a synthetic content CSV.
+
+Compares the column-wise link -> question ID mapping (speeches_scraper.question_links)
+with the former row-by-row iterrows scans. The row-by-row version is
+quadratic, so it only runs on the first --legacy-links links.
+
+    python benchmarks/speeches_ingestion.py --questions 200000 --speeches 400000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from speeches_scraper import INPUT_COLUMNS, question_links  # noqa: E402
+from storage import CONTENT_FIELDNAMES  # noqa: E402
+from utils import write_csv  # noqa: E402
+
+VERSLAG_LINK = "/nl/parlementair-werk/commissies/commissievergaderingen/%d/verslag/%d"
+
+
+def make_content_csv(path, questions, speeches, seed=0):
+    """Write a content CSV with question rows (some without or with shared links) and speech rows."""
+    rng = random.Random(seed)
+    rows = []
+    for number in range(questions):
+        meeting_id = 1800000 + number // 8
+        verslag_id = 1900000 + number // 2  # two questions per verslag page
+        link = VERSLAG_LINK % (meeting_id, verslag_id) if rng.random() > 0.05 else ""
+        rows.append({"titel": "Vraag %d" % number, "link": link, "ID": verslag_id if link else "",
+                     "original_ID": 1700000 + number, "content_type": "question", "commission": "omgeving"})
+    for number in range(speeches):
+        verslag_id = 1900000 + rng.randrange(max(1, questions // 2))
+        rows.append({"titel": "Verslag %d" % verslag_id, "content_type": "speech", "commission": "omgeving",
+                     "spreker": "Spreker %d" % (number % 50), "sprekertekst": "Tekst %d" % number,
+                     "datum": "donderdag 27 februari 2025", "question_id": verslag_id,
+                     "speech_link": "https://www.vlaamsparlement.be/" + VERSLAG_LINK % (0, verslag_id)})
+    write_csv(path, rows, CONTENT_FIELDNAMES)
+
+
+def legacy_links(df):
+    """The former implementation: collect links and look up each question ID with iterrows."""
+    questions_df = df[df['content_type'] == 'question']
+    links_to_process = []
+    for _, row in questions_df.iterrows():
+        if 'link' in row and row['link'] and isinstance(row['link'], str):
+            links_to_process.append(row['link'])
+    links_to_process = list(set(links_to_process))
+    return questions_df, links_to_process
+
+
+def legacy_lookup(questions_df, link):
+    for _, row in questions_df.iterrows():
+        if row.get('link') == link:
+            return row.get('ID', '')
+    return ""
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=200000, help="question rows (default: %(default)s)")
+    parser.add_argument('--speeches', type=int, default=400000, help="speech rows (default: %(default)s)")
+    parser.add_argument('--legacy-links', type=int, default=5,
+                        help="links looked up with the row-by-row version (default: %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench_content.csv')
+        _, seconds = timed(make_content_csv, path, args.questions, args.speeches)
+        print("Generated %d rows (%.1f MB) in %.2fs" % (args.questions + args.speeches,
+                                                       os.path.getsize(path) / 1e6, seconds))
+
+        df, read_all = timed(lambda: pd.read_csv(path, low_memory=False))
+        _, read_cols = timed(lambda: pd.read_csv(path, usecols=lambda column: column in INPUT_COLUMNS,
+                                                 low_memory=False))
+        mapping, map_seconds = timed(question_links, df)
+        _, lookup_seconds = timed(lambda: [mapping[link] for link in mapping])
+        print("read_csv (all columns):      %8.3fs" % read_all)
+        print("read_csv (input columns):    %8.3fs" % read_cols)
+        print("question_links:              %8.3fs  (%d links)" % (map_seconds, len(mapping)))
+        print("lookups (all links):         %8.3fs" % lookup_seconds)
+
+        (questions_df, links), collect_seconds = timed(legacy_links, df)
+        sample = links[:args.legacy_links]
+        _, legacy_seconds = timed(lambda: [legacy_lookup(questions_df, link) for link in sample])
+        per_link = legacy_seconds / max(1, len(sample))
+        print("legacy link collection:      %8.3fs" % collect_seconds)
+        print("legacy lookups (%d links):  %8.3fs  (~%.0fs extrapolated to all %d links)"
+              % (len(sample), legacy_seconds, per_link * len(links), len(links)))
+
+        # Both versions must agree on the links and their question IDs
+        for link in sample:
+            expected = legacy_lookup(questions_df, link)
+            assert str(mapping[link]) == str(expected), link
+        assert set(mapping) == set(links)
+        print("Results match the row-by-row version.")
+
+
+if __name__ == '__main__':
+    main()
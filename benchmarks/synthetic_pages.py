@@ -0,0 +1,250 @@
+# synthetic_pages.py
+"""
+Synthetic vlaamsparlement.be pages for offline benchmarks and load tests.
+
+The page templates follow the markup the scrapers read on the real site
+(see src/extraction_specs.py), wrapped in the usual page chrome (head,
+navigation, footer) so parse times are representative. All content is
+derived from a seed, so the same arguments give the same page.
+"""
+import html
+import random
+
+SITE_TITLE = "Vlaams Parlement"
+
+_WORDS = ("de het een en van in op met voor dat niet is zijn aan ook als bij er maar om door "
+          "over naar deze minister commissie vraag antwoord beleid klimaat energie wonen "
+          "ruimtelijke ordening natuur leefmilieu vergunning subsidie begroting decreet "
+          "gemeente provincie Vlaanderen burgers bedrijven onderzoek cijfers jaar maanden "
+          "project plan uitvoering evaluatie overleg sector doelstelling maatregel").split()
+
+_SPEAKERS = ["De voorzitter", "Jan Peeters (N-VA)", "Els Van den Broeck (Vooruit)",
+             "Tom Janssens (Vlaams Belang)", "An Claes (CD&V)", "Pieter De Smet (Open Vld)",
+             "Sarah Wouters (Groen)", "Minister Zuhal Demir", "Minister Jo Brouns"]
+
+_MONTHS = ["januari", "februari", "maart", "april", "mei", "juni", "juli", "augustus",
+           "september", "oktober", "november", "december"]
+_WEEKDAYS = ["maandag", "dinsdag", "woensdag", "donderdag", "vrijdag"]
+
+MEETING_PATH = "/nl/parlementair-werk/commissies/commissievergaderingen/%s"
+QUESTION_PATH = "/nl/parlementaire-documenten/vragen-en-interpellaties/%s"
+VERSLAG_PATH = "/nl/parlementair-werk/commissies/commissievergaderingen/%s/verslag/%s"
+
+_CHROME_HEAD = """<!DOCTYPE html>
+<html lang="nl" dir="ltr">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<meta name="description" content="Het Vlaams Parlement is de wetgevende vergadering van Vlaanderen.">
+<link rel="canonical" href="https://www.vlaamsparlement.be{path}">
+<link rel="icon" href="/themes/custom/vlaamsparlement/favicon.ico" type="image/vnd.microsoft.icon">
+{styles}
+<title>{title} | {site}</title>
+</head>
+<body class="path-node page-node-type-{body_type}">
+<a href="#main-content" class="visually-hidden focusable skip-link">Overslaan en naar de inhoud gaan</a>
+<div class="dialog-off-canvas-main-canvas" data-off-canvas-main-canvas>
+<header class="site-header" role="banner">
+<div class="site-header__top"><div class="container">
+<a href="/nl" class="site-header__logo" title="Home" rel="home"><img src="/themes/custom/vlaamsparlement/logo.svg" alt="{site}"></a>
+<nav class="language-switcher" aria-label="Taal"><ul>{languages}</ul></nav>
+<form class="search-form" action="/nl/zoeken" method="get"><label for="search" class="visually-hidden">Zoeken</label><input type="search" id="search" name="q" placeholder="Zoeken"><button type="submit" class="button">Zoeken</button></form>
+</div></div>
+<nav class="main-navigation" aria-label="Hoofdnavigatie"><div class="container"><ul class="menu menu--main">{navigation}</ul></div></nav>
+</header>
+<nav class="breadcrumb" aria-label="Kruimelpad"><ol>{breadcrumb}</ol></nav>
+<main id="main-content" class="page-layout" role="main">
+"""
+
+_CHROME_FOOT = """
+</main>
+<footer class="site-footer" role="contentinfo"><div class="container">
+<div class="site-footer__columns">{footer}</div>
+<p class="site-footer__address">Vlaams Parlement, Leuvenseweg 86, 1000 Brussel</p>
+</div></footer>
+</div>
+{scripts}
+</body>
+</html>
+"""
+
+_NAVIGATION = ["Over het Vlaams Parlement", "Parlementair werk", "Plenaire vergadering", "Commissies",
+               "Parlementaire documenten", "Vragen en interpellaties", "Decreten", "Begroting",
+               "Nieuws", "Agenda", "Bezoeken", "Contact", "Pers", "Vacatures", "Publicaties"]
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+
+def _sentence(rng, low=8, high=24):
+    text = _words(rng, rng.randint(low, high))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng, sentences=4):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(max(1, sentences - 2), sentences + 2)))
+
+
+def dutch_date(rng, year=2025, with_weekday=False):
+    month = rng.randrange(12)
+    day = rng.randint(1, 28)
+    text = "%d %s %d" % (day, _MONTHS[month], year)
+    return ("%s %s" % (rng.choice(_WEEKDAYS), text)) if with_weekday else text
+
+
+def page(title, body, path="/nl", body_type="page"):
+    """Wrap page content in the site chrome."""
+    esc = html.escape
+    navigation = "".join(
+        '<li class="menu-item menu-item--expanded"><a href="/nl/%s">%s</a><ul class="menu">%s</ul></li>'
+        % (number, esc(item), "".join('<li class="menu-item"><a href="/nl/%s/%s">%s %s</a></li>'
+                                      % (number, sub, esc(item), sub) for sub in range(6)))
+        for number, item in enumerate(_NAVIGATION))
+    head = _CHROME_HEAD.format(
+        path=esc(path), title=esc(title), site=SITE_TITLE, body_type=body_type,
+        styles="\n".join('<link rel="stylesheet" media="all" href="/sites/default/files/css/css_%02d.css">'
+                         % number for number in range(8)),
+        languages="".join('<li><a href="/%s" hreflang="%s">%s</a></li>' % (code, code, code.upper())
+                          for code in ("nl", "en", "fr", "de")),
+        navigation=navigation,
+        breadcrumb='<li><a href="/nl">Home</a></li><li><a href="/nl/parlementair-werk">Parlementair werk</a></li>'
+                   '<li>%s</li>' % esc(title))
+    foot = _CHROME_FOOT.format(
+        footer="".join('<div class="site-footer__column"><h2>%s</h2><ul>%s</ul></div>'
+                       % (esc(item), "".join('<li><a href="/nl/footer/%s">%s</a></li>'
+                                             % (sub, esc(item)) for sub in range(5)))
+                       for item in _NAVIGATION[:5]),
+        scripts="\n".join('<script src="/sites/default/files/js/js_%02d.js"></script>' % number
+                          for number in range(6)))
+    return head + body + foot
+
+
+# === Listing page ===
+
+def make_meetings(start_id, count, seed=0):
+    """Return `count` synthetic meetings with consecutive IDs from `start_id`."""
+    rng = random.Random(seed)
+    return [{"id": start_id + number,
+             "date": "%s %d uur - Schuman" % (dutch_date(rng, with_weekday=True), rng.choice((10, 14))),
+             "title": "Commissie voor Leefmilieu, Natuur, Ruimtelijke Ordening en Energie",
+             "subtitle": _sentence(rng, 3, 8).rstrip('.'),
+             "description": _sentence(rng, 10, 30)}
+            for number in range(count)]
+
+
+def listing_page(meetings, next_page_href=None, path="/nl/parlementair-werk/plenaire-vergadering/vergaderingen"):
+    """Commission meetings listing with one card per meeting and an optional pager."""
+    esc = html.escape
+    cards = []
+    for meeting in meetings:
+        meeting_path = MEETING_PATH % meeting["id"]
+        cards.append(
+            '<article class="card meeting-card" data-id="%(id)s">'
+            '<header class="card__header"><span class="card__date">%(date)s</span>'
+            '<h4 class="card__title">%(title)s</h4><h5 class="card__title">%(subtitle)s</h5></header>'
+            '<div class="card__description"><p>%(description)s</p></div>'
+            '<footer class="card__footer"><ul class="card__links">'
+            '<li class="card__link card__link-view"><a href="%(view)s">Bekijk vergadering</a></li>'
+            '<li class="card__link card__link-watch"><a href="%(watch)s">Bekijk video</a></li>'
+            '</ul></footer></article>'
+            % {"id": meeting["id"], "date": esc(meeting["date"]), "title": esc(meeting["title"]),
+               "subtitle": esc(meeting["subtitle"]), "description": esc(meeting["description"]),
+               "view": meeting_path, "watch": meeting_path + "/video"})
+    pager = ""
+    if next_page_href:
+        pager = ('<nav class="pager" role="navigation" aria-label="Paginering"><ul class="pager__items">'
+                 '<li class="pager__item pager__item--next"><a href="%s" rel="next">Volgende</a></li>'
+                 '</ul></nav>' % esc(next_page_href))
+    body = ('<div class="page-layout__content"><h1 class="page-title">Vergaderingen</h1>'
+            '<div class="view-content">%s</div>%s</div>' % ("".join(cards), pager))
+    return page("Vergaderingen", body, path, "listing")
+
+
+# === Meeting page ===
+
+def make_agenda_items(meeting_id, count, seed=0):
+    """Return `count` synthetic agenda items of a meeting."""
+    rng = random.Random(seed + int(meeting_id))
+    return [{"id": int(meeting_id) * 100 + number,
+             "tag": rng.choice(("Vraag om uitleg", "Actuele vraag", "Interpellatie", "Mondelinge vraag")),
+             "title": _sentence(rng, 6, 16),
+             "number": "%d (2024-2025)" % rng.randint(1, 3000),
+             "author": rng.choice(_SPEAKERS[1:7]).split(" (")[0],
+             "minister": rng.choice(_SPEAKERS[7:]).replace("Minister ", "")}
+            for number in range(count)]
+
+
+def meeting_page(meeting_id, items):
+    """Meeting detail page with one journal item card per agenda item."""
+    esc = html.escape
+    cards = []
+    for item in items:
+        cards.append(
+            '<article class="card document-type--report document-subtype--journal_item">'
+            '<header class="card__header"><h4 class="card__tag">%(tag)s</h4>'
+            '<p class="card__title"><span class="visually-hidden">Titel</span>%(title)s</p></header>'
+            '<div class="card__meta"><span class="card__document-number">%(number)s</span>'
+            '<p class="card__author"><span>van</span> %(author)s <span>aan</span> %(minister)s</p></div>'
+            '<ul class="card__links"><li class="card__link card__link-view internal">'
+            '<a href="%(link)s">Bekijk</a></li></ul></article>'
+            % {"tag": esc(item["tag"]), "title": esc(item["title"]), "number": esc(item["number"]),
+               "author": esc(item["author"]), "minister": esc(item["minister"]),
+               "link": QUESTION_PATH % item["id"]})
+    body = ('<div class="page-layout__content"><h1 class="page-title">Commissievergadering</h1>'
+            '<section class="meeting-agenda"><h2>Agenda</h2>%s</section></div>' % "".join(cards))
+    return page("Commissievergadering", body, MEETING_PATH % meeting_id, "meeting")
+
+
+# === Question page ===
+
+def question_page(item_id, title, verslag_link=None):
+    """Question/interpellation page; the verslag link is missing until the verslag is published."""
+    esc = html.escape
+    button = ""
+    if verslag_link:
+        button = ('<a class="button button-primary header-links-icon--report" href="%s">Verslag</a>'
+                  % esc(verslag_link))
+    body = ('<div class="page-layout__content"><h1 class="page-title">Vraag om uitleg</h1>'
+            '<h2 class="page-subtitle">%s</h2><div class="header-links">%s'
+            '<a class="button button-secondary header-links-icon--download" href="/nl/pdf/%s">PDF</a></div>'
+            '<dl class="document-meta"><dt>Nummer</dt><dd>%s</dd><dt>Zittingsjaar</dt><dd>2024-2025</dd></dl>'
+            '</div>' % (esc(title), button, item_id, item_id))
+    return page(title, body, QUESTION_PATH % item_id, "question")
+
+
+# === Verslag page ===
+
+def make_speeches(count, seed=0, paragraphs=3):
+    """Return `count` (speaker, [paragraph, ...]) speeches, the chair opening and closing."""
+    rng = random.Random(seed)
+    speeches = [("De voorzitter", [_sentence(rng)])]
+    for _ in range(max(0, count - 2)):
+        speeches.append((rng.choice(_SPEAKERS[1:]),
+                         [_paragraph(rng) for _ in range(rng.randint(1, paragraphs * 2 - 1))]))
+    if count > 1:
+        speeches.append(("De voorzitter", ["Het incident is gesloten."]))
+    return speeches[:count]
+
+
+def verslag_page(meeting_id, verslag_id, title, date, speeches):
+    """Verslag page with one meeting-speech block per speech."""
+    esc = html.escape
+    blocks = []
+    for number, (speaker, paragraphs) in enumerate(speeches):
+        if speaker.startswith("De voorzitter"):
+            speaker_html = esc(speaker)
+        else:
+            speaker_html = '<a href="/nl/vlaamse-volksvertegenwoordigers/%d">%s</a>' % (
+                1000 + number % 97, esc(speaker))
+        blocks.append(
+            '<div class="meeting-speech" id="speech-%d">'
+            '<div class="meeting-speech__title">%s</div>'
+            '<div class="meeting-speech__value">%s</div></div>'
+            % (number, speaker_html, "".join("<p>%s</p>" % esc(text) for text in paragraphs)))
+    body = ('<div class="page-layout__content">'
+            '<header class="card__header"><p class="card__title"><span class="visually-hidden">Titel</span>%s</p></header>'
+            '<div class="meeting-header"><date class="meeting-header__date-full">%s</date></div>'
+            '<div class="meeting-speeches"><div class="meeting-speeches__list">%s</div></div></div>'
+            % (esc(title), esc(date), "".join(blocks)))
+    return page(title, body, VERSLAG_PATH % (meeting_id, verslag_id), "verslag")
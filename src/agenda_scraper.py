@@ -3,93 +3,139 @@ import os
 import csv
 import logging
 import pandas as pd
-from bs4 import BeautifulSoup
-from utils import safe_get_text, write_csv
-from request_helper import make_request
+from parse_memo import extract_page
+from extraction_specs import MEETING_SPEC
+from utils import BufferedCsvWriter
+from fetch_engine import iter_fetch
+from seen_index import meeting_fingerprint
+from storage import COMBINED_FIELDNAMES, MEETING_FIELDNAMES
+from metrics import timed_stage
+from checkpoint import split_completed
+from records import AgendaItem, read_csv
 
 class AgendaScraper:
-    def __init__(self, input_csv, output_csv, base_meeting_url):
+    def __init__(self, input_csv, output_csv, base_meeting_url, seen_index=None, commission_name="",
+                 storage=None, journal=None):
         self.input_csv = input_csv
         self.output_csv = output_csv
         self.base_meeting_url = base_meeting_url
-        self.all_data = []
+        self.seen_index = seen_index
+        self.commission_name = commission_name
+        # With a storage backend meetings are read from and agenda items are
+        # upserted into it instead of the meetings CSV
+        self.storage = storage
+        # Meeting pages completed by an interrupted run are taken from the journal
+        self.journal = journal
     
+    def extract_agenda_items(self, meeting_id, content):
+        """Extract the agenda items from the HTML of a meeting page."""
+        page = extract_page(MEETING_SPEC, content)
+        if not page.items:
+            logging.info("No matching cards found in meeting %s", meeting_id)
+            return []
+        return [AgendaItem.from_row(item, meeting_id=meeting_id) for item in page.items]
+    
+    @timed_stage('agenda', rows=lambda count: count)
     def scrape(self):
-        if not os.path.exists(self.input_csv):
+        """
+        Scrape the agenda items of the listed meetings.
+        
+        Returns:
+            int: Number of agenda items scraped or taken from the journal
+        """
+        if self.storage is None and not os.path.exists(self.input_csv):
             logging.error("Input CSV file not found: %s", self.input_csv)
-            return []
+            return 0
         
-        # Read the existing CSV to get meeting IDs
+        # Read the existing meetings to get meeting IDs
         try:
-            df = pd.read_csv(self.input_csv)
+            if self.storage is not None:
+                df = pd.DataFrame(self.storage.meetings(self.commission_name), columns=MEETING_FIELDNAMES)
+            else:
+                df = read_csv(self.input_csv)
             meeting_ids = df["ID"].dropna().astype(str).tolist()
         except Exception as e:
             logging.error("Error reading input CSV %s: %s", self.input_csv, e)
-            return []
+            return 0
         
         if not meeting_ids:
             logging.warning("No meeting IDs found in %s", self.input_csv)
-            return []
+            return 0
+        
+        # Meetings this run already completed before it was interrupted
+        journaled, pending_ids = split_completed(self.journal, 'agenda', meeting_ids,
+                                                 lambda meeting_id: self.base_meeting_url + meeting_id)
+        
+        # Skip meetings that earlier runs already captured completely
+        fingerprints = {}
+        if self.seen_index is not None:
+            fingerprints = {str(row["ID"]): meeting_fingerprint(row)
+                            for _, row in df.dropna(subset=["ID"]).iterrows()}
+            new_ids = self.seen_index.new_meetings([(meeting_id, fingerprints.get(meeting_id))
+                                                    for meeting_id in pending_ids])
+            logging.info("Skipping %d already scraped meetings", len(pending_ids) - len(new_ids))
+            pending_ids = new_ids
+        
+        pages = self._iter_pages(meeting_ids, journaled, pending_ids, fingerprints)
+        if self.storage is not None:
+            count = sum(len(items) for items in pages)
+            logging.info("Stored %d agenda items", count)
+            return count
+        
+        # The agenda items are written after the meeting rows of the meetings
+        # CSV as their pages come in, so only one buffer of rows is held
+        count = 0
+        fieldnames = list(df.columns) + [column for column in COMBINED_FIELDNAMES if column not in df.columns]
+        with BufferedCsvWriter(self.output_csv, fieldnames) as writer:
+            for items in pages:
+                if not items:
+                    continue
+                if not count:
+                    writer.write(self._meeting_rows())
+                writer.write(items)
+                count += len(items)
+        if count:
+            logging.info("Updated meetings CSV with %d agenda items", count)
+        else:
+            logging.info("No agenda items scraped.")
+        return count
+    
+    def _meeting_rows(self):
+        """Return the rows of the input meetings CSV as they are."""
+        with open(self.input_csv, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    
+    def _iter_pages(self, meeting_ids, journaled, pending_ids, fingerprints):
+        """
+        Yield the agenda items of each meeting in listing order, whether
+        they come from the journal or the site.
         
-        # Scrape agenda items for each meeting
+        The pages are fetched as they are needed; the fetch engine keeps
+        several requests in flight within the per-host rate limit.
+        """
+        fetched_ids = set(pending_ids)
+        responses = iter_fetch([self.base_meeting_url + meeting_id for meeting_id in pending_ids])
         for meeting_id in meeting_ids:
-            meeting_url = self.base_meeting_url + meeting_id
+            if meeting_id in journaled:
+                yield journaled[meeting_id]
+                continue
+            if meeting_id not in fetched_ids:
+                continue
+            meeting_url, response = next(responses)
             logging.info("Scraping meeting details from: %s", meeting_url)
-            
-            # Use the request helper to make the request with a delay
-            response = make_request(meeting_url)
             if not response:
                 continue  # Skip this meeting if request failed
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            # Find agenda cards with the required classes
-            cards = soup.find_all("article", class_=lambda x: x and all(cls in x.split() for cls in ["card", "document-type--report", "document-subtype--journal_item"]))
-            if not cards:
-                logging.info("No matching cards found in meeting %s", meeting_id)
-                continue
-            
-            for card in cards:
-                card_tag = safe_get_text(card.find("h4", class_="card__tag"))
-                card_title = safe_get_text(card.find("p", class_="card__title"))
-                card_doc_num = safe_get_text(card.find("span", class_="card__document-number"))
-                card_author = safe_get_text(card.find("p", class_="card__author"))
-                internal_link_elem = card.select_one("li.card__link.card__link-view.internal a")
-                verslag_link = internal_link_elem.get("href", "").strip() if internal_link_elem else ""
-                extracted_id = verslag_link.rstrip('/').split('/')[-1] if verslag_link else ""
-                self.all_data.append({
-                    "meeting_ID": meeting_id,
-                    "card__tag": card_tag,
-                    "card__title": card_title,
-                    "card__document_number": card_doc_num,
-                    "card__author": card_author,
-                    "verslag_link": verslag_link,
-                    "ID": extracted_id
-                })
-        
-        if self.all_data:
-            # Now we need to update the existing meetings CSV with agenda info
-            # We'll keep the original format but add new columns for agenda items
-            
-            # Read the existing meetings data
-            meetings_df = pd.read_csv(self.input_csv)
-            
-            # Create a dataframe from the scraped agenda data
-            agenda_df = pd.DataFrame(self.all_data)
-            
-            # Add a flag column to indicate this is agenda data
-            agenda_df['data_type'] = 'agenda_item'
-            
-            # Combine the original meetings with the agenda items
-            # This approach preserves all the original meeting data
-            combined_df = pd.concat([meetings_df, agenda_df], ignore_index=True)
-            
-            # Write the combined data back to the CSV
-            combined_df.to_csv(self.output_csv, index=False)
-            logging.info("Updated meetings CSV with %d agenda items", len(self.all_data))
-        else:
-            logging.info("No agenda items scraped.")
-        
-        return self.all_data
+            items = self.extract_agenda_items(meeting_id, response.content)
+            if self.storage is not None:
+                self.storage.upsert_agenda_items(self.commission_name, items)
+            if self.seen_index is not None and items:
+                self.seen_index.record_meeting(meeting_id, fingerprints.get(meeting_id), self.commission_name)
+                self.seen_index.record_agenda_items(meeting_id, [item["ID"] for item in items],
+                                                    self.commission_name)
+            if self.journal is not None:
+                self.journal.record('agenda', meeting_url, items)
+            yield items
 
 if __name__ == '__main__':
     import config
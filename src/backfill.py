@@ -0,0 +1,310 @@
+# backfill.py
+"""
+Historical backfill of commission meetings over an arbitrary date range.
+
+The range is split into windows of BACKFILL_WINDOW_DAYS days. For every
+commission the listing of each window is paged through first; meetings that
+show up in more than one window are kept in the earliest one. Then every
+window runs the normal workflow (agenda items, questions, speeches,
+cleaning) into its own run directory, data/<commission>/<first day of the
+window>/, with BACKFILL_WORKERS windows at a time. All requests go through
+the shared per-host rate limiter, so the politeness budget is the same as
+for a normal run.
+
+Listed and completed windows are recorded in BACKFILL_DB. Rerunning the
+same backfill skips them, and a window that was interrupted resumes from
+its checkpoint journal.
+
+    python src/backfill.py --start 2019-01-01 --end 2024-12-31
+    python src/backfill.py --start 2024-01-01 --end 2024-06-30 --window-days 14 --commission omgeving
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import config
+import error_handler
+from http_cache import get_cache
+from http_client import get_client
+from main import run_commission_workflow
+from metrics import reset_metrics, stage
+from parse_memo import get_parse_memo
+from records import Meeting
+from scrapers import scrape_listing
+from search_index import update_search_index
+from compaction import compact
+from seen_index import open_seen_index
+from storage import open_storage
+
+
+def date_windows(start_date, end_date, window_days):
+    """
+    Split a date range into consecutive windows.
+
+    Args:
+        start_date: First day ('YYYY-MM-DD' or date)
+        end_date: Last day, included ('YYYY-MM-DD' or date)
+        window_days: Days per window; the last window may be shorter
+
+    Returns:
+        list: (first day, last day) pairs as 'YYYY-MM-DD' strings
+    """
+    start = _to_date(start_date)
+    end = _to_date(end_date)
+    if end < start:
+        raise ValueError("End date %s is before start date %s" % (end, start))
+    windows = []
+    while start <= end:
+        last = min(end, start + timedelta(days=window_days - 1))
+        windows.append((start.isoformat(), last.isoformat()))
+        start = last + timedelta(days=1)
+    return windows
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def assign_meetings(listed_windows):
+    """
+    Keep every meeting in the first window that listed it.
+
+    Args:
+        listed_windows: (window, meetings) pairs in date order
+
+    Returns:
+        dict: window -> meetings only this window will scrape
+    """
+    seen_ids = set()
+    assigned = {}
+    for window, meetings in listed_windows:
+        assigned[window] = []
+        for meeting in meetings:
+            if meeting['ID'] not in seen_ids:
+                seen_ids.add(meeting['ID'])
+                assigned[window].append(meeting)
+    return assigned
+
+
+class BackfillProgress:
+    """
+    Windows of a backfill that were listed (with their meetings) and
+    completed, per commission, so an interrupted backfill resumes.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS windows (
+                commission TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                meetings TEXT NOT NULL,
+                listed_at TEXT,
+                completed_at TEXT,
+                PRIMARY KEY (commission, start_date, end_date)
+            );
+        """)
+        self._db.commit()
+
+    def listed(self, commission):
+        """Return the listed windows of a commission: (start, end) -> meetings."""
+        with self._lock:
+            rows = self._db.execute("SELECT start_date, end_date, meetings FROM windows WHERE commission = ?",
+                                    (commission,)).fetchall()
+        return {(start, end): [Meeting.from_row(row) for row in json.loads(meetings)]
+                for start, end, meetings in rows}
+
+    def completed(self, commission):
+        """Return the windows of a commission whose workflow completed."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start_date, end_date FROM windows WHERE commission = ? AND completed_at IS NOT NULL",
+                (commission,)).fetchall()
+        return set(rows)
+
+    def record_listing(self, commission, window, meetings):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO windows (commission, start_date, end_date, meetings, listed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (commission, window[0], window[1],
+                 json.dumps([dict(meeting) for meeting in meetings], ensure_ascii=False),
+                 datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+
+    def record_completed(self, commission, window):
+        with self._lock:
+            self._db.execute(
+                "UPDATE windows SET completed_at = ? WHERE commission = ? AND start_date = ? AND end_date = ?",
+                (datetime.now().isoformat(timespec='seconds'), commission, window[0], window[1]))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def list_window(commission_id, commission_config, window):
+    """Page through the listing of one window; return its meetings, or None if it is incomplete."""
+    error_handler.set_log_context(commission_id)
+    url = config.get_commission_url(commission_config, *window)
+    meetings, _, complete = scrape_listing(url)
+    if meetings is None or not complete:
+        logging.error("Could not list meetings of %s from %s to %s", commission_id, *window)
+        return None
+    logging.info("Listed %d meetings of %s from %s to %s", len(meetings), commission_id, *window)
+    return meetings
+
+
+def run_window(commission_id, commission_config, window, meetings, seen_index, streaming, storage):
+    """Run the normal workflow for the meetings of one window in the window's run directory."""
+    error_handler.set_log_context(commission_id)
+    # Run directory, storage rows and checkpoint journal of this window
+    config.set_run_date(window[0])
+    try:
+        return run_commission_workflow(commission_config, seen_index, streaming, storage, meetings=meetings)
+    except Exception as e:
+        logging.exception("Error backfilling %s from %s to %s: %s", commission_id, window[0], window[1], e)
+        return False
+
+
+def backfill_commission(executor, commission_id, commission_config, windows, progress, seen_index,
+                        streaming=None, storage=None):
+    """
+    Backfill one commission: list all windows, dedup their meetings, then scrape the windows.
+
+    Returns:
+        tuple: (completed windows, failed windows)
+    """
+    listed = progress.listed(commission_id)
+    pending = [window for window in windows if window not in listed]
+    if len(pending) < len(windows):
+        logging.info("%s: %d windows already listed", commission_id, len(windows) - len(pending))
+
+    with stage('backfill_listing'):
+        futures = {executor.submit(list_window, commission_id, commission_config, window): window
+                   for window in pending}
+        for future in as_completed(futures):
+            window = futures[future]
+            meetings = future.result()
+            if meetings is not None:
+                progress.record_listing(commission_id, window, meetings)
+                listed[window] = meetings
+
+    assigned = assign_meetings([(window, listed[window]) for window in windows if window in listed])
+    completed = progress.completed(commission_id)
+    failed = len(windows) - len(assigned)
+    done = 0
+    futures = {}
+    for window, meetings in assigned.items():
+        if window in completed:
+            done += 1
+        elif not meetings:
+            # Nothing new in this window: no run directory needed
+            progress.record_completed(commission_id, window)
+            done += 1
+        else:
+            futures[executor.submit(run_window, commission_id, commission_config, window, meetings,
+                                    seen_index, streaming, storage)] = window
+    for future in as_completed(futures):
+        window = futures[future]
+        if future.result():
+            progress.record_completed(commission_id, window)
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def backfill(start_date, end_date, commissions=None, window_days=None, workers=None, streaming=None,
+             full=False):
+    """
+    Backfill the given commissions (default: all configured) over a date range.
+
+    Args:
+        start_date: First day of the range ('YYYY-MM-DD')
+        end_date: Last day of the range, included ('YYYY-MM-DD')
+        commissions: Commission names to backfill
+        window_days: Days per window (default: config.BACKFILL_WINDOW_DAYS)
+        workers: Windows scraped at once (default: config.BACKFILL_WORKERS)
+        streaming: Run the scraping stages as a streaming pipeline (default: config.STREAMING_PIPELINE)
+        full: Refetch everything instead of only items earlier runs did not capture
+
+    Returns:
+        bool: True when every window of every commission completed
+    """
+    windows = date_windows(start_date, end_date, window_days or config.BACKFILL_WINDOW_DAYS)
+    commissions = commissions or list(config.COMMISSIONS)
+    logging.info("Backfilling %s from %s to %s in %d windows", ", ".join(commissions), start_date, end_date,
+                 len(windows))
+    metrics = reset_metrics()
+    seen_index = open_seen_index(full=full)
+    storage = open_storage()
+    progress = BackfillProgress(config.BACKFILL_DB)
+
+    results = {}
+    workers = max(1, workers or config.BACKFILL_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        for commission_id in commissions:
+            done, failed = backfill_commission(executor, commission_id, config.COMMISSIONS[commission_id],
+                                               windows, progress, seen_index, streaming, storage)
+            results[commission_id] = {"completed": done, "failed": failed}
+            logging.info("Backfill of %s: %d of %d windows completed, %d failed", commission_id, done,
+                         len(windows), failed)
+    progress.close()
+
+    if config.SEARCH_INDEX_ENABLED:
+        with stage('search_index'):
+            update_search_index()
+    # Merge the new run directories into the compacted dataset
+    if config.COMPACTION_ENABLED:
+        with stage('compaction'):
+            compact()
+
+    get_client().log_stats()
+    cache = get_cache()
+    if cache:
+        cache.log_stats()
+    memo = get_parse_memo()
+    if memo:
+        memo.log_stats()
+    if config.METRICS_ENABLED:
+        metrics.write_reports(extra={"backfill": {"start": start_date, "end": end_date, "windows": len(windows),
+                                                  "commissions": results},
+                                     "http_pool": get_client().stats(),
+                                     "response_cache": cache.stats() if cache else None,
+                                     "parse_memo": memo.stats() if memo else None})
+    if any(result["failed"] for result in results.values()):
+        logging.warning("Some backfill windows failed; rerun the same backfill to retry them.")
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', required=True, help="first day of the range (YYYY-MM-DD)")
+    parser.add_argument('--end', default=date.today().isoformat(),
+                        help="last day of the range, included (default: today)")
+    parser.add_argument('--window-days', type=int, default=config.BACKFILL_WINDOW_DAYS,
+                        help="days per window (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=config.BACKFILL_WORKERS,
+                        help="windows scraped at once (default: %(default)s)")
+    parser.add_argument('--commission', action='append', choices=sorted(config.COMMISSIONS),
+                        help="commission to backfill (repeatable; default: all configured)")
+    parser.add_argument('--full', action='store_true',
+                        help="refetch all meetings, agenda items and speeches, ignoring earlier runs")
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help="run the agenda, questions and speeches stages as a streaming pipeline")
+    args = parser.parse_args()
+    ok = backfill(args.start, args.end, args.commission, args.window_days, args.workers, args.stream, args.full)
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,302 @@
+# blob_store.py
+"""
+Content-addressed, compressed store for speech texts and page payloads.
+
+Every blob is stored once, under the SHA-256 of its content, no matter how
+many run directories or cache entries refer to it. Long speech texts in the
+content CSVs are replaced by a reference ('blob:<sha256>') once a commission
+workflow is done (pack_content_csv), so overlapping runs only add the bytes
+of speeches they are the first to see. Readers turn references back into
+text with resolve/resolve_rows.
+
+    python src/blob_store.py pack              # pack all existing content CSVs
+    python src/blob_store.py unpack FILE [OUT] # write a content CSV with the full texts
+    python src/blob_store.py stats
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import zlib
+
+import zstandard
+
+import config
+from metrics import get_metrics
+
+REF_PREFIX = 'blob:'
+
+# File suffix per codec. Blobs are written with zstd, which compresses
+# speech texts and HTML better and faster than zlib; '.zlib' blobs (written
+# by earlier versions) and blobs without suffix (response cache bodies
+# from before the cache used the blob store) are only read.
+CODECS = ('.zst', '.zlib', '')
+
+csv.field_size_limit(2 ** 31 - 1)
+
+
+def _default_file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# tempfile.mkstemp creates files readable by their owner only; blobs and
+# packed CSVs are shared with other readers, so they get the mode open()
+# would have given them
+_FILE_MODE = _default_file_mode()
+
+
+def is_ref(value):
+    """Return True if a CSV value is a blob reference."""
+    return isinstance(value, str) and value.startswith(REF_PREFIX) and len(value) == len(REF_PREFIX) + 64
+
+
+class BlobStore:
+    """
+    Blobs as files <root>/<first two hex digits>/<sha256><codec suffix>.
+
+    Writes are atomic and idempotent, so several threads and processes (and
+    git checkouts on other machines) can share one store.
+    """
+    def __init__(self, root, level=None):
+        self.root = root
+        self.level = config.BLOB_ZSTD_LEVEL if level is None else level
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.deduplicated = 0
+        self.bytes_in = 0
+        self.bytes_stored = 0
+
+    def _compressor(self):
+        # zstandard compressors are not thread-safe
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor
+
+    def _path(self, digest, suffix):
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def find(self, digest):
+        """Return the path of a stored blob, or None."""
+        for suffix in CODECS:
+            path = self._path(digest, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data):
+        """
+        Store bytes (or text, as UTF-8) unless a blob with the same content exists.
+
+        Returns:
+            str: SHA-256 hex digest of the content
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.find(digest) is not None:
+            with self._lock:
+                self.deduplicated += 1
+            return digest
+        stored = self._compressor().compress(data)
+        path = self._path(digest, '.zst')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(stored)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.written += 1
+            self.bytes_in += len(data)
+            self.bytes_stored += len(stored)
+        return digest
+
+    def get(self, digest):
+        """Return the content of a blob, or None if it is not stored."""
+        path = self.find(digest)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            stored = f.read()
+        if path.endswith('.zst'):
+            return zstandard.ZstdDecompressor().decompress(stored)
+        if path.endswith('.zlib'):
+            return zlib.decompress(stored)
+        return stored
+
+    def size(self, digest):
+        """Return the bytes a blob takes on disk (0 if it is not stored)."""
+        path = self.find(digest)
+        return os.path.getsize(path) if path else 0
+
+    def remove(self, digest):
+        path = self.find(digest)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def ref(self, text):
+        """Store a text and return its reference."""
+        return REF_PREFIX + self.put(text)
+
+    def resolve(self, value):
+        """Return the text a reference points to; other values are returned unchanged."""
+        if not is_ref(value):
+            return value
+        data = self.get(value[len(REF_PREFIX):])
+        if data is None:
+            raise KeyError("Blob %s is missing from %s" % (value, self.root))
+        return data.decode('utf-8')
+
+    def resolve_rows(self, rows, columns=('sprekertekst',)):
+        """Resolve the references in the given columns of row dicts, in place; return the rows."""
+        for row in rows:
+            for column in columns:
+                if is_ref(row.get(column)):
+                    row[column] = self.resolve(row[column])
+        return rows
+
+    def stats(self):
+        with self._lock:
+            return {"written": self.written, "deduplicated": self.deduplicated,
+                    "bytes_in": self.bytes_in, "bytes_stored": self.bytes_stored}
+
+    def disk_usage(self):
+        """Return (number of blobs, bytes on disk) of the whole store."""
+        count = 0
+        total = 0
+        for path in glob.glob(os.path.join(self.root, '??', '*')):
+            if not path.endswith('.tmp'):
+                count += 1
+                total += os.path.getsize(path)
+        return count, total
+
+
+def pack_content_csv(csv_path, store=None, min_bytes=None):
+    """
+    Replace the long speech texts of a content CSV by blob references.
+
+    Texts already packed are left alone, so packing is idempotent and can
+    follow a stage that appended full texts to a packed file.
+
+    Args:
+        csv_path: Content CSV file
+        store: BlobStore (default: the process-wide store)
+        min_bytes: Texts shorter than this stay inline (default: config.BLOB_MIN_BYTES)
+
+    Returns:
+        int: Number of texts replaced by a reference
+    """
+    store = store or get_blob_store()
+    min_bytes = config.BLOB_MIN_BYTES if min_bytes is None else min_bytes
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        if not fieldnames or 'sprekertekst' not in fieldnames:
+            return 0
+        # Rows are copied one at a time into a new file, which replaces the
+        # original atomically (a crash never leaves it half-written) unless
+        # nothing was packed
+        packed = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(csv_path)), suffix='.tmp')
+        try:
+            with get_metrics().phase('write'), os.fdopen(fd, 'w', newline='', encoding='utf-8') as out:
+                writer = csv.DictWriter(out, fieldnames=fieldnames)
+                writer.writeheader()
+                for row in reader:
+                    text = row.get('sprekertekst') or ''
+                    if not is_ref(text) and len(text.encode('utf-8')) >= min_bytes:
+                        row['sprekertekst'] = store.ref(text)
+                        packed += 1
+                    writer.writerow(row)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    if packed:
+        # Keep the mode of the file that is replaced
+        os.chmod(tmp_path, os.stat(csv_path).st_mode & 0o777)
+        os.replace(tmp_path, csv_path)
+    else:
+        os.remove(tmp_path)
+    return packed
+
+
+def unpack_content_csv(csv_path, output_path, store=None):
+    """Write a copy of a content CSV with every reference replaced by its text; return the rows written."""
+    store = store or get_blob_store()
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = store.resolve_rows(list(reader))
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def pack_all_content_files(data_dir):
+    """Pack every content CSV under data_dir; return the number of texts replaced."""
+    store = get_blob_store()
+    total = 0
+    for path in sorted(glob.glob(os.path.join(data_dir, '**', '*_content.csv'), recursive=True)):
+        packed = pack_content_csv(path, store)
+        if packed:
+            logging.info("Packed %d speech texts of %s", packed, path)
+        total += packed
+    stats = store.stats()
+    logging.info("Packed %d texts: %d new blobs (%d bytes, %d compressed), %d already stored",
+                 total, stats["written"], stats["bytes_in"], stats["bytes_stored"], stats["deduplicated"])
+    return total
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the process-wide blob store of the run directories (BLOB_DIR)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore(config.BLOB_DIR)
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('pack', help="replace the speech texts of all content CSVs by blob references")
+    unpack = commands.add_parser('unpack', help="write a content CSV with the full speech texts")
+    unpack.add_argument('csv_path')
+    unpack.add_argument('output', nargs='?', help="output file (default: <csv_path> with suffix _full.csv)")
+    commands.add_parser('stats', help="show the size of the blob store")
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        pack_all_content_files(config.DATA_DIR)
+    elif args.command == 'unpack':
+        output = args.output or os.path.splitext(args.csv_path)[0] + '_full.csv'
+        rows = unpack_content_csv(args.csv_path, output)
+        print("Wrote %d rows to %s" % (rows, output))
+    else:
+        count, total = get_blob_store().disk_usage()
+        print(json.dumps({"blobs": count, "bytes": total, "codec": 'zstd' if ZSTD_AVAILABLE else 'zlib'}))
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main())
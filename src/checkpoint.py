@@ -0,0 +1,120 @@
+# checkpoint.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import config
+from records import AgendaItem, Question, Speech
+
+JOURNAL_NAME = '.checkpoint.sqlite'
+
+# Record type of the rows journaled per stage
+STAGE_RECORDS = {'agenda': AgendaItem, 'questions': Question, 'speeches': Speech}
+
+
+class CheckpointJournal:
+    """
+    Write-ahead journal of the pages a run has completed, per run directory.
+
+    Every fetched and extracted page is committed to the journal together
+    with its extracted rows before the scraper moves on, so a run that is
+    interrupted (crash, kill, lost connection) loses at most the pages in
+    flight. Rerunning the workflow for the same RUN_DATE takes the rows of
+    journaled pages from the journal instead of fetching them again, and the
+    stages write their complete output from journaled plus new rows.
+
+    Pages are keyed by stage ('agenda', 'questions', 'speeches') and URL.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL: a commit survives the process dying right after it
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS pages (
+                stage TEXT NOT NULL,
+                url TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                completed_at TEXT,
+                PRIMARY KEY (stage, url)
+            );
+        """)
+        self._db.commit()
+
+    def completed(self, stage):
+        """
+        Return the pages of a stage completed so far.
+
+        Returns:
+            dict: URL -> list of the records extracted from it
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT url, rows FROM pages WHERE stage = ?", (stage,)).fetchall()
+        record = STAGE_RECORDS[stage].from_row
+        return {url: [record(row) for row in json.loads(page_rows)] for url, page_rows in rows}
+
+    def record(self, stage, url, rows):
+        """Commit a completed page and its extracted rows (a list of records or dicts, possibly empty)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (stage, url, rows, completed_at) VALUES (?, ?, ?, ?)",
+                (stage, url, json.dumps([dict(row) for row in rows], ensure_ascii=False, default=str),
+                 datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+
+    def forget(self, stage, urls):
+        """Drop pages from the journal, so the next run fetches them again."""
+        with self._lock:
+            self._db.executemany("DELETE FROM pages WHERE stage = ? AND url = ?", [(stage, url) for url in urls])
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT stage, COUNT(*) FROM pages GROUP BY stage").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def split_completed(journal, stage, keys, url_for):
+    """
+    Split keys (meeting IDs, agenda item IDs, links) into those whose page the
+    journal already holds and those still to fetch.
+
+    Args:
+        journal: CheckpointJournal, or None to fetch everything
+        stage: Journal stage of the pages
+        keys: The keys to process, in order
+        url_for: Function mapping a key to its page URL
+
+    Returns:
+        tuple: (dict of key -> journaled rows, list of keys to fetch)
+    """
+    if journal is None:
+        return {}, list(keys)
+    completed = journal.completed(stage)
+    done = {}
+    pending = []
+    for key in keys:
+        url = url_for(key)
+        if url in completed:
+            done[key] = completed[url]
+        else:
+            pending.append(key)
+    if done:
+        logging.info("Resuming %d %s pages from the checkpoint journal", len(done), stage)
+    return done, pending
+
+
+def open_journal(commission_name):
+    """Open the checkpoint journal of the current run of a commission, or None when disabled."""
+    if not config.CHECKPOINT_JOURNAL:
+        return None
+    return CheckpointJournal(os.path.join(config.get_run_dir(commission_name), JOURNAL_NAME))
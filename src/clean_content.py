@@ -3,6 +3,12 @@ import os
 import pandas as pd
 import logging
 import glob
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import config
 
 # Configure logging
 logging.basicConfig(
@@ -10,86 +16,210 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
-def clean_content_csv(csv_path):
+# Speaker whose rows are removed from the content data
+CHAIR_SPEAKER = 'De voorzitter'
+
+
+def keep_row(row):
+    """
+    Return True for content rows that survive cleaning, i.e. rows whose
+    'spreker' is not 'De voorzitter' and whose 'sprekertekst' is not blank.
+
+    Used to filter rows as they are written during scraping, with the same
+    rules clean_content_csv applies to existing files.
+    """
+    if row.get('spreker') == CHAIR_SPEAKER:
+        return False
+    text = row.get('sprekertekst')
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return False
+    return str(text).strip() != ''
+
+
+def filter_rows(rows):
+    """Return the content rows (dicts) that survive cleaning."""
+    return [row for row in rows if keep_row(row)]
+
+
+def _clean_frame(df):
+    """Apply the cleaning rules to a DataFrame read with dtype=str and keep_default_na=False."""
+    if 'spreker' in df.columns:
+        df = df[df['spreker'] != CHAIR_SPEAKER]
+    if 'sprekertekst' in df.columns:
+        df = df[df['sprekertekst'].str.strip() != '']
+    return df
+
+
+class CleanLedger:
+    """
+    Remembers which content files are clean, by their size and modification
+    time at the moment they were cleaned (or written already filtered). A file
+    whose fingerprint still matches is skipped without being read.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS clean_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                cleaned_at TEXT
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _fingerprint(csv_path):
+        stat = os.stat(csv_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def is_clean(self, csv_path):
+        try:
+            fingerprint = self._fingerprint(csv_path)
+        except OSError:
+            return False
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns FROM clean_files WHERE path = ?",
+                                   (os.path.abspath(csv_path),)).fetchone()
+        return row is not None and tuple(row) == fingerprint
+
+    def mark_clean(self, csv_path):
+        size, mtime_ns = self._fingerprint(csv_path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO clean_files VALUES (?, ?, ?, ?)",
+                             (os.path.abspath(csv_path), size, mtime_ns,
+                              datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Return the process-wide ledger of cleaned content files under STATE_DIR."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CleanLedger(os.path.join(config.STATE_DIR, 'clean_ledger.sqlite'))
+        return _ledger
+
+
+def _clean_file(csv_path, chunksize):
+    """
+    Clean one content CSV chunk by chunk into a temporary file, which then
+    replaces the original. Memory use is bounded by the chunk size.
+
+    Returns:
+        int: Number of rows removed
+    """
+    tmp_path = csv_path + '.cleaning'
+    removed = 0
+    # Values are kept as text, so the cleaned file holds exactly the
+    # original values of the remaining rows
+    chunks = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+            header = True
+            for chunk in chunks:
+                cleaned = _clean_frame(chunk)
+                removed += len(chunk) - len(cleaned)
+                cleaned.to_csv(out, index=False, header=header)
+                header = False
+        os.replace(tmp_path, csv_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return removed
+
+
+def _clean_file_task(csv_path, chunksize):
+    # Runs in a worker process: errors are returned instead of raised
+    try:
+        return csv_path, _clean_file(csv_path, chunksize), None
+    except Exception as e:
+        return csv_path, 0, str(e)
+
+
+def clean_content_csv(csv_path, chunksize=None, ledger=None):
     """
     Clean the content CSV file by:
     1. Removing rows where 'spreker' equals 'De voorzitter'
     2. Removing rows where 'sprekertekst' is blank
-    
+
+    Files the ledger knows to be clean already are skipped.
+
     Args:
         csv_path: Path to the content CSV file
-    
+        chunksize: Rows read at a time (default: config.CLEAN_CHUNK_ROWS)
+        ledger: CleanLedger to consult and update (default: get_ledger())
+
     Returns:
         int: Number of rows removed
     """
+    ledger = ledger or get_ledger()
+    if ledger.is_clean(csv_path):
+        logging.info(f"CSV file already clean: {csv_path}")
+        return 0
     logging.info(f"Cleaning CSV file: {csv_path}")
-    
+
     try:
-        # Load the CSV
-        df = pd.read_csv(csv_path)
-        
-        # Skip if empty
-        if df.empty:
-            logging.warning(f"CSV file is empty: {csv_path}")
-            return 0
-        
-        # Store original row count
-        original_count = len(df)
-        
-        # Filter out rows with 'De voorzitter' as speaker
-        # First check if 'spreker' column exists
-        if 'spreker' in df.columns:
-            df = df[df['spreker'] != 'De voorzitter']
-        
-        # Filter out rows with blank speaker text
-        # First check if 'sprekertekst' column exists
-        if 'sprekertekst' in df.columns:
-            # Filter out rows where sprekertekst is NaN, empty string, or only whitespace
-            df = df[~df['sprekertekst'].isna() & 
-                   (df['sprekertekst'].astype(str).str.strip() != '')]
-        
-        # Calculate rows removed
-        rows_removed = original_count - len(df)
-        
-        # Save back to the same file
-        df.to_csv(csv_path, index=False)
-        logging.info(f"Cleaned content data saved ({rows_removed} rows removed)")
-        
-        return rows_removed
-    
+        rows_removed = _clean_file(csv_path, chunksize or config.CLEAN_CHUNK_ROWS)
+    except pd.errors.EmptyDataError:
+        logging.warning(f"CSV file is empty: {csv_path}")
+        return 0
     except Exception as e:
         logging.error(f"Error cleaning content data: {e}")
         return 0
 
-def clean_all_content_files(data_dir):
+    ledger.mark_clean(csv_path)
+    logging.info(f"Cleaned content data saved ({rows_removed} rows removed)")
+    return rows_removed
+
+def clean_all_content_files(data_dir, workers=None, chunksize=None):
     """
     Find and clean all content CSV files in the data directory.
-    
+
+    Files that are clean already are skipped; the others are cleaned in
+    parallel by a pool of worker processes.
+
     Args:
         data_dir: Base directory containing all commission data
-    
+        workers: Number of worker processes (default: config.CLEAN_WORKERS, None = one per CPU)
+        chunksize: Rows read at a time per file (default: config.CLEAN_CHUNK_ROWS)
+
     Returns:
         int: Total number of files processed
     """
     # Find all files ending with _content.csv in the data directory and its subdirectories
     content_files = glob.glob(os.path.join(data_dir, '**', '*_content.csv'), recursive=True)
-    
+
     if not content_files:
         logging.warning(f"No content CSV files found in {data_dir}")
         return 0
-    
-    total_files = 0
+
+    ledger = get_ledger()
+    pending = [path for path in content_files if not ledger.is_clean(path)]
+    logging.info(f"{len(content_files) - len(pending)} of {len(content_files)} content CSV files are already clean")
+
     total_rows_removed = 0
-    
-    for file_path in content_files:
-        rows_removed = clean_content_csv(file_path)
-        total_rows_removed += rows_removed
-        total_files += 1
-    
-    logging.info(f"Processed {total_files} content CSV files, removed {total_rows_removed} rows in total")
-    return total_files
+    if pending:
+        chunksize = chunksize or config.CLEAN_CHUNK_ROWS
+        workers = workers or config.CLEAN_WORKERS or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            for file_path, rows_removed, error in executor.map(
+                    _clean_file_task, pending, [chunksize] * len(pending)):
+                if error:
+                    logging.error(f"Error cleaning content data in {file_path}: {error}")
+                    continue
+                ledger.mark_clean(file_path)
+                total_rows_removed += rows_removed
+
+    logging.info(f"Processed {len(content_files)} content CSV files, removed {total_rows_removed} rows in total")
+    return len(content_files)
 
 if __name__ == '__main__':
-    import config
     data_dir = config.DATA_DIR
-    clean_all_content_files(data_dir)
\ No newline at end of file
+    clean_all_content_files(data_dir)
@@ -0,0 +1,409 @@
+# compaction.py
+"""
+Compaction of the per-run CSV files into one partitioned, deduplicated dataset.
+
+Every run directory data/<commission>/<run date>/ is split into four tables
+with a fixed schema (see SCHEMAS): meetings, agenda_items, questions and
+speeches. IDs are normalized to plain strings ('1873396.0' -> '1873396'),
+dates parsed to ISO, and speech texts stored in the blob store are resolved.
+Questions are read from the run's questions file, since cleaning removes
+them from the content file.
+The tables are written to
+
+    data/compacted/<table>/commission=<commission>/month=<YYYY-MM>/part.parquet
+
+(hive-style partitions, readable with pandas.read_parquet or pyarrow.dataset).
+A row found in several runs is kept once, from the latest run. Only run
+directories that are new or changed since the last compaction are read, and
+only the partitions they touch are rewritten.
+
+    python src/compaction.py            # compact new and changed run directories
+    python src/compaction.py --full     # rebuild the dataset from all runs
+
+Partitions are written with pyarrow. With COMPACTION_FORMAT = 'csv' they
+are written as part.csv with the same schema instead.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import config
+from blob_store import get_blob_store
+from metrics import get_metrics
+from utils import parse_dutch_date
+
+# Column order and types per table; every column not listed as integer is a string
+SCHEMAS = {
+    'meetings': ['commission', 'meeting_id', 'meeting_date', 'date', 'title', 'description', 'view_link',
+                 'watch_link', 'run_date'],
+    'agenda_items': ['commission', 'meeting_id', 'item_id', 'meeting_date', 'card_tag', 'card_title',
+                     'card_document_number', 'card_author', 'verslag_link', 'run_date'],
+    'questions': ['commission', 'question_id', 'item_id', 'meeting_id', 'meeting_date', 'titel', 'link',
+                  'run_date'],
+    'speeches': ['commission', 'question_id', 'speech_link', 'position', 'speech_date', 'datum', 'titel',
+                 'spreker', 'sprekertekst', 'run_date'],
+}
+INTEGER_COLUMNS = {'position'}
+
+# Columns identifying a row; of rows with the same key the latest run wins
+KEYS = {
+    'meetings': ['commission', 'meeting_id'],
+    'agenda_items': ['commission', 'meeting_id', 'item_id'],
+    'questions': ['commission', 'item_id', 'question_id'],
+    'speeches': ['commission', 'speech_link', 'position'],
+}
+
+# Tables whose rows come in pages: a page's rows all come from the latest
+# run that has the page, so a verslag that got shorter leaves no stale rows
+PAGES = {
+    'speeches': ['commission', 'speech_link'],
+}
+
+# Column whose month names the partition of a row (run_date when it is empty)
+PARTITION_DATES = {
+    'meetings': 'meeting_date',
+    'agenda_items': 'meeting_date',
+    'questions': 'meeting_date',
+    'speeches': 'speech_date',
+}
+
+_RUN_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def normalize_id(value):
+    """Return an ID as a plain string: '1873396.0' -> '1873396', missing -> ''."""
+    value = str(value or '').strip()
+    if value.endswith('.0') and value[:-2].isdigit():
+        return value[:-2]
+    return value
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def _column(df, name):
+    return df[name] if name in df.columns else pd.Series([''] * len(df), index=df.index, dtype=object)
+
+
+def _iso_dates(rows, iso_column, text_column):
+    """Return the ISO date column of rows, parsing the Dutch date only in files written before that column."""
+    dates = _column(rows, iso_column).copy()
+    missing = dates == ''
+    if missing.any():
+        dates[missing] = _column(rows, text_column)[missing].map(parse_dutch_date)
+    return dates
+
+
+def run_tables(run_dir, commission, run_date, store=None):
+    """
+    Read one run directory into the four tables.
+
+    Returns:
+        dict: table name -> DataFrame with the table's schema
+    """
+    store = store or get_blob_store()
+    meetings_csv = _read_csv(os.path.join(run_dir, '%s_meetings.csv' % commission))
+    content_csv = _read_csv(os.path.join(run_dir, '%s_content.csv' % commission))
+    # Cleaning removes the questions from the content file; runs keep them in
+    # a questions file. Older runs only have them in an uncleaned content file.
+    questions_csv = _read_csv(os.path.join(run_dir, '%s_questions.csv' % commission))
+
+    # The meetings file holds meeting rows and agenda item rows (data_type 'agenda_item')
+    is_item = _column(meetings_csv, 'data_type') == 'agenda_item'
+    meeting_rows = meetings_csv[~is_item]
+    item_rows = meetings_csv[is_item]
+
+    meetings = pd.DataFrame({
+        'meeting_id': _column(meeting_rows, 'ID').map(normalize_id),
+        'date': _column(meeting_rows, 'date'),
+        'title': _column(meeting_rows, 'title'),
+        'description': _column(meeting_rows, 'description'),
+        'view_link': _column(meeting_rows, 'view_link'),
+        'watch_link': _column(meeting_rows, 'watch_link'),
+        'meeting_date': _iso_dates(meeting_rows, 'meeting_date', 'date'),
+    })
+    meetings = meetings[meetings['meeting_id'] != ''].copy()
+    meeting_dates = dict(zip(meetings['meeting_id'], meetings['meeting_date']))
+
+    agenda_items = pd.DataFrame({
+        'meeting_id': _column(item_rows, 'meeting_ID').map(normalize_id),
+        'item_id': _column(item_rows, 'ID').map(normalize_id),
+        'card_tag': _column(item_rows, 'card__tag'),
+        'card_title': _column(item_rows, 'card__title'),
+        'card_document_number': _column(item_rows, 'card__document_number'),
+        'card_author': _column(item_rows, 'card__author'),
+        'verslag_link': _column(item_rows, 'verslag_link'),
+    })
+    agenda_items['meeting_date'] = agenda_items['meeting_id'].map(meeting_dates).fillna('')
+    item_meetings = dict(zip(agenda_items['item_id'], agenda_items['meeting_id']))
+
+    is_question = _column(content_csv, 'content_type') == 'question'
+    question_rows = questions_csv if len(questions_csv.columns) else content_csv[is_question]
+    speech_rows = content_csv[~is_question & (_column(content_csv, 'sprekertekst') != '')]
+
+    questions = pd.DataFrame({
+        'question_id': _column(question_rows, 'ID').map(normalize_id),
+        'item_id': _column(question_rows, 'original_ID').map(normalize_id),
+        'titel': _column(question_rows, 'titel'),
+        'link': _column(question_rows, 'link'),
+    })
+    questions['meeting_id'] = questions['item_id'].map(item_meetings).fillna('')
+    questions['meeting_date'] = questions['meeting_id'].map(meeting_dates).fillna('')
+
+    speeches = pd.DataFrame({
+        'question_id': _column(speech_rows, 'question_id').map(normalize_id),
+        'speech_link': _column(speech_rows, 'speech_link'),
+        'datum': _column(speech_rows, 'datum'),
+        'titel': _column(speech_rows, 'titel'),
+        'spreker': _column(speech_rows, 'spreker'),
+        'sprekertekst': _column(speech_rows, 'sprekertekst').map(store.resolve),
+        'speech_date': _iso_dates(speech_rows, 'speech_date', 'datum'),
+    })
+    # Older files have no speech_link; the question identifies the verslag page then
+    page = speeches['speech_link'].where(speeches['speech_link'] != '', 'question:' + speeches['question_id'])
+    speeches['speech_link'] = page
+    speeches['position'] = speeches.groupby('speech_link').cumcount()
+
+    tables = {'meetings': meetings, 'agenda_items': agenda_items, 'questions': questions, 'speeches': speeches}
+    for name, table in tables.items():
+        table['commission'] = commission
+        table['run_date'] = run_date
+        tables[name] = conform(table, name)
+    return tables
+
+
+def conform(df, table):
+    """Return df with exactly the columns and types of a table's schema."""
+    columns = SCHEMAS[table]
+    df = df.reindex(columns=columns)
+    for column in columns:
+        if column in INTEGER_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+        else:
+            df[column] = df[column].fillna('').astype(str)
+    return df.reset_index(drop=True)
+
+
+def partition_month(df, table):
+    """Return the partition month ('YYYY-MM') of every row of a table."""
+    dates = df[PARTITION_DATES[table]].where(df[PARTITION_DATES[table]] != '', df['run_date'])
+    return dates.str.slice(0, 7)
+
+
+class CompactionLedger:
+    """
+    Remembers which run directories were compacted, by the size and
+    modification time of their CSV files at the time.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS compacted_runs (
+                run_dir TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                compacted_at TEXT
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def fingerprint(run_dir):
+        files = []
+        for path in sorted(glob.glob(os.path.join(run_dir, '*.csv'))):
+            stat = os.stat(path)
+            files.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+        return json.dumps(files)
+
+    def is_compacted(self, run_dir):
+        with self._lock:
+            row = self._db.execute("SELECT fingerprint FROM compacted_runs WHERE run_dir = ?",
+                                   (os.path.abspath(run_dir),)).fetchone()
+        return row is not None and row[0] == self.fingerprint(run_dir)
+
+    def mark_compacted(self, run_dir, fingerprint):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO compacted_runs VALUES (?, ?, ?)",
+                             (os.path.abspath(run_dir), fingerprint, datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM compacted_runs")
+            self._db.commit()
+
+
+class CompactedDataset:
+    """
+    The partitioned dataset under a root directory.
+
+    Args:
+        root: Directory of the dataset
+        file_format: Format new partitions are written in, 'parquet' or 'csv'
+            (default: config.COMPACTION_FORMAT); partitions of both formats are read
+    """
+    def __init__(self, root, file_format=None):
+        self.root = root
+        self.file_format = file_format or config.COMPACTION_FORMAT
+        if self.file_format not in ('parquet', 'csv'):
+            raise ValueError("Unknown compaction format: %s" % self.file_format)
+        self.suffix = '.' + self.file_format
+
+    def partition_dir(self, table, commission, month):
+        return os.path.join(self.root, table, 'commission=%s' % commission, 'month=%s' % month)
+
+    def partition_files(self, table, commission='*', month='*'):
+        return sorted(glob.glob(os.path.join(self.partition_dir(table, commission, month), 'part.*')))
+
+    def read_partition(self, path, columns=None):
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path, columns=columns)
+        else:
+            df = pd.read_csv(path, dtype=str, keep_default_na=False, usecols=columns)
+        return df
+
+    def write_partition(self, df, table, commission, month):
+        directory = self.partition_dir(table, commission, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'part' + self.suffix)
+        tmp_path = path + '.tmp'
+        if self.file_format == 'parquet':
+            df.to_parquet(tmp_path, engine='pyarrow', compression=config.COMPACTION_COMPRESSION, index=False)
+        else:
+            df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        # A partition written in the other format before is superseded
+        for other in self.partition_files(table, commission, month):
+            if other != path:
+                os.remove(other)
+
+    def merge(self, table, commission, month, new_rows):
+        """Merge rows into a partition, keeping the latest run's row per key; return the partition's size."""
+        existing = [conform(self.read_partition(path), table)
+                    for path in self.partition_files(table, commission, month)]
+        merged = pd.concat(existing + [new_rows], ignore_index=True)
+        if table in PAGES:
+            latest = merged.groupby(PAGES[table])['run_date'].transform('max')
+            merged = merged[merged['run_date'] == latest]
+        merged = merged.sort_values('run_date', kind='stable')
+        merged = merged.drop_duplicates(subset=KEYS[table], keep='last')
+        merged = merged.sort_values(KEYS[table], kind='stable').reset_index(drop=True)
+        self.write_partition(merged, table, commission, month)
+        return len(merged)
+
+
+def find_run_dirs(data_dir):
+    """Return (run directory, commission, run date) of every run under data_dir."""
+    runs = []
+    for commission in sorted(os.listdir(data_dir)):
+        commission_dir = os.path.join(data_dir, commission)
+        if commission.startswith('.') or not os.path.isdir(commission_dir):
+            continue
+        for run_date in sorted(os.listdir(commission_dir)):
+            run_dir = os.path.join(commission_dir, run_date)
+            if _RUN_DATE.match(run_date) and glob.glob(os.path.join(run_dir, '*_meetings.csv')):
+                runs.append((run_dir, commission, run_date))
+    return runs
+
+
+def compact(data_dir=None, output_dir=None, full=False):
+    """
+    Compact the run directories that are new or changed since the last compaction.
+
+    Args:
+        data_dir: Base directory containing all commission data (default: config.DATA_DIR)
+        output_dir: Root of the dataset (default: config.COMPACTED_DIR)
+        full: Rebuild the dataset from all run directories
+
+    Returns:
+        dict: Number of runs compacted and partitions rewritten
+    """
+    started = time.perf_counter()
+    data_dir = data_dir or config.DATA_DIR
+    output_dir = output_dir or config.COMPACTED_DIR
+    dataset = CompactedDataset(output_dir)
+    ledger = CompactionLedger(os.path.join(config.STATE_DIR, 'compaction.sqlite'))
+    if full:
+        ledger.clear()
+        for table in SCHEMAS:
+            shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+
+    pending = [(run_dir, commission, run_date) for run_dir, commission, run_date in find_run_dirs(data_dir)
+               if not ledger.is_compacted(run_dir)]
+    if not pending:
+        logging.info("Compacted dataset is up to date")
+        return {"runs": 0, "partitions": 0}
+
+    # New rows per (table, commission, month); each touched partition is rewritten once
+    fingerprints = {}
+    changes = {}
+    store = get_blob_store()
+    for run_dir, commission, run_date in pending:
+        fingerprints[run_dir] = ledger.fingerprint(run_dir)
+        for table, df in run_tables(run_dir, commission, run_date, store).items():
+            if df.empty:
+                continue
+            for month, rows in df.groupby(partition_month(df, table)):
+                changes.setdefault((table, commission, month), []).append(rows)
+
+    rows_written = 0
+    with get_metrics().phase('write'):
+        for (table, commission, month), frames in sorted(changes.items()):
+            rows_written += dataset.merge(table, commission, month, pd.concat(frames, ignore_index=True))
+    for run_dir, fingerprint in fingerprints.items():
+        ledger.mark_compacted(run_dir, fingerprint)
+    get_metrics().inc('rows_written', rows_written, sink='compacted')
+    logging.info("Compacted %d run directories into %d partitions of %s in %.2fs",
+                 len(pending), len(changes), output_dir, time.perf_counter() - started)
+    return {"runs": len(pending), "partitions": len(changes)}
+
+
+def load_table(table, commission=None, since=None, until=None, columns=None, root=None):
+    """
+    Read a table of the compacted dataset, only opening the partitions and columns asked for.
+
+    Args:
+        table: One of SCHEMAS
+        commission: Only this commission
+        since: Only partitions from this month on ('YYYY-MM')
+        until: Only partitions up to this month ('YYYY-MM')
+        columns: Columns to read (default: all)
+
+    Returns:
+        DataFrame
+    """
+    dataset = CompactedDataset(root or config.COMPACTED_DIR)
+    frames = []
+    for path in dataset.partition_files(table, commission or '*'):
+        month = os.path.basename(os.path.dirname(path))[len('month='):]
+        if (since and month < since) or (until and month > until):
+            continue
+        frames.append(dataset.read_partition(path, columns))
+    if not frames:
+        return pd.DataFrame(columns=columns or SCHEMAS[table])
+    df = pd.concat(frames, ignore_index=True)
+    if columns is None:
+        df = conform(df, table)
+    return df
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help="rebuild the dataset from all run directories")
+    args = parser.parse_args()
+    print(json.dumps(compact(full=args.full)))
@@ -1,26 +1,52 @@
 # config.py
 from datetime import datetime, timedelta
+import contextvars
 import os
 
 # === Base Directories ===
 # Set BASE_DIR to the parent directory of this file.
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+# Indexes and other state shared across runs.
+STATE_DIR = os.path.join(DATA_DIR, '.state')
 
 # Create directories if they do not exist.
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # === Date Configuration ===
-# Calculate date range for the past 7 days (including today).
-today = datetime.today()
-start_date = today - timedelta(days=7)
-end_date = today
+def refresh_dates(now=None):
+    """
+    Calculate the date range for the past 7 days (including today) and the
+    run date. Called on import, and again by long-running processes
+    (daemon.py) when the day changes.
 
-# Use start_date as unique identifier for this run.
-RUN_DATE = start_date.strftime('%Y-%m-%d')
+    Returns:
+        str: The run date
+    """
+    global today, start_date, end_date, RUN_DATE, LAST_7_DAYS_START, LAST_7_DAYS_END
+    today = now or datetime.today()
+    start_date = today - timedelta(days=7)
+    end_date = today
 
-LAST_7_DAYS_START = start_date.strftime('%Y-%m-%d')
-LAST_7_DAYS_END = end_date.strftime('%Y-%m-%d')
+    # Use start_date as unique identifier for this run.
+    RUN_DATE = start_date.strftime('%Y-%m-%d')
+
+    LAST_7_DAYS_START = start_date.strftime('%Y-%m-%d')
+    LAST_7_DAYS_END = end_date.strftime('%Y-%m-%d')
+    return RUN_DATE
+
+refresh_dates()
+
+# Run date of the current thread/task when it differs from RUN_DATE (backfill windows)
+_run_date_context = contextvars.ContextVar('run_date', default=None)
+
+def get_run_date():
+    """Return the run date of the current thread/task (RUN_DATE unless set_run_date was called)."""
+    return _run_date_context.get() or RUN_DATE
+
+def set_run_date(run_date):
+    """Make the current thread/task write to the run directory and storage rows of another run date."""
+    _run_date_context.set(run_date)
 
 # === Commission Configurations ===
 # Each commission has:
@@ -63,7 +89,7 @@ def get_commission_dir(commission_name):
 
 def get_run_dir(commission_name):
     """Get the directory for the current run of a specific commission."""
-    run_dir = os.path.join(get_commission_dir(commission_name), RUN_DATE)
+    run_dir = os.path.join(get_commission_dir(commission_name), get_run_date())
     os.makedirs(run_dir, exist_ok=True)
     return run_dir
 
@@ -75,16 +101,208 @@ def get_content_csv_path(commission_name):
     """Get path for content CSV file."""
     return os.path.join(get_run_dir(commission_name), f"{commission_name}_content.csv")
 
+def get_questions_csv_path(commission_name):
+    """Get path for the questions CSV file (cleaning removes the question rows from the content CSV)."""
+    return os.path.join(get_run_dir(commission_name), f"{commission_name}_questions.csv")
+
 # === Commission-specific URLs ===
-def get_commission_url(commission):
-    """Generate the URL for a specific commission."""
+def get_commission_url(commission, start_date=None, end_date=None):
+    """Generate the listing URL of a commission for a date range (default: the last 7 days)."""
     return BASE_COMMISSION_URL.format(
         commission_id=commission["id"],
-        start_date=LAST_7_DAYS_START,
-        end_date=LAST_7_DAYS_END
+        start_date=start_date or LAST_7_DAYS_START,
+        end_date=end_date or LAST_7_DAYS_END
     )
 
 # === Base URLs for scrapers ===
 BASE_MEETING_URL = "https://www.vlaamsparlement.be/nl/parlementair-werk/commissies/commissievergaderingen/"
 BASE_QUESTIONS_URL = "https://www.vlaamsparlement.be/nl/parlementaire-documenten/vragen-en-interpellaties/"
-BASE_URL_PREFIX = "https://www.vlaamsparlement.be/"
\ No newline at end of file
+BASE_URL_PREFIX = "https://www.vlaamsparlement.be/"
+
+# === Fetch Engine ===
+# Politeness budget per host. The old fixed 1-3 s sleep averaged one request
+# every 2 seconds, so the default rate keeps the same load on the site.
+REQUESTS_PER_SECOND_PER_HOST = 0.5
+REQUEST_BURST = 1
+# Number of requests kept in flight at once, across all commission workers.
+MAX_CONCURRENT_REQUESTS = 4
+# Number of URLs handed to the fetch engine per batch by the scrapers.
+FETCH_BATCH_SIZE = 20
+# Number of commissions whose workflows run in parallel. They share the
+# request limits above, so the total load on the site does not grow.
+MAX_COMMISSION_WORKERS = 3
+# Adapt the request rate per host and the number of requests in flight to
+# the responses (AIMD): every successful, fast response raises them a little,
+# throttling (429), server errors and responses slower than the latency
+# target cut them by AIMD_DECREASE_FACTOR. The rate starts at
+# REQUESTS_PER_SECOND_PER_HOST and stays within the bounds below.
+ADAPTIVE_RATE = True
+MIN_REQUESTS_PER_SECOND_PER_HOST = 0.1
+MAX_REQUESTS_PER_SECOND_PER_HOST = 1.0
+MIN_CONCURRENT_REQUESTS = 1
+# Requests per second added per second of successful requests.
+AIMD_RATE_INCREASE = 0.05
+AIMD_DECREASE_FACTOR = 0.7
+AIMD_LATENCY_TARGET = 5.0
+# Connection errors, timeouts, 429 and 5xx responses are retried with
+# jittered exponential backoff (RETRY_BACKOFF_BASE * 2^attempt, capped),
+# waiting at least as long as a Retry-After header asks (up to RETRY_AFTER_MAX).
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF_BASE = 2.0
+RETRY_BACKOFF_MAX = 60
+RETRY_AFTER_MAX = 300
+# After this many consecutive failed requests to a host, requests to it fail
+# fast for CIRCUIT_RESET_SECONDS before a single probe request is tried.
+CIRCUIT_FAILURE_THRESHOLD = 8
+CIRCUIT_RESET_SECONDS = 120
+# Run the agenda, questions and speeches stages as one streaming pipeline
+# instead of one after the other through the CSV files (main.py --stream).
+STREAMING_PIPELINE = False
+
+# === HTTP Client ===
+# One pooled keep-alive client is shared by all scrapers.
+HTTP_POOL_SIZE = MAX_CONCURRENT_REQUESTS
+HTTP_POOL_HOSTS = 4
+HTTP_TIMEOUT = 30
+# HTTP/2 is used only when enabled here and httpx[http2] is installed.
+HTTP2_ENABLED = False
+
+# === HTML Parsing ===
+# Parser backend: 'selectolax' (fastest), 'lxml' or 'html.parser'. Missing
+# backends fall back to lxml and then to Python's html.parser.
+HTML_PARSER = 'selectolax'
+# Build only the parts of each page the scrapers read (BeautifulSoup backends).
+HTML_SUBTREE_ONLY = True
+
+# === Response Cache ===
+# Responses are cached on disk and revalidated with conditional GETs once
+# their time-to-live (in seconds) has passed.
+CACHE_ENABLED = True
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+CACHE_DEFAULT_TTL = 24 * 3600
+# (URL regex, TTL) pairs per page type; the first matching rule wins.
+CACHE_TTL_RULES = [
+    (r'/verslag/', 30 * 24 * 3600),                    # finished verslag pages rarely change
+    (r'/vergaderingen\?', 3600),                       # commission listing pages
+    (r'/commissievergaderingen/\d+/?$', 12 * 3600),    # meeting pages (agenda may still change)
+    (r'/vragen-en-interpellaties/', 12 * 3600),        # question pages (verslag link appears later)
+]
+
+# === Parse Memo ===
+# Pages whose body is identical to one extracted before (same page type and
+# extraction spec) are not parsed again: their fields and items are taken
+# from this memo. The least recently used entries are dropped beyond
+# PARSE_MEMO_MAX_BYTES.
+PARSE_MEMO_ENABLED = True
+PARSE_MEMO_DB = os.path.join(STATE_DIR, 'parse_memo.sqlite')
+PARSE_MEMO_MAX_BYTES = 200 * 1024 * 1024
+
+# === Storage ===
+# 'sqlite' keeps meetings, agenda items, questions and speeches in an SQLite
+# database with upserts and exports the usual CSVs at the end of each
+# commission workflow; 'csv' reads and writes the CSV files directly.
+STORAGE_BACKEND = 'sqlite'
+STORAGE_DB = os.path.join(DATA_DIR, 'commissions.sqlite')
+# The scrapers write their rows page by page; rows are buffered and written
+# to the CSV files (or read back from the storage backend for the CSV export)
+# this many at a time, so memory does not grow with the size of a run.
+WRITE_BUFFER_ROWS = 1000
+
+# === Content Cleaning ===
+# Rows read at a time when cleaning existing content files, and the number
+# of worker processes for clean_all_content_files (None: one per CPU).
+CLEAN_CHUNK_ROWS = 50000
+CLEAN_WORKERS = None
+
+# === Checkpoints ===
+# Journal every completed page with its extracted rows in the run directory,
+# so rerunning an interrupted run for the same RUN_DATE resumes where it stopped.
+CHECKPOINT_JOURNAL = True
+
+# === Listing Pagination and Backfill ===
+# Listing pages followed per date range before giving up (guards against pager loops).
+LISTING_MAX_PAGES = 100
+# A backfill (backfill.py) splits its date range into windows of this many
+# days. Each window is one run directory named after its first day, and
+# BACKFILL_WORKERS windows are scraped at once within the shared request limits.
+BACKFILL_WINDOW_DAYS = 30
+BACKFILL_WORKERS = 2
+# Windows a backfill has listed and completed, so an interrupted backfill resumes.
+BACKFILL_DB = os.path.join(STATE_DIR, 'backfill.sqlite')
+
+# === Blob Store ===
+# Speech texts of at least BLOB_MIN_BYTES are moved out of the content CSVs
+# into a content-addressed, zstd-compressed store shared by all run
+# directories (blobs compressed with zlib before are still read); the CSVs
+# keep a 'blob:<sha256>' reference. The response cache stores its bodies
+# the same way under CACHE_DIR.
+BLOB_STORE_ENABLED = True
+BLOB_DIR = os.path.join(DATA_DIR, 'blobs')
+BLOB_MIN_BYTES = 256
+BLOB_ZSTD_LEVEL = 10
+
+# === Search Index ===
+# Full-text (SQLite FTS5) index of the speeches in all content CSV files,
+# updated at the end of each run and queried with `python src/search_index.py query`.
+SEARCH_INDEX_ENABLED = True
+SEARCH_DB = os.path.join(DATA_DIR, 'search.sqlite')
+
+# === Compacted Dataset ===
+# After each run the new run directories are merged into one deduplicated
+# dataset with a fixed schema, partitioned by commission and month; see
+# compaction.py. Partitions are Parquet files (pyarrow) compressed with
+# COMPACTION_COMPRESSION; COMPACTION_FORMAT = 'csv' writes CSV files with
+# the same schema instead, for readers without Parquet support.
+COMPACTION_ENABLED = True
+COMPACTED_DIR = os.path.join(DATA_DIR, 'compacted')
+COMPACTION_FORMAT = 'parquet'
+COMPACTION_COMPRESSION = 'zstd'
+
+# === Daemon ===
+# daemon.py keeps one process running with the HTTP pool, caches and indexes
+# open. It polls the listing of each commission every DAEMON_POLL_INTERVAL
+# seconds (a commission entry may set its own "poll_interval"), and every
+# DAEMON_MEETING_DAY_INTERVAL seconds while the listing shows a meeting
+# today. Only newly listed (or changed) meetings go on to the agenda,
+# questions and speeches stages.
+DAEMON_POLL_INTERVAL = 30 * 60
+DAEMON_MEETING_DAY_INTERVAL = 5 * 60
+# The search index is updated after every poll that scraped new meetings;
+# the compacted dataset at most this often (seconds).
+DAEMON_COMPACTION_INTERVAL = 3600
+# Per-commission schedule and results, rewritten after every poll (`python src/daemon.py status`).
+DAEMON_STATUS_FILE = os.path.join(STATE_DIR, 'daemon_status.json')
+
+# === Shared Crawl (URL Frontier) ===
+# frontier.py queues the meeting, question and verslag pages of a crawl in
+# FRONTIER_DB, so several worker processes, or hosts through `frontier.py
+# serve` on FRONTIER_PORT, fetch and extract them. Workers lease
+# FRONTIER_LEASE_BATCH tasks at a time; the tasks of a worker that stops
+# are handed out again after FRONTIER_LEASE_SECONDS. A failed page is tried
+# FRONTIER_MAX_ATTEMPTS times, waiting FRONTIER_RETRY_DELAY seconds before
+# the second attempt and twice as long before each next one.
+FRONTIER_DB = os.path.join(STATE_DIR, 'frontier.sqlite')
+# `frontier.py serve` listens on FRONTIER_HOST only. Workers must send
+# FRONTIER_TOKEN (taken from the environment, so it stays out of this file),
+# and the server refuses to listen on other interfaces than loopback without one.
+FRONTIER_HOST = '127.0.0.1'
+FRONTIER_PORT = 8765
+FRONTIER_TOKEN = os.environ.get('FRONTIER_TOKEN') or None
+FRONTIER_LEASE_BATCH = 8
+FRONTIER_LEASE_SECONDS = 300
+FRONTIER_MAX_ATTEMPTS = 3
+FRONTIER_RETRY_DELAY = 60
+# Requests per second to one host by all workers together, on top of each
+# worker's own rate limits
+FRONTIER_REQUESTS_PER_SECOND = 2.0
+# How long a worker without tasks waits before asking again (seconds)
+FRONTIER_IDLE_SECONDS = 2
+
+# === Metrics ===
+# Each run writes a JSON summary (request latencies, bytes, time per phase,
+# time and rows per stage) to METRICS_DIR and the same values as a Prometheus
+# textfile; point METRICS_TEXTFILE into node_exporter's textfile directory.
+METRICS_ENABLED = True
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+METRICS_TEXTFILE = os.path.join(METRICS_DIR, 'scraper.prom')
@@ -0,0 +1,368 @@
+# daemon.py
+"""
+Long-running scraper that picks up new commission meetings within minutes.
+
+Instead of a cold process per cron run, one process keeps the pooled HTTP
+client, the response cache, the parse memo, the seen index, the storage
+backend and the search index open, and polls the listing of every
+commission on its own schedule: every DAEMON_POLL_INTERVAL seconds (or the
+commission's "poll_interval"), and every DAEMON_MEETING_DAY_INTERVAL
+seconds while its listing shows a meeting today. Listing pages are always
+revalidated with the site, whatever their cache TTL.
+
+Only meetings that are new on the listing (or whose listing fields
+changed) start the agenda, questions and speeches stages, with the usual
+workflow of main.py; the run directory moves to the next run date when the
+day changes. After polls with new meetings the search index is updated,
+and the compacted dataset at most every DAEMON_COMPACTION_INTERVAL seconds.
+
+The schedule and the result of the last poll of every commission are
+written to DAEMON_STATUS_FILE after every poll, and the run metrics to
+METRICS_DIR as usual.
+
+    python src/daemon.py
+    python src/daemon.py --stream --commission omgeving
+    python src/daemon.py status
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+
+import config
+import error_handler
+from checkpoint import open_journal
+from compaction import compact
+from http_cache import get_cache
+from http_client import get_client
+from main import run_commission_workflow
+from metrics import reset_metrics, stage
+from parse_memo import get_parse_memo
+from scrapers import scrape_listing
+from search_index import open_search_index
+from seen_index import meeting_fingerprint, open_seen_index
+from storage import open_storage
+from utils import atomic_output
+
+# Longest the scheduler sleeps before checking for a new day or a stop request
+MAX_SLEEP = 30
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds).isoformat(timespec='seconds') if seconds else None
+
+
+class CommissionSchedule:
+    """Polling schedule of one commission and the meetings the daemon already handed to the workflow."""
+    def __init__(self, commission_id, commission_config):
+        self.commission_id = commission_id
+        self.config = commission_config
+        self.interval = commission_config.get("poll_interval", config.DAEMON_POLL_INTERVAL)
+        self.next_poll = 0.0
+        # meeting ID -> listing fingerprint of the meetings scraped for the
+        # current run date; None until the first poll of the day
+        self.known = None
+        self.meeting_day = False
+        self.polls = 0
+        self.runs = 0
+        self.last_poll = None
+        self.last_listed = 0
+        self.last_new = 0
+        self.last_new_at = None
+        self.last_result = None
+
+    def new_meetings(self, meetings, seen_index):
+        """
+        Return the meetings of a listing that go on to the deeper stages.
+
+        The first poll of a run date queues every meeting that earlier runs
+        did not capture completely; later polls queue only the meetings
+        that are new on the listing or whose listing fields changed.
+
+        Returns:
+            dict: meeting ID -> listing fingerprint
+        """
+        fingerprints = {meeting['ID']: meeting_fingerprint(meeting) for meeting in meetings if meeting['ID']}
+        if self.known is None:
+            new_ids = seen_index.new_meetings(list(fingerprints.items()))
+        else:
+            new_ids = [meeting_id for meeting_id, fingerprint in fingerprints.items()
+                       if self.known.get(meeting_id) != fingerprint]
+        return {meeting_id: fingerprints[meeting_id] for meeting_id in new_ids}
+
+    def poll_interval(self, meetings, today):
+        """Return the seconds until the next poll: shorter while the listing shows a meeting today."""
+        self.meeting_day = any(meeting.meeting_date == today for meeting in meetings)
+        if self.meeting_day:
+            return min(self.interval, config.DAEMON_MEETING_DAY_INTERVAL)
+        return self.interval
+
+    def status(self, running):
+        return {
+            "state": "polling" if running else "idle",
+            "interval_seconds": self.interval,
+            "meeting_day": self.meeting_day,
+            "next_poll": _timestamp(self.next_poll),
+            "last_poll": _timestamp(self.last_poll),
+            "polls": self.polls,
+            "runs": self.runs,
+            "listed_meetings": self.last_listed,
+            "new_meetings": self.last_new,
+            "last_new_meetings_at": _timestamp(self.last_new_at),
+            "last_result": self.last_result,
+        }
+
+
+class ScraperDaemon:
+    """
+    Polls the commission listings and runs the workflow for new meetings.
+
+    Polls of different commissions run in parallel (up to
+    MAX_COMMISSION_WORKERS) within the shared request limits; a commission
+    is never polled twice at once.
+    """
+    def __init__(self, commissions=None, streaming=None):
+        self.streaming = streaming
+        self.metrics = reset_metrics()
+        self.seen_index = open_seen_index()
+        self.storage = open_storage()
+        self.search_index = open_search_index() if config.SEARCH_INDEX_ENABLED else None
+        self.schedules = {commission_id: CommissionSchedule(commission_id, config.COMMISSIONS[commission_id])
+                          for commission_id in commissions or config.COMMISSIONS}
+        self.run_date = config.RUN_DATE
+        self.started = time.time()
+        self.compacted_at = 0.0
+        self._index_pending = False
+        self._compaction_pending = False
+        self._polling = set()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the polls in progress and return from run()."""
+        logging.info("Stopping the daemon after the polls in progress")
+        self._stop.set()
+
+    def _check_day(self):
+        run_date = config.refresh_dates()
+        if run_date != self.run_date:
+            logging.info("New run date %s: rechecking all incomplete meetings", run_date)
+            self.run_date = run_date
+            for schedule in self.schedules.values():
+                schedule.known = None
+
+    def poll(self, schedule, run_date, window):
+        """
+        Poll the listing of one commission and scrape its new meetings.
+
+        Returns:
+            bool: True when the workflow ran for new meetings
+        """
+        error_handler.set_log_context(schedule.commission_id)
+        config.set_run_date(run_date)
+        schedule.polls += 1
+        schedule.last_poll = time.time()
+        interval = schedule.interval
+        outcome = 'error'
+        try:
+            with stage('daemon_poll'):
+                url = config.get_commission_url(schedule.config, *window)
+                meetings, _, complete = scrape_listing(url, max_age=0)
+            if meetings is None:
+                outcome = schedule.last_result = 'listing failed'
+                return False
+            if not complete:
+                logging.warning("Listing of %s is incomplete; continuing with %d meetings",
+                                schedule.commission_id, len(meetings))
+            interval = schedule.poll_interval(meetings, date.fromisoformat(window[1]))
+            schedule.last_listed = len(meetings)
+            new = schedule.new_meetings(meetings, self.seen_index)
+            schedule.last_new = len(new)
+            if not new:
+                outcome = schedule.last_result = 'no new meetings'
+                return False
+
+            logging.info("%d new or changed meetings of %s", len(new), schedule.commission_id)
+            self.metrics.inc('daemon_new_meetings', len(new), commission=schedule.commission_id)
+            changed = [meeting_id for meeting_id in new if schedule.known and meeting_id in schedule.known]
+            if changed:
+                self._forget_meetings(schedule.commission_id, changed)
+            # The whole listing goes to the workflow, so the run's meetings CSV
+            # lists every meeting; meetings captured before are skipped there
+            ok = run_commission_workflow(schedule.config, self.seen_index, self.streaming, self.storage,
+                                         meetings=meetings)
+            schedule.runs += 1
+            if ok:
+                # Failed runs leave their meetings new, so the next poll retries them
+                schedule.known = {**(schedule.known or {}), **new}
+                schedule.last_new_at = time.time()
+            outcome = schedule.last_result = 'scraped' if ok else 'workflow failed'
+            return ok
+        except Exception as e:
+            logging.exception("Error polling %s: %s", schedule.commission_id, e)
+            schedule.last_result = 'error: %s' % e
+            return False
+        finally:
+            schedule.next_poll = time.time() + interval
+            self.metrics.inc('daemon_polls', commission=schedule.commission_id, outcome=outcome)
+            error_handler.set_log_context('-')
+
+    def _forget_meetings(self, commission_name, meeting_ids):
+        # A meeting whose listing changed gets its meeting page fetched again
+        # instead of taken from this run's checkpoint journal
+        journal = open_journal(commission_name)
+        if journal is not None:
+            journal.forget('agenda', [config.BASE_MEETING_URL + meeting_id for meeting_id in meeting_ids])
+            journal.close()
+
+    def _after_polls(self):
+        """Update the search index and the compacted dataset for the polls that scraped new meetings."""
+        if self.search_index is not None and self._index_pending:
+            with stage('search_index'):
+                self.search_index.update(config.DATA_DIR)
+            self._index_pending = False
+        if (config.COMPACTION_ENABLED and self._compaction_pending
+                and time.time() - self.compacted_at >= config.DAEMON_COMPACTION_INTERVAL):
+            with stage('compaction'):
+                compact()
+            self.compacted_at = time.time()
+            self._compaction_pending = False
+
+    def status(self):
+        """Return the schedule and last poll result of every commission, and the state of the caches."""
+        cache = get_cache()
+        memo = get_parse_memo()
+        return {
+            "pid": os.getpid(),
+            "started": _timestamp(self.started),
+            "updated": _timestamp(time.time()),
+            "run_date": self.run_date,
+            "streaming": bool(config.STREAMING_PIPELINE if self.streaming is None else self.streaming),
+            "commissions": {commission_id: schedule.status(commission_id in self._polling)
+                            for commission_id, schedule in self.schedules.items()},
+            "http_pool": get_client().stats(),
+            "response_cache": cache.stats() if cache else None,
+            "parse_memo": memo.stats() if memo else None,
+        }
+
+    def write_status(self):
+        status = self.status()
+        with atomic_output(config.DAEMON_STATUS_FILE) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, indent=2)
+        if config.METRICS_ENABLED:
+            self.metrics.write_reports(extra={"daemon": status})
+
+    def run(self, once=False):
+        """
+        Poll until stop() is called (or, with once, until every commission was polled once).
+
+        Returns:
+            int: Number of polls that scraped new meetings
+        """
+        logging.info("Daemon polling %s (run date %s)", ", ".join(self.schedules), self.run_date)
+        workers = max(1, min(config.MAX_COMMISSION_WORKERS, len(self.schedules)))
+        futures = {}
+        scraped = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='daemon') as executor:
+            while True:
+                if not self._stop.is_set():
+                    self._check_day()
+                    now = time.time()
+                    for schedule in self.schedules.values():
+                        if schedule.commission_id in self._polling or schedule.next_poll > now:
+                            continue
+                        if once and schedule.polls:
+                            continue
+                        self._polling.add(schedule.commission_id)
+                        future = executor.submit(self.poll, schedule, config.RUN_DATE,
+                                                 (config.LAST_7_DAYS_START, config.LAST_7_DAYS_END))
+                        futures[future] = schedule
+                if not futures and (self._stop.is_set() or once):
+                    break
+
+                idle = [schedule.next_poll for schedule in self.schedules.values()
+                        if schedule.commission_id not in self._polling]
+                timeout = min([MAX_SLEEP] + [max(0.0, next_poll - time.time()) for next_poll in idle])
+                if futures:
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    done = set()
+                    self._stop.wait(timeout)
+                for future in done:
+                    schedule = futures.pop(future)
+                    self._polling.discard(schedule.commission_id)
+                    if future.result():
+                        scraped += 1
+                        self._index_pending = self._compaction_pending = True
+                if done:
+                    # Readers of the CSV files see no run in progress
+                    if not futures:
+                        self._after_polls()
+                    self.write_status()
+
+        self._after_polls()
+        self.write_status()
+        return scraped
+
+    def close(self):
+        get_client().log_stats()
+        cache = get_cache()
+        if cache:
+            cache.log_stats()
+        memo = get_parse_memo()
+        if memo:
+            memo.log_stats()
+        if self.search_index is not None:
+            self.search_index.close()
+
+
+def print_status(status_file=None):
+    """Print the status file of a running (or the last) daemon."""
+    status_file = status_file or config.DAEMON_STATUS_FILE
+    if not os.path.exists(status_file):
+        print("No daemon status in %s" % status_file)
+        return 1
+    with open(status_file, encoding='utf-8') as f:
+        status = json.load(f)
+    print("Daemon pid %s, started %s, updated %s, run date %s"
+          % (status["pid"], status["started"], status["updated"], status["run_date"]))
+    print("%-12s %-8s %9s %-11s %-19s %6s %4s %5s  %s" % ("commission", "state", "interval", "meeting day",
+                                                         "next poll", "listed", "new", "runs", "last result"))
+    for commission_id, schedule in sorted(status["commissions"].items()):
+        print("%-12s %-8s %8ds %-11s %-19s %6d %4d %5d  %s"
+              % (commission_id, schedule["state"], schedule["interval_seconds"],
+                 "yes" if schedule["meeting_day"] else "no", schedule["next_poll"] or "-",
+                 schedule["listed_meetings"], schedule["new_meetings"], schedule["runs"],
+                 schedule["last_result"] or "-"))
+    memo = status.get("parse_memo")
+    if memo:
+        print("Parse memo hit rate: %.1f%%" % (100 * memo["hit_rate"]))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', choices=('run', 'status'), default='run',
+                        help="run the daemon (default) or print the status of a running one")
+    parser.add_argument('--commission', action='append', choices=sorted(config.COMMISSIONS),
+                        help="commission to poll (repeatable; default: all configured)")
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help="run the agenda, questions and speeches stages as a streaming pipeline")
+    parser.add_argument('--once', action='store_true', help="poll every commission once and exit")
+    args = parser.parse_args()
+    if args.command == 'status':
+        sys.exit(print_status())
+
+    daemon = ScraperDaemon(args.commission, args.stream)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run(once=args.once)
+    finally:
+        daemon.close()
@@ -3,8 +3,32 @@ import os
 import sys
 import logging
 import traceback
+import contextvars
 from datetime import datetime
 
+# Commission being processed by the current thread/task, shown in every log line
+_commission_context = contextvars.ContextVar('commission', default='-')
+
+class CommissionContextFilter(logging.Filter):
+    """
+    Add the commission of the current workflow to each log record
+    """
+    def filter(self, record):
+        record.commission = _commission_context.get()
+        return True
+
+def set_log_context(commission_name):
+    """
+    Tag all log lines of the current thread/task with a commission name
+    """
+    _commission_context.set(commission_name)
+
+def get_log_context():
+    """
+    Return the commission the current thread/task is working on ('-' if none)
+    """
+    return _commission_context.get()
+
 def setup_error_logging():
     """
     Set up error logging to both console and file
@@ -16,14 +40,19 @@ def setup_error_logging():
     today = datetime.today().strftime('%Y-%m-%d')
     log_file = f'logs/scraper_{today}.log'
     
-    # Configure logging
+    # Configure logging; every line carries the commission it belongs to,
+    # since commissions are processed in parallel
+    handlers = [
+        logging.FileHandler(log_file),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.addFilter(CommissionContextFilter())
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+        format="%(asctime)s [%(levelname)s] [%(commission)s] %(message)s",
+        handlers=handlers,
+        force=True  # replace the console-only setup done by utils on import
     )
     
     # Log start of script
@@ -0,0 +1,233 @@
+# extraction_specs.py
+import hashlib
+from collections import namedtuple
+
+
+def last_path_segment(link):
+    """Extract the ID from a URL (the portion after the final '/')"""
+    return link.rstrip('/').split('/')[-1] if link else ''
+
+
+class Field:
+    """
+    Declarative description of one extracted value.
+
+    Args:
+        name: Output column name
+        selector: CSS selector relative to the page/item, or a tuple of
+            selectors applied one after the other (first match at each step).
+            None means the page/item element itself.
+        attr: Read this attribute instead of the text
+        separator: Separator used to join text nodes
+        strip: Strip the text nodes (and attribute values)
+        remove: Selector of a child element to remove before reading the text
+        prefer: Selector of a child whose text is used instead, when present
+        compute: Function of the record built so far, for derived fields
+        keep: Whether the field is part of the output record
+    """
+    def __init__(self, name, selector=None, attr=None, separator="", strip=True,
+                 remove=None, prefer=None, compute=None, keep=True):
+        self.name = name
+        self.selector = selector
+        self.attr = attr
+        self.separator = separator
+        self.strip = strip
+        self.remove = remove
+        self.prefer = prefer
+        self.compute = compute
+        self.keep = keep
+
+
+# Result of applying a PageSpec. `fields` is None when the page root was not
+# found; `items` is None when the item container was not found.
+PageData = namedtuple('PageData', ['fields', 'items'])
+
+
+class PageSpec:
+    """
+    Declarative extraction spec for one page type.
+
+    Args:
+        name: Page type name
+        fields: Page-level Fields
+        root: Selector of the element page-level fields are read from
+        container: Selector of the element that holds the repeated items
+        items: Selector of the repeated items (e.g. cards or speeches)
+        item_fields: Fields read from each item
+
+    The spec is compiled once per parser backend (html_parser.Node type)
+    into plain extractor functions with precompiled selectors, and then
+    applied to every page in a single pass over its items.
+    """
+    def __init__(self, name, fields=(), root=None, container=None, items=None, item_fields=()):
+        self.name = name
+        self.fields = list(fields)
+        self.root = root
+        self.container = container
+        self.items = items
+        self.item_fields = list(item_fields)
+        self._compiled = {}
+
+    def compile(self, node_type):
+        """Return the spec compiled for a Node type (i.e. a parser backend)."""
+        compiled = self._compiled.get(node_type)
+        if compiled is None:
+            compiled = _CompiledSpec(self, node_type.compile)
+            self._compiled[node_type] = compiled
+        return compiled
+
+    def extract(self, doc):
+        """Apply the spec to a parsed document (html_parser.Node)."""
+        return self.compile(type(doc)).extract(doc)
+
+    def signature(self):
+        """
+        Return a hash of the spec's definition: it changes whenever a
+        selector, an option or the code of a computed field changes, so
+        rows memoized under an older spec are not reused (see parse_memo.py).
+        """
+        parts = [self.name, self.root, self.container, self.items]
+        for field in self.fields + self.item_fields:
+            code = field.compute.__code__ if field.compute is not None else None
+            parts.append((field.name, field.selector, field.attr, field.separator, field.strip, field.remove,
+                          field.prefer, field.keep,
+                          (code.co_code, code.co_consts, code.co_names) if code is not None else None))
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _compile_field(field, compile_selector):
+    if field.compute is not None:
+        return field.name, field.keep, None, field.compute
+    selector = field.selector
+    if selector is None:
+        selector = ()
+    elif isinstance(selector, str):
+        selector = (selector,)
+    steps = tuple(compile_selector(step) for step in selector)
+    remove = compile_selector(field.remove) if field.remove else None
+    prefer = compile_selector(field.prefer) if field.prefer else None
+    attr, separator, strip = field.attr, field.separator, field.strip
+
+    def extract(node):
+        for step in steps:
+            node = node.select_one(step)
+            if node is None:
+                return ""
+        if attr is not None:
+            value = node.get(attr, "") or ""
+            return value.strip() if strip else value
+        if remove is not None:
+            removed = node.select_one(remove)
+            if removed is not None:
+                removed.decompose()
+        if prefer is not None:
+            preferred = node.select_one(prefer)
+            if preferred is not None:
+                node = preferred
+        return node.get_text(separator, strip=strip)
+
+    return field.name, field.keep, extract, None
+
+
+class _CompiledSpec:
+    def __init__(self, spec, compile_selector):
+        self.root = compile_selector(spec.root) if spec.root else None
+        self.container = compile_selector(spec.container) if spec.container else None
+        self.items = compile_selector(spec.items) if spec.items else None
+        self.fields = [_compile_field(field, compile_selector) for field in spec.fields]
+        self.item_fields = [_compile_field(field, compile_selector) for field in spec.item_fields]
+
+    @staticmethod
+    def _record(node, fields):
+        record = {}
+        hidden = []
+        for name, keep, extract, compute in fields:
+            record[name] = extract(node) if extract is not None else compute(record)
+            if not keep:
+                hidden.append(name)
+        for name in hidden:
+            del record[name]
+        return record
+
+    def extract(self, doc):
+        root = doc
+        if self.root is not None:
+            root = doc.select_one(self.root)
+            if root is None:
+                return PageData(None, None)
+        fields = self._record(root, self.fields)
+        if self.items is None:
+            return PageData(fields, [])
+        parent = doc
+        if self.container is not None:
+            parent = doc.select_one(self.container)
+            if parent is None:
+                return PageData(fields, None)
+        items = [self._record(item, self.item_fields) for item in parent.select(self.items)]
+        return PageData(fields, items)
+
+
+# === Page specs ===
+
+# Commission listing page: one record per meeting card, and the link to the
+# next page of the listing (empty on the last page)
+LISTING_SPEC = PageSpec(
+    'listing',
+    fields=[
+        Field('next_page', 'li.pager__item--next a', attr='href'),
+    ],
+    items='article.card.meeting-card',
+    item_fields=[
+        Field('date', ('header.card__header', 'span.card__date')),
+        Field('title_h4', ('header.card__header', 'h4.card__title'), keep=False),
+        Field('title_h5', ('header.card__header', 'h5.card__title'), keep=False),
+        Field('title', compute=lambda r: r['title_h4'] + ((" - " + r['title_h5']) if r['title_h5'] else "")),
+        Field('description', 'div.card__description p'),
+        Field('view_link', 'li.card__link.card__link-view a', attr='href', strip=False),
+        Field('watch_link', 'li.card__link.card__link-watch a', attr='href', strip=False),
+        Field('ID', compute=lambda r: last_path_segment(r['view_link'])),
+    ],
+)
+
+# Meeting detail page: one record per agenda item card
+MEETING_SPEC = PageSpec(
+    'meeting',
+    items='article.card.document-type--report.document-subtype--journal_item',
+    item_fields=[
+        Field('card__tag', 'h4.card__tag'),
+        Field('card__title', 'p.card__title'),
+        Field('card__document_number', 'span.card__document-number'),
+        Field('card__author', 'p.card__author'),
+        Field('verslag_link', 'li.card__link.card__link-view.internal a', attr='href'),
+        Field('ID', compute=lambda r: last_path_segment(r['verslag_link'])),
+    ],
+)
+
+# Question/interpellation page: a single record
+QUESTION_SPEC = PageSpec(
+    'question',
+    root='div.page-layout__content',
+    fields=[
+        Field('titel', 'h2.page-subtitle'),
+        Field('link', 'a[class="button button-primary header-links-icon--report"]', attr='href'),
+        Field('ID', compute=lambda r: last_path_segment(r['link'])),
+    ],
+)
+
+# Verslag page: page-level title and date, one record per speech
+VERSLAG_SPEC = PageSpec(
+    'verslag',
+    fields=[
+        Field('titel', ('header.card__header', 'p.card__title'), remove='span.visually-hidden'),
+        Field('datum', 'date.meeting-header__date-full'),
+    ],
+    container='div.meeting-speeches__list',
+    # Any div with a class containing "meeting-speech"
+    items='div[class*="meeting-speech"]',
+    item_fields=[
+        Field('spreker', 'div.meeting-speech__title', prefer='a'),
+        Field('sprekertekst', 'div.meeting-speech__value', separator=" "),
+    ],
+)
+
+PAGE_SPECS = {spec.name: spec for spec in (LISTING_SPEC, MEETING_SPEC, QUESTION_SPEC, VERSLAG_SPEC)}
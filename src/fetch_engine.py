@@ -0,0 +1,71 @@
+# fetch_engine.py
+import asyncio
+import logging
+
+import config
+from metrics import get_metrics
+from rate_limiter import get_limiter
+from request_helper import cached_response, send_request
+
+
+class FetchEngine:
+    """
+    Fetches many URLs concurrently while staying within the per-host rate limit.
+
+    Up to `max_concurrency` requests are kept in flight. Each request first
+    takes a token from the shared per-host bucket, so the overall request
+    rate is the same as with sequential fetching; only the waiting overlaps.
+    """
+    def __init__(self, max_concurrency=None, limiter=None):
+        self.max_concurrency = max_concurrency or config.MAX_CONCURRENT_REQUESTS
+        self.limiter = limiter or get_limiter()
+
+    async def fetch(self, url, semaphore):
+        """Fetch a single URL. Returns the response, or None on failure."""
+        # Fresh cache hits need neither a request slot nor a token
+        response = cached_response(url)
+        if response is not None:
+            return response
+        async with semaphore:
+            get_metrics().add_phase('sleep', await self.limiter.acquire_async(url))
+            return await asyncio.to_thread(send_request, url)
+
+    async def fetch_many(self, urls):
+        """Fetch all URLs concurrently and return the responses in input order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self.fetch(url, semaphore) for url in urls))
+
+    def fetch_all(self, urls):
+        """Synchronous wrapper around fetch_many for use by the scrapers."""
+        urls = list(urls)
+        if not urls:
+            return []
+        return asyncio.run(self.fetch_many(urls))
+
+    def iter_fetch(self, urls, batch_size=None):
+        """
+        Fetch URLs in batches and yield (url, response) pairs in input order.
+
+        Args:
+            urls: The URLs to fetch
+            batch_size: Number of URLs fetched concurrently per batch
+
+        Yields:
+            Tuples of (url, response); response is None if the request failed
+        """
+        urls = list(urls)
+        batch_size = batch_size or config.FETCH_BATCH_SIZE
+        for start in range(0, len(urls), batch_size):
+            batch = urls[start:start + batch_size]
+            logging.info("Fetching batch of %d URLs (%d-%d of %d)",
+                         len(batch), start + 1, start + len(batch), len(urls))
+            responses = self.fetch_all(batch)
+            for index, url in enumerate(batch):
+                # Hand each response over, so the batch list does not keep its body alive
+                response, responses[index] = responses[index], None
+                yield url, response
+
+
+def iter_fetch(urls, batch_size=None):
+    """Fetch URLs in batches with the default engine. See FetchEngine.iter_fetch."""
+    return FetchEngine().iter_fetch(urls, batch_size=batch_size)
@@ -0,0 +1,775 @@
+# frontier.py
+"""
+Shared URL frontier, so several worker processes or hosts can split one crawl.
+
+A crawl is seeded by listing the commissions (the last 7 days, or a date
+range in windows as in backfill.py): the meetings are saved to their run
+directory as usual and a fetch task is queued for every meeting page that
+earlier runs did not capture completely. Workers lease tasks, fetch the
+page within a request budget per host that all workers share
+(FRONTIER_REQUESTS_PER_SECOND, on top of their own rate limits), run the
+scrapers' extractors and hand back the rows together with the follow-up
+tasks: the question page of every agenda item and the verslag page of every
+question. Tasks of a worker that dies are handed out again once their
+lease expires; failed tasks are retried with a growing delay.
+
+Once all tasks of a run are done, `merge` writes the rows to the run's
+meetings and content CSVs (or the storage backend), updates the seen index
+and cleans and packs the output as the normal workflow does.
+
+The frontier is an SQLite database (FRONTIER_DB) that processes on one host
+share directly; workers on other hosts reach it through `serve`.
+
+    python src/frontier.py seed --start 2019-01-01 --end 2024-12-31
+    python src/frontier.py work --processes 4
+    FRONTIER_TOKEN=... python src/frontier.py serve --host 0.0.0.0 --port 8765    # on the coordinator
+    FRONTIER_TOKEN=... python src/frontier.py work --frontier http://coordinator:8765 --processes 4
+    python src/frontier.py merge
+    python src/frontier.py crawl --start 2024-01-01 --end 2024-06-30 --processes 4
+    python src/frontier.py stats
+"""
+import argparse
+import csv
+import hmac
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+import config
+import error_handler
+from agenda_scraper import AgendaScraper
+from backfill import assign_meetings, date_windows, list_window
+from clean_content import filter_rows, get_ledger
+from compaction import compact
+from main import finish_run, save_meetings
+from metrics import get_metrics
+from questions_scraper import QUESTION_FIELDNAMES, QuestionsScraper
+from records import AgendaItem, Question, Speech
+from request_helper import make_request
+from search_index import update_search_index
+from seen_index import meeting_fingerprint, open_seen_index
+from speeches_scraper import SpeechesScraper
+from storage import COMBINED_FIELDNAMES, CONTENT_FIELDNAMES, open_storage
+from utils import BufferedCsvWriter
+
+# Task kinds, in the order workers prefer them: finishing the pages of
+# meetings already started keeps the frontier small and runs mergeable early
+TASK_KINDS = ('verslag', 'question', 'meeting')
+TASK_RECORDS = {'meeting': AgendaItem, 'question': Question, 'verslag': Speech}
+
+# Frontier methods workers call, also over HTTP (see FrontierServer)
+WORKER_METHODS = ('lease', 'complete', 'fail', 'reserve', 'open_tasks', 'stats')
+
+
+class Frontier:
+    """
+    Fetch tasks of a crawl in SQLite, shared by the processes that open the
+    same database file.
+
+    A task is one page (kind 'meeting', 'question' or 'verslag') of one run
+    (commission and run date); it is pending, leased to a worker until its
+    lease expires, done with its extracted rows, or failed after
+    FRONTIER_MAX_ATTEMPTS attempts. Every state change is one IMMEDIATE
+    transaction, so two workers never lease the same task.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Transactions are explicit (BEGIN IMMEDIATE); other processes wait for the write lock
+        self._db = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS runs (
+                commission TEXT NOT NULL,
+                run_date TEXT NOT NULL,
+                seeded_at TEXT,
+                merged_at TEXT,
+                PRIMARY KEY (commission, run_date)
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                commission TEXT NOT NULL,
+                run_date TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                parent_id INTEGER,
+                params TEXT NOT NULL DEFAULT '{}',
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                rows TEXT,
+                error TEXT,
+                updated_at REAL,
+                UNIQUE (commission, run_date, kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, not_before);
+            CREATE INDEX IF NOT EXISTS idx_tasks_run ON tasks (commission, run_date, state);
+            CREATE TABLE IF NOT EXISTS budget (
+                host TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            );
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    @staticmethod
+    def _insert(db, tasks, parent_id=None):
+        inserted = 0
+        for task in tasks:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO tasks (commission, run_date, kind, key, url, parent_id, params, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (task["commission"], task["run_date"], task["kind"], task["key"], task["url"], parent_id,
+                 json.dumps(task.get("params") or {}), time.time()))
+            inserted += cursor.rowcount
+        return inserted
+
+    # --- Coordinator ---------------------------------------------------------
+
+    def add_run(self, commission, run_date, tasks):
+        """
+        Queue the meeting tasks of a run. A run that was merged before is
+        merged again once its new tasks are done.
+
+        Returns:
+            int: Number of tasks queued (tasks already in the frontier are kept as they are)
+        """
+        with self._transaction() as db:
+            db.execute("INSERT INTO runs (commission, run_date, seeded_at) VALUES (?, ?, ?) "
+                       "ON CONFLICT(commission, run_date) DO UPDATE SET seeded_at = excluded.seeded_at, "
+                       "merged_at = NULL",
+                       (commission, run_date, datetime.now().isoformat(timespec='seconds')))
+            return self._insert(db, tasks)
+
+    def mergeable_runs(self):
+        """Return the (commission, run date) of the runs whose tasks are all done or failed and not merged yet."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT commission, run_date FROM runs r WHERE merged_at IS NULL AND NOT EXISTS "
+                "(SELECT 1 FROM tasks t WHERE t.commission = r.commission AND t.run_date = r.run_date "
+                "AND t.state IN ('pending', 'leased')) ORDER BY commission, run_date").fetchall()
+
+    def results(self, commission, run_date):
+        """
+        Return the done tasks of a run in the order they were queued.
+
+        Returns:
+            list of dicts with task_id, kind, key, url, parent_id, params and rows
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT task_id, kind, key, url, parent_id, params, rows FROM tasks "
+                "WHERE commission = ? AND run_date = ? AND state = 'done' ORDER BY task_id",
+                (commission, run_date)).fetchall()
+        return [{"task_id": task_id, "kind": kind, "key": key, "url": url, "parent_id": parent_id,
+                 "params": json.loads(params), "rows": json.loads(task_rows or '[]')}
+                for task_id, kind, key, url, parent_id, params, task_rows in rows]
+
+    def failed_count(self, commission, run_date):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tasks WHERE commission = ? AND run_date = ? "
+                                    "AND state = 'failed'", (commission, run_date)).fetchone()[0]
+
+    def mark_merged(self, commission, run_date):
+        with self._transaction() as db:
+            db.execute("UPDATE runs SET merged_at = ? WHERE commission = ? AND run_date = ?",
+                       (datetime.now().isoformat(timespec='seconds'), commission, run_date))
+
+    def retry_failed(self):
+        """Queue the failed tasks again; their runs are merged again once they are done."""
+        with self._transaction() as db:
+            db.execute("UPDATE runs SET merged_at = NULL WHERE EXISTS (SELECT 1 FROM tasks t WHERE "
+                       "t.commission = runs.commission AND t.run_date = runs.run_date AND t.state = 'failed')")
+            return db.execute("UPDATE tasks SET state = 'pending', attempts = 0, not_before = 0, updated_at = ? "
+                              "WHERE state = 'failed'", (time.time(),)).rowcount
+
+    # --- Workers -------------------------------------------------------------
+
+    def lease(self, worker, limit):
+        """
+        Lease up to `limit` tasks that are due, including tasks whose lease
+        expired. Tasks that used up their attempts are marked failed instead.
+
+        Returns:
+            list of task dicts (task_id, commission, run_date, kind, key, url, params)
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT task_id, commission, run_date, kind, key, url, params, attempts FROM tasks "
+                "WHERE (state = 'pending' AND not_before <= ?) OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY CASE kind WHEN 'verslag' THEN 0 WHEN 'question' THEN 1 ELSE 2 END, task_id LIMIT ?",
+                (now, now, limit)).fetchall()
+            tasks = []
+            for task_id, commission, run_date, kind, key, url, params, attempts in rows:
+                if attempts >= config.FRONTIER_MAX_ATTEMPTS:
+                    db.execute("UPDATE tasks SET state = 'failed', lease_owner = NULL, updated_at = ?, "
+                               "error = COALESCE(error, 'lease expired') WHERE task_id = ?", (now, task_id))
+                    continue
+                db.execute("UPDATE tasks SET state = 'leased', lease_owner = ?, lease_expires = ?, "
+                           "attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                           (worker, now + config.FRONTIER_LEASE_SECONDS, now, task_id))
+                tasks.append({"task_id": task_id, "commission": commission, "run_date": run_date, "kind": kind,
+                              "key": key, "url": url, "params": json.loads(params)})
+        return tasks
+
+    def complete(self, task_id, worker, rows, children=()):
+        """
+        Store the rows extracted from a task's page and queue its follow-up tasks.
+
+        Returns:
+            bool: False when the worker's lease was lost and another worker owns the task
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT state, lease_owner FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None or row != ('leased', worker):
+                return False
+            db.execute("UPDATE tasks SET state = 'done', rows = ?, error = NULL, lease_owner = NULL, "
+                       "lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+                       (json.dumps(rows, ensure_ascii=False), time.time(), task_id))
+            self._insert(db, children, parent_id=task_id)
+        return True
+
+    def fail(self, task_id, worker, error):
+        """
+        Record a failed attempt: the task is retried after a delay that
+        doubles with every attempt, or marked failed after the last one.
+
+        Returns:
+            str: The task's new state
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts, lease_owner FROM tasks WHERE task_id = ? AND state = 'leased'",
+                             (task_id,)).fetchone()
+            if row is None or row[1] != worker:
+                return 'lost'
+            attempts = row[0]
+            if attempts >= config.FRONTIER_MAX_ATTEMPTS:
+                state, not_before = 'failed', 0
+            else:
+                state, not_before = 'pending', now + config.FRONTIER_RETRY_DELAY * 2 ** (attempts - 1)
+            db.execute("UPDATE tasks SET state = ?, not_before = ?, error = ?, lease_owner = NULL, "
+                       "lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+                       (state, not_before, str(error), now, task_id))
+        return state
+
+    def reserve(self, host):
+        """
+        Take the next request slot of a host from the budget all workers share.
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        now = time.time()
+        interval = 1.0 / config.FRONTIER_REQUESTS_PER_SECOND
+        with self._transaction() as db:
+            row = db.execute("SELECT next_at FROM budget WHERE host = ?", (host,)).fetchone()
+            slot = max(now, row[0] if row else now)
+            db.execute("INSERT OR REPLACE INTO budget (host, next_at) VALUES (?, ?)", (host, slot + interval))
+        return slot - now
+
+    def open_tasks(self):
+        """Return the number of tasks still pending or leased."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state").fetchall()
+            runs = self._db.execute("SELECT COUNT(*), COUNT(merged_at) FROM runs").fetchone()
+            retried = self._db.execute("SELECT COUNT(*) FROM tasks WHERE attempts > 1").fetchone()[0]
+        tasks = defaultdict(dict)
+        for kind, state, count in rows:
+            tasks[kind][state] = count
+        # Tasks leased more than once: failed attempts and expired leases
+        return {"tasks": dict(tasks), "retried": retried, "runs": runs[0], "merged_runs": runs[1]}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RemoteFrontier:
+    """Client for a frontier served by `frontier.py serve`, with the methods workers use."""
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self._session = requests.Session()
+        token = token or config.FRONTIER_TOKEN
+        if token:
+            self._session.headers['Authorization'] = 'Bearer ' + token
+
+    def _call(self, method, **kwargs):
+        response = self._session.post("%s/%s" % (self.base_url, method), json=kwargs, timeout=config.HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def lease(self, worker, limit):
+        return self._call('lease', worker=worker, limit=limit)
+
+    def complete(self, task_id, worker, rows, children=()):
+        return self._call('complete', task_id=task_id, worker=worker, rows=rows, children=list(children))
+
+    def fail(self, task_id, worker, error):
+        return self._call('fail', task_id=task_id, worker=worker, error=error)
+
+    def reserve(self, host):
+        return self._call('reserve', host=host)
+
+    def open_tasks(self):
+        return self._call('open_tasks')
+
+    def stats(self):
+        return self._call('stats')
+
+    def close(self):
+        self._session.close()
+
+
+def _is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def open_frontier(location=None):
+    """Open the frontier at a database path or the URL of `frontier.py serve` (default: FRONTIER_DB)."""
+    location = location or config.FRONTIER_DB
+    if location.startswith(('http://', 'https://')):
+        return RemoteFrontier(location)
+    return Frontier(location)
+
+
+class FrontierServer:
+    """
+    Serves the worker methods of a frontier as JSON over HTTP (POST
+    /<method> with the arguments as a JSON object), for workers on other hosts.
+
+    Every call must carry the shared token ("Authorization: Bearer <token>")
+    when one is set. Without a token the server only listens on loopback:
+    completed rows end up in the published output.
+    """
+    def __init__(self, frontier, host=None, port=None, token=None):
+        host = host or config.FRONTIER_HOST
+        self.token = token or config.FRONTIER_TOKEN
+        if not self.token and not _is_loopback(host):
+            raise ValueError("Set FRONTIER_TOKEN to serve the frontier on %s; without it only loopback is allowed"
+                             % host)
+        self.frontier = frontier
+        self.httpd = ThreadingHTTPServer((host, config.FRONTIER_PORT if port is None else port), self._handler())
+        public = host in ('', '0.0.0.0', '::')
+        self.base_url = "http://%s:%d" % (socket.gethostname() if public else host, self.httpd.server_address[1])
+
+    def _handler(self):
+        frontier = self.frontier
+        expected = ('Bearer ' + self.token).encode('utf-8') if self.token else None
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if expected is not None and not hmac.compare_digest(
+                        (self.headers.get('Authorization') or '').encode('utf-8'), expected):
+                    self._reply(401, {"error": "missing or wrong frontier token"})
+                    return
+                method = self.path.strip('/')
+                if method not in WORKER_METHODS:
+                    self._reply(404, {"error": "unknown method %s" % method})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    kwargs = json.loads(self.rfile.read(length) or b'{}')
+                    self._reply(200, getattr(frontier, method)(**kwargs))
+                except Exception as e:
+                    logging.exception("Error in frontier call %s: %s", method, e)
+                    self._reply(500, {"error": str(e)})
+
+            def _reply(self, status, result):
+                body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        logging.info("Serving the frontier %s on %s", self.frontier.db_path, self.base_url)
+        self.httpd.serve_forever()
+
+
+# --- Seeding -----------------------------------------------------------------
+
+def meeting_task(commission, run_date, meeting):
+    meeting_id = meeting['ID']
+    return {"commission": commission, "run_date": run_date, "kind": 'meeting', "key": meeting_id,
+            "url": config.BASE_MEETING_URL + meeting_id, "params": {"fingerprint": meeting_fingerprint(meeting)}}
+
+
+def seed(frontier, start_date=None, end_date=None, commissions=None, window_days=None, full=False):
+    """
+    List the commissions and queue the meeting pages of the crawl.
+
+    Without a start date the crawl covers the last 7 days as one run, like
+    main.py; with one the date range is split into windows as in a backfill.
+
+    Returns:
+        int: Number of meeting tasks queued
+    """
+    seen_index = open_seen_index(full=full)
+    storage = open_storage()
+    commissions = commissions or list(config.COMMISSIONS)
+    if start_date:
+        windows = date_windows(start_date, end_date or config.LAST_7_DAYS_END,
+                               window_days or config.BACKFILL_WINDOW_DAYS)
+    else:
+        windows = [(config.LAST_7_DAYS_START, config.LAST_7_DAYS_END)]
+    queued = 0
+    with ThreadPoolExecutor(max_workers=max(1, config.BACKFILL_WORKERS), thread_name_prefix='seed') as executor:
+        for commission_id in commissions:
+            commission_config = config.COMMISSIONS[commission_id]
+            commission_name = commission_config["name"]
+            listings = executor.map(lambda window: list_window(commission_id, commission_config, window), windows)
+            listed = [(window, meetings) for window, meetings in zip(windows, listings) if meetings is not None]
+            if len(listed) < len(windows):
+                logging.error("%s: %d windows could not be listed; seed again to retry them", commission_id,
+                              len(windows) - len(listed))
+            for window, meetings in assign_meetings(listed).items():
+                if not meetings:
+                    continue
+                run_date = window[0] if start_date else config.RUN_DATE
+                config.set_run_date(run_date)
+                meetings = save_meetings(commission_name, meetings, config.get_meetings_csv_path(commission_name),
+                                         storage)
+                new_ids = set(seen_index.new_meetings([(meeting['ID'], meeting_fingerprint(meeting))
+                                                       for meeting in meetings if meeting['ID']]))
+                tasks = [meeting_task(commission_name, run_date, meeting) for meeting in meetings
+                         if meeting['ID'] in new_ids]
+                if tasks:
+                    count = frontier.add_run(commission_name, run_date, tasks)
+                    queued += count
+                    logging.info("%s %s: queued %d of %d meetings", commission_name, run_date, count, len(meetings))
+    error_handler.set_log_context('-')
+    config.set_run_date(None)
+    logging.info("Seeded the frontier with %d meeting pages", queued)
+    return queued
+
+
+# --- Workers -----------------------------------------------------------------
+
+class FrontierWorker:
+    """
+    Leases tasks from a frontier, fetches and extracts their pages with the
+    scrapers' extractors and hands back the rows and follow-up tasks.
+
+    A worker runs up to MAX_CONCURRENT_REQUESTS tasks at once within its own
+    rate limits and takes a slot of the shared budget for every request.
+    """
+    def __init__(self, frontier, worker_id=None):
+        self.frontier = frontier
+        self.worker_id = worker_id or "%s:%d" % (socket.gethostname(), os.getpid())
+        self.done = 0
+        self.failed = 0
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def extract(self, task, content):
+        """
+        Extract the rows of a task's page.
+
+        Returns:
+            tuple: (rows as dicts, follow-up tasks)
+        """
+        commission, kind, key, url = task["commission"], task["kind"], task["key"], task["url"]
+        child = {"commission": commission, "run_date": task["run_date"]}
+        if kind == 'meeting':
+            scraper = AgendaScraper(None, None, config.BASE_MEETING_URL, commission_name=commission)
+            rows = scraper.extract_agenda_items(key, content)
+            children = [{**child, "kind": 'question', "key": item["ID"], "url": config.BASE_QUESTIONS_URL + item["ID"]}
+                        for item in rows if item["ID"]]
+        elif kind == 'question':
+            scraper = QuestionsScraper(None, None, config.BASE_QUESTIONS_URL, commission_name=commission)
+            question = scraper.extract_question(key, url, content)
+            rows = [question] if question else []
+            children = []
+            if question and question["link"]:
+                speeches = SpeechesScraper(None, None, config.BASE_URL_PREFIX, commission_name=commission)
+                children.append({**child, "kind": 'verslag', "key": question["link"],
+                                 "url": speeches.full_url(question["link"]), "params": {"question_id": question["ID"]}})
+        else:
+            scraper = SpeechesScraper(None, None, config.BASE_URL_PREFIX, commission_name=commission)
+            rows = scraper.extract_speeches(url, content, task["params"].get("question_id"))
+            children = []
+        return [dict(row) for row in rows], children
+
+    def process(self, task):
+        """Fetch, extract and complete one task, or record the failed attempt."""
+        error_handler.set_log_context(task["commission"])
+        try:
+            delay = self.frontier.reserve(urlsplit(task["url"]).netloc)
+            if delay > 0:
+                time.sleep(delay)
+                get_metrics().add_phase('sleep', delay)
+            response = make_request(task["url"])
+            if response is None:
+                raise RuntimeError("request failed")
+            rows, children = self.extract(task, response.content)
+            if self.frontier.complete(task["task_id"], self.worker_id, rows, children):
+                self.done += 1
+            else:
+                logging.warning("Lease of %s expired; its result was dropped", task["url"])
+        except Exception as e:
+            self.failed += 1
+            state = self.frontier.fail(task["task_id"], self.worker_id, str(e))
+            logging.error("Task %s failed (%s): %s", task["url"], state, e)
+
+    def run(self, wait=False):
+        """
+        Process tasks until the frontier has none left (with wait, until stop() is called).
+
+        Returns:
+            int: Number of tasks completed
+        """
+        logging.info("Worker %s started", self.worker_id)
+        threads = max(1, config.MAX_CONCURRENT_REQUESTS)
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='frontier') as executor:
+            while not self._stop.is_set():
+                try:
+                    tasks = self.frontier.lease(self.worker_id, config.FRONTIER_LEASE_BATCH)
+                    if not tasks and not wait and not self.frontier.open_tasks():
+                        break
+                except requests.RequestException as e:
+                    logging.error("Frontier not reachable: %s", e)
+                    tasks = []
+                if not tasks:
+                    # Other workers may still add follow-up tasks, or retries may become due
+                    self._stop.wait(config.FRONTIER_IDLE_SECONDS)
+                    continue
+                list(executor.map(self.process, tasks))
+        logging.info("Worker %s finished: %d tasks done, %d failed attempts", self.worker_id, self.done, self.failed)
+        return self.done
+
+
+def run_worker(location=None, worker_id=None, wait=False):
+    """Run one worker on the frontier at `location` until it is drained (the target of worker processes)."""
+    frontier = open_frontier(location)
+    worker = FrontierWorker(frontier, worker_id)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        return worker.run(wait=wait)
+    finally:
+        frontier.close()
+
+
+def run_workers(location=None, processes=1, wait=False):
+    """Run worker processes on this host and wait until they are done."""
+    if processes <= 1:
+        return run_worker(location, wait=wait)
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_worker, args=(location, "%s:%d" % (socket.gethostname(), number), wait),
+                               name='frontier-worker-%d' % number)
+               for number in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    return sum(process.exitcode == 0 for process in workers)
+
+
+# --- Merging -----------------------------------------------------------------
+
+def merge_run(frontier, commission, run_date, storage=None, seen_index=None):
+    """
+    Write the rows of a finished run to its meetings and content CSVs (or
+    the storage backend) in listing order, then export, clean and pack them
+    like the normal workflow.
+
+    Returns:
+        tuple: (agenda items, questions, speeches) merged
+    """
+    error_handler.set_log_context(commission)
+    config.set_run_date(run_date)
+    meetings_csv = config.get_meetings_csv_path(commission)
+    content_csv = config.get_content_csv_path(commission)
+    tasks = frontier.results(commission, run_date)
+    children = defaultdict(list)
+    for task in tasks:
+        children[task["parent_id"]].append(task)
+    counts = {'meeting': 0, 'question': 0, 'verslag': 0}
+
+    with ExitStack() as sinks:
+        writers = {}
+        if storage is None:
+            writers['meeting'] = sinks.enter_context(BufferedCsvWriter(meetings_csv, COMBINED_FIELDNAMES))
+            writers['question'] = writers['verslag'] = sinks.enter_context(
+                BufferedCsvWriter(content_csv, CONTENT_FIELDNAMES))
+            # Cleaning drops the question rows from the content CSV, so they are kept here too
+            writers['questions'] = sinks.enter_context(
+                BufferedCsvWriter(config.get_questions_csv_path(commission), QUESTION_FIELDNAMES))
+
+        def write(task):
+            records = [TASK_RECORDS[task["kind"]].from_row(row) for row in task["rows"]]
+            if records:
+                if storage is not None:
+                    upsert = {'meeting': storage.upsert_agenda_items, 'question': storage.upsert_questions,
+                              'verslag': storage.upsert_speeches}[task["kind"]]
+                    upsert(commission, records)
+                else:
+                    if task["kind"] == 'meeting' and not counts['meeting']:
+                        # The meeting rows come first, as in the staged workflow
+                        writers['meeting'].write(_meeting_rows(meetings_csv))
+                    writers[task["kind"]].write(records if task["kind"] == 'meeting' else filter_rows(records))
+                    if task["kind"] == 'question':
+                        writers['questions'].write(records)
+                counts[task["kind"]] += len(records)
+            if seen_index is not None:
+                _record_seen(seen_index, commission, run_date, task, records)
+            for child in children[task["task_id"]]:
+                write(child)
+
+        for task in children[None]:
+            write(task)
+
+    if storage is None and writers['question'].rows_written:
+        # The content file was written already filtered
+        get_ledger().mark_clean(content_csv)
+    logging.info("Merged %d agenda items, %d questions and %d speeches of %s %s", counts['meeting'],
+                 counts['question'], counts['verslag'], commission, run_date)
+    failed = frontier.failed_count(commission, run_date)
+    if failed:
+        logging.warning("%d pages of %s %s failed; `frontier.py retry` queues them again", failed, commission,
+                        run_date)
+    finish_run(commission, meetings_csv, content_csv, storage)
+    frontier.mark_merged(commission, run_date)
+    error_handler.set_log_context('-')
+    return counts['meeting'], counts['question'], counts['verslag']
+
+
+def _meeting_rows(meetings_csv):
+    """Return the meeting rows of a run's meetings CSV (written by seed) as they are."""
+    with open(meetings_csv, newline='', encoding='utf-8') as f:
+        return [row for row in csv.DictReader(f) if row.get('data_type') != 'agenda_item']
+
+
+def _record_seen(seen_index, commission, run_date, task, records):
+    if task["kind"] == 'meeting':
+        if records:
+            seen_index.record_meeting(task["key"], task["params"].get("fingerprint"), commission, run_date)
+            seen_index.record_agenda_items(task["key"], [item["ID"] for item in records], commission, run_date)
+    elif task["kind"] == 'question':
+        if records:
+            seen_index.record_question(task["key"], records[0]["link"])
+    elif records:
+        seen_index.record_speech_link(task["url"], commission, run_date)
+
+
+def merge(frontier):
+    """
+    Merge every run whose tasks are all done (or failed), then update the
+    search index and the compacted dataset.
+
+    Returns:
+        int: Number of runs merged
+    """
+    runs = frontier.mergeable_runs()
+    if not runs:
+        logging.info("No finished runs to merge")
+        return 0
+    seen_index = open_seen_index()
+    storage = open_storage()
+    for commission, run_date in runs:
+        try:
+            merge_run(frontier, commission, run_date, storage, seen_index)
+        except Exception as e:
+            logging.exception("Error merging %s %s: %s", commission, run_date, e)
+    config.set_run_date(None)
+    if config.SEARCH_INDEX_ENABLED:
+        update_search_index()
+    if config.COMPACTION_ENABLED:
+        compact()
+    return len(runs)
+
+
+def print_stats(stats):
+    print("%-8s %8s %8s %8s %8s" % ("kind", "pending", "leased", "done", "failed"))
+    for kind in reversed(TASK_KINDS):
+        counts = stats["tasks"].get(kind, {})
+        print("%-8s %8d %8d %8d %8d" % (kind, counts.get('pending', 0), counts.get('leased', 0),
+                                        counts.get('done', 0), counts.get('failed', 0)))
+    print("%d tasks needed more than one attempt" % stats["retried"])
+    print("%d runs, %d merged" % (stats["runs"], stats["merged_runs"]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('seed', 'work', 'serve', 'merge', 'crawl', 'retry', 'stats'))
+    parser.add_argument('--frontier', help="frontier database or URL of `frontier.py serve` (default: FRONTIER_DB)")
+    parser.add_argument('--start', help="seed: first day of a backfill range (YYYY-MM-DD; default: the last 7 days)")
+    parser.add_argument('--end', help="seed: last day of the range, included (default: today)")
+    parser.add_argument('--window-days', type=int, default=config.BACKFILL_WINDOW_DAYS,
+                        help="seed: days per run directory (default: %(default)s)")
+    parser.add_argument('--commission', action='append', choices=sorted(config.COMMISSIONS),
+                        help="seed: commission to crawl (repeatable; default: all configured)")
+    parser.add_argument('--full', action='store_true', help="seed: also queue meetings earlier runs captured")
+    parser.add_argument('--processes', type=int, default=1, help="work: worker processes (default: %(default)s)")
+    parser.add_argument('--wait', action='store_true', help="work: keep waiting for new tasks when drained")
+    parser.add_argument('--host', default=config.FRONTIER_HOST,
+                        help="serve: interface to listen on (default: %(default)s; others need FRONTIER_TOKEN)")
+    parser.add_argument('--port', type=int, default=config.FRONTIER_PORT, help="serve: port (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.command in ('work', 'stats') and args.frontier:
+        frontier = open_frontier(args.frontier)
+    else:
+        frontier = Frontier(args.frontier or config.FRONTIER_DB)
+    if args.command in ('seed', 'crawl'):
+        seed(frontier, args.start, args.end, args.commission, args.window_days, args.full)
+    if args.command in ('work', 'crawl'):
+        run_workers(args.frontier, args.processes, args.wait)
+    if args.command in ('merge', 'crawl'):
+        merge(frontier)
+    if args.command == 'serve':
+        try:
+            FrontierServer(frontier, args.host, args.port).serve_forever()
+        except ValueError as e:
+            parser.error(str(e))
+        except KeyboardInterrupt:
+            pass
+    if args.command == 'retry':
+        print("Queued %d failed tasks again" % frontier.retry_failed())
+    if args.command in ('stats', 'crawl'):
+        print_stats(frontier.stats())
+    frontier.close()
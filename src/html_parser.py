@@ -0,0 +1,232 @@
+# html_parser.py
+import logging
+from contextlib import contextmanager
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+import config
+from metrics import get_metrics
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    LexborHTMLParser = None
+    SELECTOLAX_AVAILABLE = False
+
+# The parts of each page type the scrapers read, as (tag, classes) pairs.
+# With the BeautifulSoup backends only these subtrees are built.
+PAGE_SUBTREES = {
+    'listing': [('article', ['card', 'meeting-card']), ('li', ['pager__item--next'])],
+    'meeting': [('article', ['card', 'document-type--report', 'document-subtype--journal_item'])],
+    'question': [('div', ['page-layout__content'])],
+    'verslag': [('header', ['card__header']),
+                ('date', ['meeting-header__date-full']),
+                ('div', ['meeting-speeches__list'])],
+}
+
+BACKENDS = ('html.parser', 'lxml', 'selectolax')
+
+_fallback_warned = False
+
+
+class Node:
+    """
+    Backend-independent view of an HTML element.
+
+    The method names follow BeautifulSoup (select, select_one, get,
+    get_text, decompose) so scraper code reads the same for every backend.
+    Selectors are CSS strings or the result of the backend's compile().
+    """
+    @staticmethod
+    def compile(selector):
+        """Precompile a CSS selector for this backend."""
+        return selector
+
+    def select(self, selector):
+        raise NotImplementedError
+
+    def select_one(self, selector):
+        raise NotImplementedError
+
+    def get(self, name, default=None):
+        raise NotImplementedError
+
+    def get_text(self, separator="", strip=False):
+        raise NotImplementedError
+
+    def decompose(self):
+        raise NotImplementedError
+
+    def release(self):
+        """Free the document tree of a root node once everything was extracted from it."""
+
+
+class SoupNode(Node):
+    """Node backed by a BeautifulSoup tag (html.parser or lxml)."""
+    __slots__ = ('tag',)
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    @staticmethod
+    def compile(selector):
+        return soupsieve.compile(selector)
+
+    def select(self, selector):
+        if isinstance(selector, str):
+            tags = self.tag.select(selector)
+        else:
+            tags = selector.select(self.tag)
+        return [SoupNode(tag) for tag in tags]
+
+    def select_one(self, selector):
+        if isinstance(selector, str):
+            tag = self.tag.select_one(selector)
+        else:
+            tag = selector.select_one(self.tag)
+        return SoupNode(tag) if tag is not None else None
+
+    def get(self, name, default=None):
+        return self.tag.get(name, default)
+
+    def get_text(self, separator="", strip=False):
+        return self.tag.get_text(separator, strip=strip)
+
+    def decompose(self):
+        self.tag.decompose()
+
+    def release(self):
+        # BeautifulSoup trees are reference cycles; without this they live
+        # until the next garbage collection
+        self.tag.decompose()
+
+
+class SelectolaxNode(Node):
+    """Node backed by a selectolax (lexbor) node."""
+    __slots__ = ('node', 'tree')
+
+    def __init__(self, node, tree=None):
+        self.node = node
+        # The document root keeps the parser (and so the tree) alive
+        self.tree = tree
+
+    def select(self, selector):
+        # selectolax also matches the node itself; BeautifulSoup only
+        # searches descendants (node identity is compared by mem_id, since
+        # == compares the serialized HTML)
+        own_id = self.node.mem_id
+        return [SelectolaxNode(node) for node in self.node.css(selector) if node.mem_id != own_id]
+
+    def select_one(self, selector):
+        own_id = self.node.mem_id
+        for node in self.node.css(selector):
+            if node.mem_id != own_id:
+                return SelectolaxNode(node)
+        return None
+
+    def get(self, name, default=None):
+        value = self.node.attributes.get(name)
+        return default if value is None else value
+
+    def get_text(self, separator="", strip=False):
+        # Join the text nodes like BeautifulSoup does: with strip=True each
+        # string is stripped and empty strings are left out.
+        parts = []
+        for child in self.node.traverse(include_text=True):
+            if child.tag != '-text':
+                continue
+            text = child.text_content or ""
+            if strip:
+                text = text.strip()
+                if not text:
+                    continue
+            parts.append(text)
+        return separator.join(parts)
+
+    def decompose(self):
+        self.node.decompose()
+
+    def release(self):
+        # The lexbor tree is freed with the parser
+        self.node = None
+        self.tree = None
+
+
+def _has_classes(attrs, classes):
+    value = attrs.get('class') or ''
+    present = value.split() if isinstance(value, str) else value
+    return all(cls in present for cls in classes)
+
+
+def make_strainer(page_type):
+    """Return a SoupStrainer that keeps only the subtrees used for a page type."""
+    subtrees = PAGE_SUBTREES.get(page_type)
+    if not subtrees:
+        return None
+
+    def wanted(name, attrs):
+        return any(name == tag and _has_classes(attrs, classes) for tag, classes in subtrees)
+    return SoupStrainer(wanted)
+
+
+def resolve_backend(backend=None):
+    """Return the configured backend, falling back when it is not installed."""
+    backend = backend or config.HTML_PARSER
+    if backend not in BACKENDS:
+        raise ValueError("Unknown HTML parser backend: %s" % backend)
+    if backend == 'selectolax' and not SELECTOLAX_AVAILABLE:
+        global _fallback_warned
+        if not _fallback_warned:
+            logging.info("selectolax is not installed; falling back to lxml/html.parser")
+            _fallback_warned = True
+        backend = 'lxml'
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        backend = 'html.parser'
+    return backend
+
+
+def parse_html(content, page_type=None, backend=None):
+    """
+    Parse an HTML page into a Node.
+
+    Args:
+        content: The page HTML (bytes or str)
+        page_type: One of PAGE_SUBTREES ('listing', 'meeting', 'question',
+            'verslag') to build only the subtrees the scrapers use, or None
+            to parse the whole page
+        backend: 'html.parser', 'lxml' or 'selectolax' (default: config.HTML_PARSER)
+
+    Returns:
+        Node for the document root
+    """
+    backend = resolve_backend(backend)
+    with get_metrics().phase('parse'):
+        if backend == 'selectolax':
+            # selectolax always builds the full tree, but does so in C
+            tree = LexborHTMLParser(content)
+            return SelectolaxNode(tree.root, tree)
+        strainer = make_strainer(page_type) if config.HTML_SUBTREE_ONLY else None
+        return SoupNode(BeautifulSoup(content, backend, parse_only=strainer))
+
+
+@contextmanager
+def parsed_document(content, page_type=None, backend=None):
+    """
+    Parse an HTML page for the duration of a with block and free its tree
+    right after, so a stage holds at most the page it is extracting from.
+
+    Values extracted inside the block are plain strings and stay valid.
+    """
+    document = parse_html(content, page_type=page_type, backend=backend)
+    try:
+        yield document
+    finally:
+        document.release()
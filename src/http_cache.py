@@ -0,0 +1,233 @@
+# http_cache.py
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+import zstandard
+
+import config
+from blob_store import BlobStore
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of HTTP responses, keyed by URL.
+
+    Bodies are stored compressed in a content-addressed BlobStore, so pages
+    with the same body (e.g. one listing under several URLs) take the space
+    of one; an SQLite index keeps the validators
+    (ETag/Last-Modified), fetch time and last access time of each entry.
+    Entries are fresh for the TTL of their page type (see CACHE_TTL_RULES);
+    stale entries are revalidated with a conditional GET. When the cache
+    grows beyond `max_bytes` the least recently used entries are evicted.
+    """
+    def __init__(self, cache_dir, max_bytes, ttl_rules=None, default_ttl=None):
+        self.cache_dir = cache_dir
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        self.bodies = BlobStore(self.body_dir)
+        self.max_bytes = max_bytes
+        self.ttl_rules = [(re.compile(pattern), ttl)
+                          for pattern, ttl in (ttl_rules or config.CACHE_TTL_RULES)]
+        self.default_ttl = config.CACHE_DEFAULT_TTL if default_ttl is None else default_ttl
+        os.makedirs(self.body_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body_file TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._db.commit()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def ttl_for(self, url):
+        """Return the time-to-live in seconds for a URL based on its page type."""
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def _entry(self, url):
+        with self._lock:
+            return self._db.execute(
+                "SELECT body_file, content_type, etag, last_modified, fetched_at FROM responses WHERE url = ?",
+                (url,)).fetchone()
+
+    def _read_response(self, url, body_file, content_type):
+        try:
+            body = self.bodies.get(body_file)
+        except (OSError, zstandard.ZstdError, zlib.error):
+            body = None
+        if body is None:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        return build_response(url, body, content_type)
+
+    def get_fresh(self, url, max_age=None):
+        """Return a cached response if it is still within its TTL (and max_age seconds, if given), else None."""
+        entry = self._entry(url)
+        if entry is None:
+            return None
+        body_file, content_type, _, _, fetched_at = entry
+        ttl = self.ttl_for(url) if max_age is None else min(max_age, self.ttl_for(url))
+        if time.time() - fetched_at > ttl:
+            return None
+        response = self._read_response(url, body_file, content_type)
+        if response is not None:
+            self.hits += 1
+        return response
+
+    def conditional_headers(self, url):
+        """Return the If-None-Match/If-Modified-Since headers for a stale entry."""
+        entry = self._entry(url)
+        if entry is None:
+            return {}
+        _, _, etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def handle_response(self, url, response):
+        """
+        Store a network response, or resolve a 304 to the cached body.
+
+        Returns:
+            The response callers should use, or None for a 304 whose cached
+            body is gone (the entry is dropped, so the page can be fetched
+            again without validators)
+        """
+        if response.status_code == 304:
+            entry = self._entry(url)
+            if entry is not None:
+                cached = self._read_response(url, entry[0], entry[1])
+                if cached is not None:
+                    with self._lock:
+                        self._db.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+                        self._db.commit()
+                    self.revalidated += 1
+                    return cached
+                self.forget(url)
+            logging.warning("Got 304 for %s but its cached body is gone", url)
+            return None
+        self.misses += 1
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def store(self, url, response):
+        """Write a response body to the cache and evict old entries if needed."""
+        body = response.content
+        body_file = self.bodies.put(body)
+        size = self.bodies.size(body_file)
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute("SELECT body_file FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, body_file, size, content_type, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_file, size, response.headers.get('Content-Type'),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now))
+            self._db.commit()
+            if previous is not None and previous[0] != body_file:
+                self._remove_unreferenced(previous[0])
+        self.evict()
+
+    def forget(self, url):
+        """Drop the entry of a URL (and its body, unless other URLs share it)."""
+        with self._lock:
+            row = self._db.execute("SELECT body_file FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._remove_unreferenced(row[0])
+            self._db.commit()
+
+    def _remove_unreferenced(self, body_file):
+        # Called with the lock held; other URLs may share the body
+        if self._db.execute("SELECT 1 FROM responses WHERE body_file = ? LIMIT 1", (body_file,)).fetchone() is None:
+            self.bodies.remove(body_file)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, body_file, size FROM responses ORDER BY last_access").fetchall()
+            for url, body_file, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._remove_unreferenced(body_file)
+                total -= size
+                removed += 1
+            self._db.commit()
+        logging.info("Evicted %d entries from the response cache", removed)
+        return removed
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "bytes": self.total_bytes(),
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info("Response cache: %d fresh hits, %d revalidated (304), %d misses, %d bytes on disk",
+                     stats["hits"], stats["revalidated"], stats["misses"], stats["bytes"])
+
+
+def build_response(url, body, content_type=None):
+    """Wrap a cached body in a requests.Response so callers see one interface."""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body
+    if content_type:
+        response.headers['Content-Type'] = content_type
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide response cache, or None when caching is disabled."""
+    global _cache
+    if not config.CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(config.CACHE_DIR, config.CACHE_MAX_BYTES)
+        return _cache
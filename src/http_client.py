@@ -0,0 +1,193 @@
+# http_client.py
+import logging
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+# Brotli is only negotiated when urllib3 can decode it.
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+# HTTP/2 needs httpx with the h2 extra.
+try:
+    import httpx
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTP2_AVAILABLE = False
+
+# A proper user-agent header; built once and reused by every request.
+HEADERS = {
+    'User-Agent': 'Vlaams Parlement Scraper/1.0 (Educational/Research Use)',
+    'Accept': 'text/html,application/xhtml+xml,application/xml',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client that owns a keep-alive connection pool.
+
+    All scrapers share one instance (see get_client), so connections to
+    vlaamsparlement.be are reused instead of paying a TCP+TLS handshake
+    per URL. Responses are always returned as requests.Response objects,
+    also when the optional HTTP/2 transport (httpx) is used.
+    """
+    def __init__(self, pool_size=None, http2=None, timeout=None):
+        self.pool_size = pool_size or config.HTTP_POOL_SIZE
+        self.timeout = timeout or config.HTTP_TIMEOUT
+        http2 = config.HTTP2_ENABLED if http2 is None else http2
+        if http2 and not HTTP2_AVAILABLE:
+            logging.warning("HTTP/2 requested but httpx[http2] is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._bytes_wire = 0
+        self._bytes_decoded = 0
+        self._http2_connections = 0
+        self._seen_connections = weakref.WeakSet()
+
+        if self.http2:
+            self._httpx = httpx.Client(
+                http2=True,
+                headers=HEADERS,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+            )
+            self.session = None
+        else:
+            self._httpx = None
+            self.session = requests.Session()
+            self.session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=config.HTTP_POOL_HOSTS,
+                                  pool_maxsize=self.pool_size, pool_block=True)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+
+    def get(self, url, headers=None):
+        """
+        Perform a GET request over the shared pool.
+
+        Raises:
+            requests.RequestException on connection errors and HTTP error statuses
+        """
+        if self._httpx is not None:
+            response = self._get_http2(url, headers)
+        else:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            try:
+                wire_bytes = response.raw.tell()
+            except Exception:
+                wire_bytes = len(response.content)
+            self._record(wire_bytes or len(response.content), len(response.content))
+        response.raise_for_status()
+        return response
+
+    def _get_http2(self, url, headers):
+        try:
+            result = self._httpx.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+        self._track_http2_connections()
+        wire_bytes = result.num_bytes_downloaded or len(result.content)
+        self._record(wire_bytes, len(result.content))
+
+        # Convert to a requests.Response so callers see one interface.
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.headers.update(result.headers)
+        response.url = str(result.url)
+        response.reason = result.reason_phrase
+        response.encoding = result.encoding
+        response._content = result.content
+        return response
+
+    def _track_http2_connections(self):
+        try:
+            connections = self._httpx._transport._pool.connections
+        except AttributeError:
+            return
+        with self._lock:
+            for connection in connections:
+                if connection not in self._seen_connections:
+                    self._seen_connections.add(connection)
+                    self._http2_connections += 1
+
+    def _record(self, wire_bytes, decoded_bytes):
+        with self._lock:
+            self._requests += 1
+            self._bytes_wire += wire_bytes
+            self._bytes_decoded += decoded_bytes
+
+    def _connections_opened(self):
+        if self._httpx is not None:
+            return self._http2_connections
+        opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                if pool is not None:
+                    opened += pool.num_connections
+        return opened
+
+    def stats(self):
+        """Return pool statistics: requests, connections, reuse ratio and bytes."""
+        with self._lock:
+            requests_made = self._requests
+            bytes_wire = self._bytes_wire
+            bytes_decoded = self._bytes_decoded
+        connections = self._connections_opened()
+        reuse_ratio = 1 - connections / requests_made if requests_made else 0.0
+        return {
+            "protocol": "HTTP/2" if self.http2 else "HTTP/1.1",
+            "requests": requests_made,
+            "connections_opened": connections,
+            "reuse_ratio": round(max(reuse_ratio, 0.0), 3),
+            "bytes_wire": bytes_wire,
+            "bytes_decoded": bytes_decoded,
+            "compression_ratio": round(bytes_decoded / bytes_wire, 2) if bytes_wire else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info("HTTP pool (%s): %d requests over %d connections (reuse ratio %.1f%%), "
+                     "%d bytes on the wire, %d bytes decoded",
+                     stats["protocol"], stats["requests"], stats["connections_opened"],
+                     stats["reuse_ratio"] * 100, stats["bytes_wire"], stats["bytes_decoded"])
+
+    def close(self):
+        if self._httpx is not None:
+            self._httpx.close()
+        else:
+            self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide HTTP client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -1,99 +1,199 @@
 # main.py
 import os
+import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import config
 import error_handler  # Import the error handler
 
-from utils import load_soup, write_csv, append_to_csv
-from scrapers import CommissionScraper
+from utils import write_csv, append_to_csv
+from http_client import get_client
+from http_cache import get_cache
+from parse_memo import get_parse_memo
+from scrapers import scrape_listing
 from agenda_scraper import AgendaScraper
 from questions_scraper import QuestionsScraper
 from speeches_scraper import SpeechesScraper
-from clean_content import clean_content_csv  # Import the cleaning function
+from pipeline import StreamingPipeline
+from clean_content import clean_content_csv, get_ledger  # Import the cleaning function
+from seen_index import open_seen_index
+from storage import MEETING_FIELDNAMES, open_storage
+from checkpoint import open_journal
+from metrics import reset_metrics, stage
+from search_index import update_search_index
+from compaction import compact
+from blob_store import pack_content_csv
+from records import Meeting
 
 # Initialize error handling
 error_handler.init()
 
-def run_commission_workflow(commission_config):
-    """Run the full workflow for a single commission."""
+def run_commission_workflow(commission_config, seen_index=None, streaming=None, storage=None, meetings=None):
+    """
+    Run the full workflow for a single commission.
+    
+    The meetings come from the commission listing of the last 7 days, or
+    are passed in as `meetings` (e.g. by a backfill window, see backfill.py).
+    
+    With a seen index only meetings, agenda items and speech pages that
+    earlier runs did not capture completely are scraped. With streaming
+    (default: config.STREAMING_PIPELINE) the agenda, questions and speeches
+    stages run as one overlapping pipeline. With a storage backend the stages
+    upsert their rows into it and the CSVs are exported once at the end.
+    Every completed page is committed to the run's checkpoint journal, so
+    rerunning an interrupted run resumes where it stopped.
+    """
+    if streaming is None:
+        streaming = config.STREAMING_PIPELINE
     commission_name = commission_config["name"]
     logging.info("Starting workflow for commission: %s", commission_name)
     
     # Get file paths for this commission
     meetings_csv = config.get_meetings_csv_path(commission_name)
     content_csv = config.get_content_csv_path(commission_name)
+    questions_csv = config.get_questions_csv_path(commission_name)
     
     # Step 1: Initial scraping to get meeting IDs
-    meetings_data = run_initial_scraping(commission_config, meetings_csv)
+    with stage('initial_scraping'):
+        if meetings is None:
+            meetings_data = run_initial_scraping(commission_config, meetings_csv, storage)
+        else:
+            meetings_data = save_meetings(commission_name, meetings, meetings_csv, storage)
     if not meetings_data:
         logging.error("Failed to get initial meeting data for %s. Aborting workflow.", commission_name)
         return False
     
-    # Step 2: Scrape detailed agenda information for each meeting
-    run_agenda_scraper(commission_name, meetings_csv)
-    
-    # Step 3: Scrape questions and interpellations for each meeting
-    questions_data = run_questions_scraper(commission_name, meetings_csv, content_csv)
-    if not questions_data:
-        logging.warning("No questions data found for %s", commission_name)
+    # Pages this run completed before an interruption are not fetched again
+    journal = open_journal(commission_name)
+    try:
+        if streaming:
+            # Steps 2-4 as one pipeline: agenda items and question links flow
+            # straight into the next stage instead of through the CSV files
+            with stage('streaming_pipeline'):
+                run_streaming_pipeline(commission_name, meetings_data, meetings_csv, content_csv, seen_index,
+                                       storage, journal, questions_csv)
+        else:
+            # Step 2: Scrape detailed agenda information for each meeting
+            with stage('agenda_scraping'):
+                run_agenda_scraper(commission_name, meetings_csv, seen_index, storage, journal)
+            
+            # Step 3: Scrape questions and interpellations for each meeting
+            with stage('questions_scraping'):
+                questions_data = run_questions_scraper(commission_name, meetings_csv, content_csv, seen_index,
+                                                       storage, journal, questions_csv)
+            if not questions_data:
+                logging.warning("No questions data found for %s", commission_name)
+            
+            # Step 4: Scrape speeches from each meeting
+            if storage is not None or os.path.exists(content_csv):
+                with stage('speeches_scraping'):
+                    run_speeches_scraper(commission_name, content_csv, seen_index, storage, journal)
+            else:
+                logging.info("No new questions for %s. Skipping speeches step.", commission_name)
+        
+        # Steps 5-6: export, clean and pack the run's output
+        finish_run(commission_name, meetings_csv, content_csv, storage)
+        
+        if journal is not None:
+            logging.info("Checkpoint journal for %s: %s pages", commission_name, journal.stats())
+    finally:
+        # Also when a stage fails, so a long-running process (daemon.py) does not leak the connection
+        if journal is not None:
+            journal.close()
+    logging.info("Workflow for commission %s completed successfully.", commission_name)
+    return True
+
+
+def finish_run(commission_name, meetings_csv, content_csv, storage=None):
+    """
+    Turn the scraped rows of a run into its final output: export them from
+    the storage backend, clean the content CSV and move long speech texts
+    into the blob store.
     
-    # Step 4: Scrape speeches from each meeting
-    run_speeches_scraper(commission_name, content_csv)
+    Used by the workflow above and by the merge of a shared crawl (frontier.py).
+    """
+    # Export the run from the storage backend for consumers of the CSV files
+    if storage is not None:
+        with stage('csv_export'):
+            storage.export_csv(commission_name, meetings_csv, content_csv,
+                               questions_csv=config.get_questions_csv_path(commission_name))
     
     # Step 5: Clean content data - improved version using the imported function
     if os.path.exists(content_csv):
-        rows_removed = clean_content_csv(content_csv)
+        with stage('cleaning'):
+            rows_removed = clean_content_csv(content_csv)
         logging.info("Content cleaning completed for %s. Removed %d rows.", commission_name, rows_removed)
     else:
         logging.warning("Content CSV file not found for %s. Skipping cleaning step.", commission_name)
     
-    logging.info("Workflow for commission %s completed successfully.", commission_name)
-    return True
+    # Step 6: Move long speech texts into the blob store shared by all runs
+    if config.BLOB_STORE_ENABLED and os.path.exists(content_csv):
+        with stage('packing'):
+            was_clean = get_ledger().is_clean(content_csv)
+            packed = pack_content_csv(content_csv)
+            if was_clean and packed:
+                get_ledger().mark_clean(content_csv)
+        logging.info("Moved %d speech texts of %s to the blob store.", packed, commission_name)
 
 
-def run_initial_scraping(commission_config, output_csv):
-    """Scrape the main page and create the basic meetings CSV file."""
+def run_initial_scraping(commission_config, output_csv, storage=None, start_date=None, end_date=None):
+    """Scrape the listing pages and create the basic meetings CSV file (or store the meetings)."""
     commission_name = commission_config["name"]
-    url = config.get_commission_url(commission_config)
+    url = config.get_commission_url(commission_config, start_date, end_date)
     
     logging.info("Scraping initial data for commission %s from URL: %s", commission_name, url)
-    soup = load_soup(url)
-    if not soup:
+    # The listing is paged; every page goes through the shared pooled client
+    scraped_data, _, complete = scrape_listing(url)
+    if scraped_data is None:
         logging.error("Failed to load webpage for commission %s", commission_name)
         return False
-    
-    scraper = CommissionScraper(soup)
-    scraped_data, fieldnames = scraper.scrape()
+    if not complete:
+        logging.warning("Listing of commission %s is incomplete; continuing with %d meetings",
+                        commission_name, len(scraped_data))
     
     if not scraped_data:
         logging.warning("No meetings found for commission %s", commission_name)
         return False
     
-    # Add commission name to the data
-    for item in scraped_data:
-        item['commission'] = commission_name
+    return save_meetings(commission_name, scraped_data, output_csv, storage)
+
+
+def save_meetings(commission_name, meetings, output_csv, storage=None):
+    """Write the meetings of a listing to the meetings CSV file (or store them)."""
+    # Meetings from the listing, or from a backfill window's saved listing
+    meetings = [Meeting.from_row(row, commission=commission_name) for row in meetings]
+    
+    if storage is not None:
+        storage.upsert_meetings(commission_name, meetings)
+        logging.info("Stored %d meetings for commission %s", len(meetings), commission_name)
+        return meetings
     
-    write_csv(output_csv, scraped_data, fieldnames + ['commission'])
+    write_csv(output_csv, meetings, MEETING_FIELDNAMES)
     logging.info("Saved %d meetings for commission %s to %s", 
-                len(scraped_data), commission_name, output_csv)
-    return scraped_data
+                len(meetings), commission_name, output_csv)
+    return meetings
 
 
-def run_agenda_scraper(commission_name, meetings_csv):
+def run_agenda_scraper(commission_name, meetings_csv, seen_index=None, storage=None, journal=None):
     """Run the agenda scraper for a specific commission and update the meetings CSV."""
     logging.info("Running agenda scraper for commission: %s", commission_name)
     
     scraper = AgendaScraper(
         input_csv=meetings_csv,
         output_csv=meetings_csv,  # We're updating the same file
-        base_meeting_url=config.BASE_MEETING_URL
+        base_meeting_url=config.BASE_MEETING_URL,
+        seen_index=seen_index,
+        commission_name=commission_name,
+        storage=storage,
+        journal=journal
     )
     scraper.scrape()
     logging.info("Agenda scraping for commission %s completed.", commission_name)
 
 
-def run_questions_scraper(commission_name, meetings_csv, content_csv):
+def run_questions_scraper(commission_name, meetings_csv, content_csv, seen_index=None, storage=None,
+                          journal=None, questions_csv=None):
     """Run the questions scraper for a specific commission and save to content CSV."""
     logging.info("Running questions scraper for commission: %s", commission_name)
     
@@ -101,21 +201,40 @@ def run_questions_scraper(commission_name, meetings_csv, content_csv):
     scraper = QuestionsScraper(
         input_csv=meetings_csv,
         output_csv=content_csv,
-        base_url=config.BASE_QUESTIONS_URL
+        base_url=config.BASE_QUESTIONS_URL,
+        seen_index=seen_index,
+        commission_name=commission_name,
+        storage=storage,
+        journal=journal,
+        questions_csv=questions_csv
     )
     questions_data = scraper.scrape()
     
-    # Add commission name to each question
-    if questions_data:
-        for item in questions_data:
-            item['commission'] = commission_name
-            item['content_type'] = 'question'
-    
     logging.info("Questions scraping for commission %s completed.", commission_name)
     return questions_data
 
 
-def run_speeches_scraper(commission_name, content_csv):
+def run_streaming_pipeline(commission_name, meetings_data, meetings_csv, content_csv, seen_index=None,
+                           storage=None, journal=None, questions_csv=None):
+    """Run the agenda, questions and speeches stages as a streaming pipeline."""
+    logging.info("Running streaming pipeline for commission: %s", commission_name)
+    
+    pipeline = StreamingPipeline(
+        commission_name=commission_name,
+        meetings_data=meetings_data,
+        meetings_csv=meetings_csv,
+        content_csv=content_csv,
+        seen_index=seen_index,
+        storage=storage,
+        journal=journal,
+        questions_csv=questions_csv
+    )
+    agenda_count, questions_count, speeches_count = pipeline.run()
+    logging.info("Streaming pipeline for commission %s completed: %d agenda items, %d questions, %d speeches.",
+                 commission_name, agenda_count, questions_count, speeches_count)
+
+
+def run_speeches_scraper(commission_name, content_csv, seen_index=None, storage=None, journal=None):
     """Run the speeches scraper for a specific commission and append to content CSV."""
     logging.info("Running speeches scraper for commission: %s", commission_name)
     
@@ -123,49 +242,117 @@ def run_speeches_scraper(commission_name, content_csv):
     scraper = SpeechesScraper(
         input_csv=content_csv,  # Reads questions from content_csv
         output_csv=content_csv,  # Appends speeches to content_csv
-        base_url_prefix=config.BASE_URL_PREFIX
+        base_url_prefix=config.BASE_URL_PREFIX,
+        seen_index=seen_index,
+        commission_name=commission_name,
+        storage=storage,
+        journal=journal
     )
     speeches_data = scraper.scrape()
     
-    # Add commission name to each speech
-    if speeches_data:
-        for item in speeches_data:
-            item['commission'] = commission_name
-            item['content_type'] = 'speech'
-    
     logging.info("Speeches scraping for commission %s completed.", commission_name)
     return speeches_data
 
 
-def main():
+def run_isolated_workflow(commission_id, commission_config, seen_index=None, streaming=None, storage=None):
+    """
+    Run the workflow for one commission in a worker thread.
+    
+    Log lines are tagged with the commission, and any error is logged and
+    reported as a failure so it does not affect the other commissions.
+    """
+    error_handler.set_log_context(commission_id)
+    try:
+        logging.info(f"Processing commission: {commission_id}")
+        return run_commission_workflow(commission_config, seen_index, streaming, storage)
+    except Exception as e:
+        logging.exception(f"Error processing commission {commission_id}: {e}")
+        return False
+    finally:
+        error_handler.set_log_context('-')
+
+
+def main(full=False, streaming=None):
+    """
+    Run the workflow for all configured commissions.
+    
+    Args:
+        full: Refetch everything instead of only items earlier runs did not capture
+        streaming: Run the scraping stages as a streaming pipeline (default: config.STREAMING_PIPELINE)
+    """
     logging.info("Starting modular scraping workflow for all configured commissions.")
+    metrics = reset_metrics()
     logging.info(f"Data will be saved to: {config.DATA_DIR}")
     
     # Create data directory if it doesn't exist
     os.makedirs(config.DATA_DIR, exist_ok=True)
     
+    # Index of everything earlier runs already captured
+    seen_index = open_seen_index(full=full)
+    if full:
+        logging.info("Full run requested: all items will be refetched.")
+    # SQLite storage backend, or None to work on the CSV files directly
+    storage = open_storage()
+    
     success_count = 0
     failure_count = 0
     
-    for commission_id, commission_config in config.COMMISSIONS.items():
-        try:
-            logging.info(f"Processing commission: {commission_id}")
-            result = run_commission_workflow(commission_config)
-            if result:
+    # Commissions run in parallel; they share the global request limits
+    workers = max(1, min(config.MAX_COMMISSION_WORKERS, len(config.COMMISSIONS)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='commission') as executor:
+        futures = {
+            executor.submit(run_isolated_workflow, commission_id, commission_config, seen_index, streaming,
+                            storage): commission_id
+            for commission_id, commission_config in config.COMMISSIONS.items()
+        }
+        for future in as_completed(futures):
+            if future.result():
                 success_count += 1
             else:
                 failure_count += 1
-        except Exception as e:
-            logging.error(f"Error processing commission {commission_id}: {e}")
-            failure_count += 1
+    
+    # Make the new speeches searchable
+    if config.SEARCH_INDEX_ENABLED:
+        with stage('search_index'):
+            update_search_index()
+    
+    # Merge the new run directories into the compacted dataset
+    if config.COMPACTION_ENABLED:
+        with stage('compaction'):
+            compact()
     
     logging.info("Scraping workflow completed.")
     logging.info(f"Commissions processed successfully: {success_count}")
     logging.info(f"Commissions with errors: {failure_count}")
     
+    # Report how much the shared connection pool, response cache and parse memo saved
+    get_client().log_stats()
+    cache = get_cache()
+    if cache:
+        cache.log_stats()
+    memo = get_parse_memo()
+    if memo:
+        memo.log_stats()
+    if storage is not None:
+        logging.info("Storage totals: %s", storage.stats())
+    
+    # Machine-readable summary of the run for monitoring
+    if config.METRICS_ENABLED:
+        metrics.inc('commissions', success_count, outcome='success')
+        metrics.inc('commissions', failure_count, outcome='failure')
+        metrics.write_reports(extra={"http_pool": get_client().stats(),
+                                     "response_cache": cache.stats() if cache else None,
+                                     "parse_memo": memo.stats() if memo else None})
+    
     if failure_count > 0:
         logging.warning("Some commissions had errors. Check the logs for details.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape commission meetings from vlaamsparlement.be")
+    parser.add_argument('--full', action='store_true',
+                        help="refetch all meetings, agenda items and speeches, ignoring earlier runs")
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help="run the agenda, questions and speeches stages as a streaming pipeline")
+    args = parser.parse_args()
+    main(full=args.full, streaming=args.stream)
\ No newline at end of file
@@ -0,0 +1,338 @@
+# metrics.py
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import config
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Where the time of a run goes. Phases of concurrent requests overlap, so
+# their sum can exceed the wall-clock time of the run.
+PHASES = ('sleep', 'network', 'parse', 'write')
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds, as Prometheus expects."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def cumulative(self):
+        """Return (upper bound, observations <= bound) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    """
+    Process-wide run metrics: request latencies and outcomes, bytes
+    downloaded, time per phase (sleeping on the rate limit, waiting on the
+    network, parsing, writing) and time and rows per scraper stage.
+
+    Every value is keyed by a metric name and a tuple of (label, value)
+    pairs. The collected values are written at the end of a run as a JSON
+    summary and as a Prometheus textfile (see write_reports).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record an observation in a histogram."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add_phase(self, phase, seconds):
+        """Count time spent in one of PHASES."""
+        self.inc('phase_seconds', seconds, phase=phase)
+
+    @contextmanager
+    def phase(self, phase):
+        """Time the enclosed block as the given phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - started)
+
+    def record_request(self, seconds, outcome, size=0):
+        """Record one network request: its latency, outcome ('200', '503', 'error', ...) and body size."""
+        self.observe('request_duration_seconds', seconds)
+        self.inc('requests', outcome=outcome)
+        self.inc('downloaded_bytes', size)
+        self.add_phase('network', seconds)
+
+    def record_stage(self, stage, seconds, rows=None):
+        """Record one run of a scraper stage or workflow step for the current commission."""
+        commission = current_commission()
+        self.inc('stage_seconds', seconds, stage=stage, commission=commission)
+        self.inc('stage_runs', stage=stage, commission=commission)
+        if rows is not None:
+            self.record_rows(stage, rows)
+
+    def record_rows(self, stage, rows):
+        """Count rows produced by a scraper stage for the current commission."""
+        self.inc('stage_rows', rows, stage=stage, commission=current_commission())
+
+    def get(self, name, **labels):
+        """Return the value of a counter (0 if it was never incremented)."""
+        with self._lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def total(self, name):
+        """Return the sum of a counter over all its labels."""
+        with self._lock:
+            return sum(value for (metric, _), value in self.counters.items() if metric == name)
+
+    def summary(self):
+        """Return the metrics as a JSON-serializable dictionary."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        phases = {phase: 0.0 for phase in PHASES}
+        requests = {}
+        stages = {}
+        other = {}
+        for (name, labels), value in sorted(counters.items()):
+            labels = dict(labels)
+            if name == 'phase_seconds':
+                phases[labels['phase']] = round(value, 3)
+            elif name == 'requests':
+                requests[labels['outcome']] = value
+            elif name.startswith('stage_'):
+                stage = stages.setdefault(labels['stage'], {})
+                entry = stage.setdefault(labels['commission'], {})
+                entry[name[len('stage_'):]] = round(value, 3) if isinstance(value, float) else value
+            elif labels:
+                # e.g. rows_written by sink
+                other.setdefault(name, {})[",".join(str(label) for label in labels.values())] = value
+            else:
+                other[name] = value
+        latency = histograms.get(('request_duration_seconds', ()))
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            "duration_seconds": round(time.time() - self.started, 3),
+            "requests": requests,
+            "request_latency": {
+                "count": latency.count if latency else 0,
+                "mean_seconds": round(latency.sum / latency.count, 4) if latency and latency.count else 0.0,
+                "p50_seconds": latency.quantile(0.5) if latency else 0.0,
+                "p90_seconds": latency.quantile(0.9) if latency else 0.0,
+                "p99_seconds": latency.quantile(0.99) if latency else 0.0,
+                "buckets": {_format_bound(bound): count for bound, count in latency.cumulative()} if latency else {},
+            },
+            "phase_seconds": phases,
+            "stages": stages,
+            **other,
+        }
+
+    def prometheus(self, prefix='scraper'):
+        """
+        Return the metrics in the Prometheus text exposition format.
+
+        The values describe the last run, so counters are exposed as gauges
+        (for the node_exporter textfile collector).
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append("# HELP %s %s" % (name, _HELP.get(name[len(prefix) + 1:], name)))
+                lines.append("# TYPE %s %s" % (name, kind))
+
+        for (name, labels), value in sorted(counters.items()):
+            metric = "%s_%s" % (prefix, name)
+            describe(metric, 'gauge')
+            lines.append("%s%s %s" % (metric, _format_labels(labels), _format_value(value)))
+        for (name, labels), histogram in sorted(histograms.items()):
+            metric = "%s_%s" % (prefix, name)
+            describe(metric, 'histogram')
+            for bound, count in histogram.cumulative():
+                bucket_labels = labels + (('le', _format_bound(bound)),)
+                lines.append("%s_bucket%s %d" % (metric, _format_labels(bucket_labels), count))
+            lines.append("%s_sum%s %s" % (metric, _format_labels(labels), _format_value(histogram.sum)))
+            lines.append("%s_count%s %d" % (metric, _format_labels(labels), histogram.count))
+        for name, value in (('last_run_timestamp_seconds', time.time()),
+                            ('last_run_duration_seconds', time.time() - self.started)):
+            metric = "%s_%s" % (prefix, name)
+            describe(metric, 'gauge')
+            lines.append("%s %s" % (metric, _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, json_path=None, textfile_path=None, extra=None):
+        """
+        Write the JSON summary and the Prometheus textfile.
+
+        Args:
+            json_path: JSON summary file (default: a timestamped file in config.METRICS_DIR)
+            textfile_path: Prometheus textfile (default: config.METRICS_TEXTFILE)
+            extra: Additional sections for the JSON summary (e.g. HTTP pool statistics)
+
+        Returns:
+            tuple: (json_path, textfile_path)
+        """
+        if json_path is None:
+            stamp = datetime.fromtimestamp(self.started).strftime('%Y-%m-%d_%H%M%S')
+            json_path = os.path.join(config.METRICS_DIR, 'run_%s.json' % stamp)
+        textfile_path = textfile_path or config.METRICS_TEXTFILE
+        summary = self.summary()
+        summary.update(extra or {})
+        _write_atomic(json_path, json.dumps(summary, indent=2, default=str))
+        # The textfile collector may read at any moment, so it must never see a partial file
+        _write_atomic(textfile_path, self.prometheus())
+        logging.info("Run metrics written to %s and %s", json_path, textfile_path)
+        return json_path, textfile_path
+
+
+_HELP = {
+    'requests': "HTTP requests sent by the last run, by outcome",
+    'downloaded_bytes': "Response body bytes downloaded by the last run",
+    'retries': "Requests retried after a transient failure by the last run",
+    'cache_hits': "Pages served from the response cache by the last run",
+    'parse_memo_lookups': "Extracted pages looked up in the parse memo by the last run, by outcome and page type",
+    'phase_seconds': "Seconds spent per phase by the last run, summed over concurrent requests",
+    'stage_seconds': "Seconds spent per scraper stage and workflow step by the last run",
+    'stage_runs': "Scraper stage and workflow step runs in the last run",
+    'stage_rows': "Rows produced per scraper stage by the last run",
+    'rows_written': "Rows written to CSV files or the storage backend by the last run",
+    'commissions': "Commissions processed by the last run, by outcome",
+    'daemon_polls': "Listing polls of the daemon since it started, by commission and outcome",
+    'daemon_new_meetings': "New or changed meetings the daemon found on the listings since it started",
+    'request_duration_seconds': "Latency of the HTTP requests of the last run",
+    'last_run_timestamp_seconds': "Unix time at which the last run finished",
+    'last_run_duration_seconds': "Wall-clock duration of the last run",
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append('%s="%s"' % (name, value))
+    return "{%s}" % ",".join(escaped)
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(float(bound))
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def current_commission():
+    """Return the commission of the current workflow thread/task ('-' outside a workflow)."""
+    import error_handler
+    return error_handler.get_log_context()
+
+
+@contextmanager
+def stage(name):
+    """Time a workflow step for the current commission."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_metrics().record_stage(name, time.perf_counter() - started)
+
+
+def timed_stage(name, rows=len):
+    """
+    Decorator that records the time and the number of rows of a scraper stage.
+
+    Args:
+        name: Stage name
+        rows: Function of the stage's return value giving the number of rows produced
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                count = rows(result) if result is not None else 0
+                get_metrics().record_stage(name, time.perf_counter() - started, count)
+        return wrapper
+    return decorator
+
+
+_metrics = Metrics()
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics of the current run."""
+    return _metrics
+
+
+def reset_metrics():
+    """Start collecting the metrics of a new run and return them."""
+    global _metrics
+    with _metrics_lock:
+        _metrics = Metrics()
+        return _metrics
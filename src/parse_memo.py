@@ -0,0 +1,218 @@
+# parse_memo.py
+"""
+Memo of extracted pages, keyed by a hash of the page body.
+
+A page that is downloaded again often has exactly the same HTML as the last
+time (a finished verslag page, a meeting whose agenda is final). Its fields
+and items are then taken from the memo instead of parsing the page and
+running its extraction spec again. Entries are stored per page type with
+the signature of the spec that produced them, so changing a spec in
+extraction_specs.py makes its old entries misses. The least recently used
+entries are dropped once the memo grows beyond PARSE_MEMO_MAX_BYTES.
+
+    python src/parse_memo.py stats
+    python src/parse_memo.py clear
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+import config
+from extraction_specs import PageData
+from html_parser import parsed_document
+from metrics import get_metrics
+
+
+class ParseMemo:
+    """
+    SQLite table of (page type, SHA-256 of the body) -> the PageData the
+    page type's spec extracted from that body, zlib-compressed JSON.
+
+    Hits and misses are counted per page type for the run's statistics.
+    """
+    def __init__(self, db_path, max_bytes=None):
+        self.max_bytes = config.PARSE_MEMO_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS pages (
+                page_type TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                spec_signature TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (page_type, body_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages (last_access);
+        """)
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        self._signatures = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def body_hash(content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+
+    def _signature(self, spec):
+        signature = self._signatures.get(spec.name)
+        if signature is None:
+            signature = self._signatures[spec.name] = spec.signature()
+        return signature
+
+    def get(self, spec, body_hash):
+        """Return the PageData memoized for a body, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT spec_signature, data FROM pages WHERE page_type = ? AND body_hash = ?",
+                                   (spec.name, body_hash)).fetchone()
+            if row is not None and row[0] == self._signature(spec):
+                self._db.execute("UPDATE pages SET last_access = ? WHERE page_type = ? AND body_hash = ?",
+                                 (time.time(), spec.name, body_hash))
+                self._db.commit()
+            else:
+                row = None
+        if row is None:
+            self.misses[spec.name] += 1
+            get_metrics().inc('parse_memo_lookups', outcome='miss', page_type=spec.name)
+            return None
+        self.hits[spec.name] += 1
+        get_metrics().inc('parse_memo_lookups', outcome='hit', page_type=spec.name)
+        return PageData(*json.loads(zlib.decompress(row[1])))
+
+    def put(self, spec, body_hash, page):
+        """Memoize the PageData extracted from a body."""
+        data = zlib.compress(json.dumps(list(page), ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM pages WHERE page_type = ? AND body_hash = ?",
+                                        (spec.name, body_hash)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (page_type, body_hash, spec_signature, data, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (spec.name, body_hash, self._signature(spec), data, len(data), time.time()))
+            self._db.commit()
+            self._bytes += len(data) - (previous[0] if previous else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Called with the lock held; evicts down to 90% so the next puts do not evict again
+        target = self.max_bytes * 0.9
+        removed = 0
+        rows = self._db.execute("SELECT page_type, body_hash, size FROM pages ORDER BY last_access").fetchall()
+        for page_type, body_hash, size in rows:
+            if self._bytes <= target:
+                break
+            self._db.execute("DELETE FROM pages WHERE page_type = ? AND body_hash = ?", (page_type, body_hash))
+            self._bytes -= size
+            removed += 1
+        self._db.commit()
+        logging.info("Evicted %d entries from the parse memo", removed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._db.commit()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = sum(self.hits.values()) + sum(self.misses.values())
+        with self._lock:
+            entries = dict(self._db.execute("SELECT page_type, COUNT(*) FROM pages GROUP BY page_type").fetchall())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": round(sum(self.hits.values()) / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._bytes,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        if not stats["hits"] and not stats["misses"]:
+            return
+        per_type = ", ".join("%s %d/%d" % (page_type, self.hits[page_type],
+                                           self.hits[page_type] + self.misses[page_type])
+                             for page_type in sorted(set(self.hits) | set(self.misses)))
+        logging.info("Parse memo: %.1f%% of pages not parsed again (%s), %d bytes on disk",
+                     100 * stats["hit_rate"], per_type, stats["bytes"])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def extract_page(spec, content):
+    """
+    Apply an extraction spec to a page body, or return what it extracted
+    from an identical body before.
+
+    Args:
+        spec: extraction_specs.PageSpec; its name is the page type
+        content: The page HTML (bytes or str)
+
+    Returns:
+        PageData with plain dicts as items
+    """
+    memo = get_parse_memo()
+    body_hash = None
+    if memo is not None:
+        body_hash = memo.body_hash(content)
+        page = memo.get(spec, body_hash)
+        if page is not None:
+            return page
+    with parsed_document(content, page_type=spec.name) as document:
+        page = spec.extract(document)
+    if memo is not None:
+        memo.put(spec, body_hash, page)
+    return page
+
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+def get_parse_memo():
+    """Return the process-wide parse memo, or None when it is disabled."""
+    global _memo
+    if not config.PARSE_MEMO_ENABLED:
+        return None
+    with _memo_lock:
+        if _memo is None:
+            _memo = ParseMemo(config.PARSE_MEMO_DB)
+        return _memo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('stats', 'clear'))
+    args = parser.parse_args(argv)
+    memo = ParseMemo(config.PARSE_MEMO_DB)
+    if args.command == 'clear':
+        memo.clear()
+        print("Cleared the parse memo in %s" % config.PARSE_MEMO_DB)
+    else:
+        stats = memo.stats()
+        for page_type, entries in sorted(stats["entries"].items()):
+            print("%-10s %8d pages" % (page_type, entries))
+        print("%d bytes in %s" % (stats["bytes"], config.PARSE_MEMO_DB))
+    memo.close()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main())
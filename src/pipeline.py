@@ -0,0 +1,264 @@
+# pipeline.py
+import asyncio
+import logging
+from contextlib import ExitStack
+
+import config
+from utils import BufferedCsvWriter
+from fetch_engine import FetchEngine
+from agenda_scraper import AgendaScraper
+from questions_scraper import QUESTION_FIELDNAMES, QuestionsScraper
+from speeches_scraper import SpeechesScraper
+from seen_index import meeting_fingerprint
+from storage import COMBINED_FIELDNAMES, CONTENT_FIELDNAMES
+from clean_content import filter_rows, get_ledger
+from metrics import get_metrics
+
+# Marks the end of a stage's input queue
+_DONE = object()
+
+
+class StreamingPipeline:
+    """
+    Runs the agenda, questions and speeches stages for one commission as a
+    streaming pipeline.
+
+    Every agenda item ID found on a meeting page flows through an in-memory
+    queue straight into question fetching, and every verslag link found on a
+    question page flows into speech fetching, so the stages overlap their
+    network latency. The stages share one fetch engine and therefore the same
+    request limits. The rows of every page are written to the meetings and
+    content CSVs (or the storage backend) as soon as the page is extracted,
+    in the same format as the staged workflow produces, so memory does not
+    grow with the number of pages.
+    Pages completed before an interrupted run of the same day are taken from
+    the checkpoint journal instead of being fetched again.
+    """
+    def __init__(self, commission_name, meetings_data, meetings_csv, content_csv,
+                 seen_index=None, engine=None, storage=None, journal=None, questions_csv=None):
+        self.commission_name = commission_name
+        self.meetings_data = meetings_data
+        self.meetings_csv = meetings_csv
+        self.content_csv = content_csv
+        # The content CSV is written cleaned, without its question rows; they
+        # go to this file instead when it is given (see compaction.py)
+        self.questions_csv = questions_csv
+        self.seen_index = seen_index
+        self.storage = storage
+        self.journal = journal
+        self.engine = engine or FetchEngine()
+        # The stage scrapers are only used for their page extraction
+        self.agenda = AgendaScraper(meetings_csv, meetings_csv, config.BASE_MEETING_URL,
+                                    seen_index=seen_index, commission_name=commission_name)
+        self.questions = QuestionsScraper(meetings_csv, content_csv, config.BASE_QUESTIONS_URL,
+                                          seen_index=seen_index, commission_name=commission_name)
+        self.speeches = SpeechesScraper(content_csv, content_csv, config.BASE_URL_PREFIX,
+                                        seen_index=seen_index, commission_name=commission_name)
+        # CSV sinks while the pipeline runs (None with a storage backend)
+        self.meetings_writer = None
+        self.content_writer = None
+        self.questions_writer = None
+        self.counts = {'agenda': 0, 'questions': 0, 'speeches': 0}
+        # Journaled rows per stage and URL, loaded when the run starts
+        self.journaled = {'agenda': {}, 'questions': {}, 'speeches': {}}
+
+    def _from_journal(self, stage, url):
+        """Return the journaled rows of a page, or None if it still has to be fetched."""
+        return self.journaled[stage].get(url)
+
+    def _record(self, stage, url, rows):
+        if self.journal is not None:
+            self.journal.record(stage, url, rows)
+
+    def run(self):
+        """
+        Run all stages, writing their rows as they come.
+
+        Returns:
+            tuple: (number of agenda items, questions, speeches) scraped
+        """
+        with ExitStack() as sinks:
+            if self.storage is None:
+                self.meetings_writer = sinks.enter_context(
+                    BufferedCsvWriter(self.meetings_csv, COMBINED_FIELDNAMES))
+                self.content_writer = sinks.enter_context(BufferedCsvWriter(self.content_csv, CONTENT_FIELDNAMES))
+                if self.questions_csv:
+                    self.questions_writer = sinks.enter_context(
+                        BufferedCsvWriter(self.questions_csv, QUESTION_FIELDNAMES))
+            asyncio.run(self._run())
+        self._finish()
+        # The stages overlap, so only their rows are counted separately
+        metrics = get_metrics()
+        for stage, count in self.counts.items():
+            metrics.record_rows(stage, count)
+        return self.counts['agenda'], self.counts['questions'], self.counts['speeches']
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.engine.max_concurrency)
+        question_queue = asyncio.Queue()
+        speech_queue = asyncio.Queue()
+        workers = self.engine.max_concurrency
+        seen_links = set()
+
+        if self.journal is not None:
+            for stage in self.journaled:
+                self.journaled[stage] = self.journal.completed(stage)
+            logging.info("Resuming %s pages from the checkpoint journal",
+                         {stage: len(pages) for stage, pages in self.journaled.items()})
+
+        meetings = [(str(row["ID"]), meeting_fingerprint(row)) for row in self.meetings_data if row.get("ID")]
+        fingerprints = dict(meetings)
+        meeting_ids = [meeting_id for meeting_id, _ in meetings]
+        if self.seen_index is not None:
+            # Meetings this run completed before an interruption are never skipped
+            journaled = {meeting_id for meeting_id in meeting_ids
+                         if config.BASE_MEETING_URL + meeting_id in self.journaled['agenda']}
+            new_ids = set(self.seen_index.new_meetings([meeting for meeting in meetings
+                                                        if meeting[0] not in journaled]))
+            kept = [meeting_id for meeting_id in meeting_ids if meeting_id in journaled or meeting_id in new_ids]
+            logging.info("Skipping %d already scraped meetings", len(meeting_ids) - len(kept))
+            meeting_ids = kept
+
+        meeting_queue = asyncio.Queue()
+        for position, meeting_id in enumerate(meeting_ids):
+            meeting_queue.put_nowait((position, meeting_id))
+
+        async def agenda_worker():
+            while not meeting_queue.empty():
+                position, meeting_id = meeting_queue.get_nowait()
+                await agenda_page(position, meeting_id)
+
+        async def agenda_page(position, meeting_id):
+            url = config.BASE_MEETING_URL + meeting_id
+            items = self._from_journal('agenda', url)
+            if items is None:
+                response = await self.engine.fetch(url, semaphore)
+                logging.info("Scraping meeting details from: %s", url)
+                if not response:
+                    return
+                items = self.agenda.extract_agenda_items(meeting_id, response.content)
+                self._record('agenda', url, items)
+            self._write_agenda_items(items)
+            if self.seen_index is not None and items:
+                self.seen_index.record_meeting(meeting_id, fingerprints.get(meeting_id), self.commission_name)
+                self.seen_index.record_agenda_items(meeting_id, [item["ID"] for item in items],
+                                                    self.commission_name)
+            # Only agenda items whose question/speeches are not captured yet
+            item_ids = [item["ID"] for item in items if item["ID"]]
+            if self.seen_index is not None:
+                item_ids = [item_id for item_id in item_ids
+                            if config.BASE_QUESTIONS_URL + item_id in self.journaled['questions']
+                            or self.seen_index.new_agenda_items([item_id])]
+            item_ids = set(item_ids)
+            for index, item in enumerate(items):
+                if item["ID"] in item_ids:
+                    await question_queue.put(((position, index), item["ID"]))
+
+        async def question_worker():
+            while True:
+                entry = await question_queue.get()
+                if entry is _DONE:
+                    return
+                key, item_id = entry
+                url = config.BASE_QUESTIONS_URL + item_id
+                journaled = self._from_journal('questions', url)
+                if journaled is not None:
+                    question = journaled[0] if journaled else None
+                else:
+                    response = await self.engine.fetch(url, semaphore)
+                    logging.info("Scraping question from URL: %s", url)
+                    if not response:
+                        continue
+                    question = self.questions.extract_question(item_id, url, response.content)
+                    self._record('questions', url, [question] if question else [])
+                if not question:
+                    continue
+                self._write_question(question)
+                if self.seen_index is not None:
+                    self.seen_index.record_question(item_id, question["link"])
+                link = question["link"]
+                if link and link not in seen_links:
+                    seen_links.add(link)
+                    if (self.seen_index is None or self.speeches.full_url(link) in self.journaled['speeches']
+                            or self.seen_index.new_speech_links([link])):
+                        await speech_queue.put((key, link, question["ID"]))
+
+        async def speech_worker():
+            while True:
+                entry = await speech_queue.get()
+                if entry is _DONE:
+                    return
+                key, link, question_id = entry
+                full_url = self.speeches.full_url(link)
+                rows = self._from_journal('speeches', full_url)
+                if rows is None:
+                    response = await self.engine.fetch(full_url, semaphore)
+                    logging.info("Scraping speeches from page: %s", full_url)
+                    if not response:
+                        continue
+                    rows = self.speeches.extract_speeches(full_url, response.content, question_id)
+                    self._record('speeches', full_url, rows)
+                self._write_speeches(rows)
+                if self.seen_index is not None and rows:
+                    self.seen_index.record_speech_link(full_url, self.commission_name)
+
+        # Each stage has its own workers; they compete for the same request
+        # slots, so fetches of all stages interleave
+        question_workers = [asyncio.create_task(question_worker()) for _ in range(workers)]
+        speech_workers = [asyncio.create_task(speech_worker()) for _ in range(workers)]
+
+        await asyncio.gather(*(agenda_worker() for _ in range(workers)))
+        for _ in question_workers:
+            await question_queue.put(_DONE)
+        await asyncio.gather(*question_workers)
+        for _ in speech_workers:
+            await speech_queue.put(_DONE)
+        await asyncio.gather(*speech_workers)
+
+    def _write_agenda_items(self, items):
+        if not items:
+            return
+        if self.storage is not None:
+            self.storage.upsert_agenda_items(self.commission_name, items)
+        else:
+            if not self.counts['agenda']:
+                # The meeting rows come first, as in the staged workflow
+                self.meetings_writer.write(self.meetings_data)
+            self.meetings_writer.write(items)
+        self.counts['agenda'] += len(items)
+
+    def _write_question(self, question):
+        if self.storage is not None:
+            self.storage.upsert_questions(self.commission_name, [question])
+        else:
+            # Nothing reads the content back in streaming mode, so the rows
+            # are cleaned as they are written
+            self.content_writer.write(filter_rows([question]))
+            if self.questions_writer is not None:
+                self.questions_writer.write([question])
+        self.counts['questions'] += 1
+
+    def _write_speeches(self, speeches):
+        if self.storage is not None:
+            self.storage.upsert_speeches(self.commission_name, speeches)
+        else:
+            self.content_writer.write(filter_rows(speeches))
+        self.counts['speeches'] += len(speeches)
+
+    def _finish(self):
+        counts = self.counts
+        if self.storage is not None:
+            logging.info("Stored %d agenda items, %d questions and %d speeches",
+                         counts['agenda'], counts['questions'], counts['speeches'])
+            return
+        if counts['agenda']:
+            logging.info("Updated meetings CSV with %d agenda items", counts['agenda'])
+        else:
+            logging.info("No agenda items scraped.")
+        if self.content_writer.rows_written:
+            # The file was written already filtered, so it is recorded as clean
+            get_ledger().mark_clean(self.content_csv)
+            logging.info("Saved %d questions and %d speeches to %s",
+                         counts['questions'], counts['speeches'], self.content_csv)
+        else:
+            logging.info("No questions or speeches scraped.")
@@ -1,107 +1,158 @@
 # questions_scraper.py
 import os
-import csv
 import logging
-import pandas as pd
-from bs4 import BeautifulSoup
-from utils import safe_get_text, write_csv
-from request_helper import make_request
+from contextlib import ExitStack
+from parse_memo import extract_page
+from extraction_specs import QUESTION_SPEC
+from utils import BufferedCsvWriter, read_header
+from fetch_engine import iter_fetch
+from metrics import timed_stage
+from checkpoint import split_completed
+from records import Question, read_csv
+
+QUESTION_FIELDNAMES = ["titel", "link", "ID", "original_ID", "content_type", "commission"]
 
 class QuestionsScraper:
-    def __init__(self, input_csv, output_csv, base_url):
+    def __init__(self, input_csv, output_csv, base_url, seen_index=None, commission_name="", storage=None,
+                 journal=None, questions_csv=None):
         self.input_csv = input_csv
         self.output_csv = output_csv
+        # Cleaning removes the question rows from the content CSV, so they are
+        # also written to this file when it is given (see compaction.py)
+        self.questions_csv = questions_csv
         self.base_url = base_url
-        self.output_data = []
+        self.seen_index = seen_index
+        self.commission_name = commission_name
+        # With a storage backend agenda items are read from and questions are
+        # upserted into it instead of the CSV files
+        self.storage = storage
+        # Question pages completed by an interrupted run are taken from the journal
+        self.journal = journal
+    
+    def extract_question(self, item_id, url, content):
+        """Extract the question row from the HTML of a question page, or None."""
+        page = extract_page(QUESTION_SPEC, content)
+        if page.fields is None:
+            logging.warning("Could not find page content on %s; skipping.", url)
+            return None
+        if not page.fields["titel"]:
+            logging.warning("No subtitle found on %s", url)
+        return Question.from_row(page.fields, original_id=item_id, commission=self.commission_name)
+    
+    def _read_ids_from_csv(self):
+        df = read_csv(self.input_csv)
+        
+        # We're interested in the agenda items (if available) 
+        # or the meeting IDs if no agenda items exist
+        if 'data_type' in df.columns and 'agenda_item' in df['data_type'].values:
+            # Filter for agenda items
+            agenda_items = df[df['data_type'] == 'agenda_item']
+            return agenda_items["ID"].dropna().astype(str).tolist()
+        if self.seen_index is not None:
+            # In incremental runs no agenda items means no new meetings
+            return []
+        # No agenda items found, use all available IDs
+        return df["ID"].dropna().astype(str).tolist()
     
+    @timed_stage('questions', rows=lambda count: count)
     def scrape(self):
-        if not os.path.exists(self.input_csv):
+        """
+        Scrape the question pages of the agenda items.
+        
+        Returns:
+            int: Number of questions scraped or taken from the journal
+        """
+        if self.storage is None and not os.path.exists(self.input_csv):
             logging.error("Input CSV file not found: %s", self.input_csv)
-            return []
+            return 0
         
-        # Read the meetings CSV to get IDs of meetings/agenda items
+        # Read the meetings CSV (or storage) to get IDs of meetings/agenda items
         try:
-            df = pd.read_csv(self.input_csv)
-            
-            # We're interested in the agenda items (if available) 
-            # or the meeting IDs if no agenda items exist
-            if 'data_type' in df.columns and 'agenda_item' in df['data_type'].values:
-                # Filter for agenda items
-                agenda_items = df[df['data_type'] == 'agenda_item']
-                ids_to_process = agenda_items["ID"].dropna().astype(str).tolist()
+            if self.storage is not None:
+                ids_to_process = [item["ID"] for item in self.storage.agenda_items(self.commission_name)
+                                  if item["ID"]]
             else:
-                # No agenda items found, use all available IDs
-                ids_to_process = df["ID"].dropna().astype(str).tolist()
+                ids_to_process = self._read_ids_from_csv()
         except Exception as e:
             logging.error("Error reading input CSV %s: %s", self.input_csv, e)
-            return []
+            return 0
         
         if not ids_to_process:
             logging.warning("No IDs found to process in %s", self.input_csv)
-            return []
+            return 0
         
-        # Scrape question details for each ID
-        for item_id in ids_to_process:
-            url = self.base_url + item_id
-            logging.info("Scraping question from URL: %s", url)
-            
-            # Use the request helper to make the request with a delay
-            response = make_request(url)
-            if not response:
-                continue  # Skip this item if request failed
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            content_div = soup.find("div", class_="page-layout__content")
-            if not content_div:
-                logging.warning("Could not find page content on %s; skipping.", url)
-                continue
-            
-            subtitle_elem = content_div.find("h2", class_="page-subtitle")
-            titel = safe_get_text(subtitle_elem)
-            if not titel:
-                logging.warning("No subtitle found on %s", url)
-            
-            report_link_elem = content_div.find("a", class_="button button-primary header-links-icon--report")
-            link = report_link_elem.get("href", "").strip() if report_link_elem else ""
-            new_id = link.rstrip('/').split('/')[-1] if link else ""
-            
-            self.output_data.append({
-                "titel": titel,
-                "link": link,
-                "ID": new_id,
-                "original_ID": item_id,
-                "content_type": "question"
-            })
+        # Questions this run already completed before it was interrupted
+        all_ids = ids_to_process
+        journaled, ids_to_process = split_completed(self.journal, 'questions', all_ids,
+                                                    lambda item_id: self.base_url + item_id)
         
-        if self.output_data:
-            # Check if the output file already exists
-            file_exists = os.path.exists(self.output_csv)
-            
-            if file_exists:
-                # If file exists, append to it
-                mode = 'a'
-                # Read existing headers
-                existing_df = pd.read_csv(self.output_csv)
-                fieldnames = existing_df.columns.tolist()
-                write_header = False
-            else:
-                # If file doesn't exist, create it
-                mode = 'w'
-                fieldnames = ["titel", "link", "ID", "original_ID", "content_type", "commission"]
-                write_header = True
-            
-            # Write to CSV
-            with open(self.output_csv, mode, newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                if write_header:
-                    writer.writeheader()
-                writer.writerows(self.output_data)
-            
-            logging.info("Saved %d questions to %s", len(self.output_data), self.output_csv)
+        # Skip agenda items whose question and speeches were already captured
+        if self.seen_index is not None:
+            new_ids = self.seen_index.new_agenda_items(ids_to_process)
+            logging.info("Skipping %d already scraped agenda items", len(ids_to_process) - len(new_ids))
+            ids_to_process = new_ids
+        
+        pages = self._iter_pages(all_ids, journaled, ids_to_process)
+        if self.storage is not None:
+            count = sum(len(questions) for questions in pages)
+            logging.info("Stored %d questions", count)
+            return count
+        
+        if self.journal is not None:
+            # The journal holds every question of this run, so the content
+            # file is rewritten instead of appended to, also after a crash
+            writer = BufferedCsvWriter(self.output_csv, QUESTION_FIELDNAMES)
+        else:
+            # Append to an existing content file, in its own column order
+            writer = BufferedCsvWriter(self.output_csv, read_header(self.output_csv) or QUESTION_FIELDNAMES,
+                                       append=True)
+        writers = [writer]
+        if self.questions_csv:
+            writers.append(BufferedCsvWriter(self.questions_csv, QUESTION_FIELDNAMES, append=self.journal is None))
+        # Questions are written as their pages come in, one buffer at a time
+        with ExitStack() as sinks:
+            for sink in writers:
+                sinks.enter_context(sink)
+            for questions in pages:
+                for sink in writers:
+                    sink.write(questions)
+        if writer.rows_written:
+            logging.info("Saved %d questions to %s", writer.rows_written, self.output_csv)
         else:
             logging.info("No questions data scraped.")
+        return writer.rows_written
+    
+    def _iter_pages(self, all_ids, journaled, fetch_ids):
+        """
+        Yield the question rows (none or one) of each agenda item in order,
+        whether they come from the journal or the site.
         
-        return self.output_data
+        The pages are fetched as they are needed; the fetch engine keeps
+        several requests in flight within the per-host rate limit.
+        """
+        fetched_ids = set(fetch_ids)
+        responses = iter_fetch([self.base_url + item_id for item_id in fetch_ids])
+        for item_id in all_ids:
+            if item_id in journaled:
+                yield journaled[item_id]
+                continue
+            if item_id not in fetched_ids:
+                continue
+            url, response = next(responses)
+            logging.info("Scraping question from URL: %s", url)
+            if not response:
+                continue  # Skip this item if request failed
+            
+            question = self.extract_question(item_id, url, response.content)
+            questions = [question] if question else []
+            if question:
+                if self.storage is not None:
+                    self.storage.upsert_questions(self.commission_name, questions)
+                if self.seen_index is not None:
+                    self.seen_index.record_question(item_id, question["link"])
+            if self.journal is not None:
+                self.journal.record('questions', url, questions)
+            yield questions
 
 if __name__ == '__main__':
     import config
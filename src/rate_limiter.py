@@ -0,0 +1,283 @@
+# rate_limiter.py
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import config
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out request slots at a fixed average rate.
+
+    Callers reserve a token and are told how long to wait for it, so the
+    bucket can be shared by threads and by asyncio tasks alike.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token and return the number of seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def set_rate(self, rate):
+        """Change the rate; tokens earned so far keep the old rate."""
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds` (e.g. after a Retry-After)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def acquire(self):
+        """Block until a token is available. Returns the time spent waiting."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class AimdController:
+    """
+    Additive-increase/multiplicative-decrease of a value between bounds.
+
+    Every success adds `increase / value`, so the value grows by about
+    `increase` per `value` successes (per second for a rate, per window of
+    requests for a concurrency limit). Congestion multiplies it by `decrease`,
+    at most once per `cooldown` seconds so one burst of errors counts once.
+    """
+    def __init__(self, value, minimum, maximum, increase, decrease, cooldown=1.0):
+        self.minimum = float(minimum)
+        self.maximum = float(max(maximum, minimum))
+        self.value = min(self.maximum, max(self.minimum, float(value)))
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.value = min(self.maximum, self.value + self.increase / self.value)
+            return self.value
+
+    def on_congestion(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.value = max(self.minimum, self.value * self.decrease)
+            return self.value
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host that is clearly down.
+
+    After `threshold` consecutive failures (connection errors and 5xx) the
+    circuit opens and requests fail fast for `reset_seconds`. Then one probe
+    request is let through: success closes the circuit, failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, host, threshold, reset_seconds):
+        self.host = host
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                # Let one probe through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("Circuit for %s closed again", self.host)
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                logging.warning("Circuit for %s opened after %d consecutive failures; pausing requests for %ds",
+                                self.host, self.failures, self.reset_seconds)
+
+
+class _Host:
+    """Rate limit, rate controller and circuit breaker of one host."""
+    def __init__(self, host, rate, capacity):
+        self.bucket = TokenBucket(rate, capacity)
+        self.rate = AimdController(rate, config.MIN_REQUESTS_PER_SECOND_PER_HOST,
+                                   config.MAX_REQUESTS_PER_SECOND_PER_HOST,
+                                   config.AIMD_RATE_INCREASE, config.AIMD_DECREASE_FACTOR)
+        self.breaker = CircuitBreaker(host, config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_SECONDS)
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host, and adapts each host's rate to the
+    responses it gets (see record) when config.ADAPTIVE_RATE is set.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = _Host(host, self.rate, self.capacity)
+                self._hosts[host] = state
+            return state
+
+    def bucket_for(self, url):
+        return self._host(url).bucket
+
+    def acquire(self, url):
+        return self.bucket_for(url).acquire()
+
+    async def acquire_async(self, url):
+        return await self.bucket_for(url).acquire_async()
+
+    def allow(self, url):
+        """Return False while the circuit breaker of the URL's host is open."""
+        return self._host(url).breaker.allow()
+
+    def record(self, url, latency, status=None, retry_after=None):
+        """
+        Feed the outcome of a request back into the host's rate and circuit breaker.
+
+        Args:
+            url: The requested URL
+            latency: Seconds the request took
+            status: HTTP status code, or None for a connection error or timeout
+            retry_after: Seconds the server asked us to wait (429/503), if any
+        """
+        state = self._host(url)
+        throttled = status == 429
+        failed = status is None or status >= 500
+        if retry_after:
+            state.bucket.pause(retry_after)
+        if failed:
+            state.breaker.failure()
+        else:
+            state.breaker.success()
+        # Throttling, errors and slow responses all mean the server is under load
+        congested = throttled or failed or latency > config.AIMD_LATENCY_TARGET
+        if congested:
+            _request_slots.on_congestion()
+        else:
+            _request_slots.on_success()
+        if not config.ADAPTIVE_RATE:
+            return
+        rate = state.rate.on_congestion() if congested else state.rate.on_success()
+        if rate != state.bucket.rate:
+            if congested:
+                logging.info("Lowering request rate for %s to %.2f/s", urlsplit(url).netloc, rate)
+            state.bucket.set_rate(rate)
+
+    def rates(self):
+        """Return the current request rate per host."""
+        with self._lock:
+            return {host: round(state.bucket.rate, 3) for host, state in self._hosts.items()}
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Caps the number of requests in flight, like a semaphore whose size
+    follows an AIMD controller between MIN_CONCURRENT_REQUESTS and
+    MAX_CONCURRENT_REQUESTS. Use it as a context manager around a request.
+    """
+    def __init__(self, minimum, maximum):
+        self._controller = AimdController(maximum, minimum, maximum, 1.0, config.AIMD_DECREASE_FACTOR)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return max(1, int(self._controller.value))
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        if not config.ADAPTIVE_RATE:
+            return
+        before = self.limit
+        if self._controller.on_success() and self.limit > before:
+            with self._condition:
+                self._condition.notify_all()
+
+    def on_congestion(self):
+        if config.ADAPTIVE_RATE:
+            self._controller.on_congestion()
+
+
+# Process-wide limiter so every fetch path shares the same per-host budget,
+# also when several commissions are scraped in parallel.
+_limiter = HostRateLimiter(config.REQUESTS_PER_SECOND_PER_HOST, config.REQUEST_BURST)
+
+# Process-wide cap on the number of requests in flight across all workers.
+_request_slots = AdaptiveConcurrencyLimit(config.MIN_CONCURRENT_REQUESTS, config.MAX_CONCURRENT_REQUESTS)
+
+
+def get_limiter():
+    """Return the process-wide per-host rate limiter."""
+    return _limiter
+
+
+def request_slot():
+    """Return the process-wide limit on the requests in flight."""
+    return _request_slots
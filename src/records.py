@@ -0,0 +1,227 @@
+# records.py
+"""
+Typed, compact records for the rows the scrapers produce.
+
+A meeting, agenda item, question or speech is held as a __slots__ object
+instead of a dict: numeric IDs are ints, the low-cardinality columns
+(commission, speaker, agenda card tag) share one string object per value,
+and the Dutch dates of meetings ('donderdag 20 februari 2025') and verslag
+pages ('20 februari 2025 9 uur - ...') are parsed once, when the record is
+built from a scraped row (Meeting.meeting_date, Speech.speech_date), and
+written as ISO 'meeting_date' and 'speech_date' columns, which records read
+back from a CSV file, the storage or the journal take as they are.
+
+Records are read-only mappings from the CSV column names to the values as
+they are written ('ID' -> '1873396', a missing value -> ''), so
+csv.DictWriter, the storage backend, the cleaning rules and
+pandas.DataFrame take them like the row dicts they replace.
+"""
+import math
+import numbers
+import sys
+from collections.abc import Mapping
+from datetime import date
+
+import pandas as pd
+
+from utils import parse_dutch_day
+
+# pandas dtypes for reading the meetings and content CSVs: IDs stay exact
+# (no 1873396.0 from a column with blanks) and repeated texts are categoricals
+CSV_DTYPES = {
+    'ID': 'string',
+    'meeting_ID': 'string',
+    'original_ID': 'string',
+    'question_id': 'string',
+    'commission': 'category',
+    'content_type': 'category',
+    'data_type': 'category',
+    'card__tag': 'category',
+    'spreker': 'category',
+}
+
+
+def to_id(value):
+    """
+    Normalize an ID to an int when it is numeric.
+
+    Args:
+        value: ID as extracted, read from CSV (1873396.0, '1873396.0') or stored
+
+    Returns:
+        int, str for IDs that are not numbers, or None for a missing ID
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith('.0') and value[:-2].isdigit():
+            value = value[:-2]
+        if value.isdigit() and (value == '0' or not value.startswith('0')):
+            return int(value)
+        return value or None
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else str(value)
+    return str(value)
+
+
+def to_text(value):
+    """Normalize a scraped or CSV value to a string ('' for missing values)."""
+    if isinstance(value, str):
+        return value
+    if value is None or pd.isna(value):
+        return ''
+    return str(value)
+
+
+def to_day(value):
+    """Normalize an ISO date ('2025-02-27') or date to a date (None when it is missing or not one)."""
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(to_text(value).strip())
+    except ValueError:
+        return None
+
+
+def to_category(value):
+    """Return a text value as the one string object shared by all records with that value."""
+    return sys.intern(to_text(value))
+
+
+def _column_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (int, date)):
+        return str(value)
+    return value
+
+
+class Record(Mapping):
+    """
+    Base class of the records: a mapping of the CSV columns in COLUMNS to
+    the record's attributes.
+    """
+    __slots__ = ()
+
+    # CSV column -> attribute, in column order
+    COLUMNS = {}
+
+    @classmethod
+    def from_row(cls, row, **values):
+        """
+        Build a record from a row dict (extracted from a page, read from a
+        CSV file or the checkpoint journal) or another record.
+
+        Args:
+            row: Mapping of CSV column names to values
+            **values: Attribute values that replace those of the row
+        """
+        for column, attribute in cls.COLUMNS.items():
+            if attribute not in values and attribute in cls.__slots__:
+                values[attribute] = row.get(column)
+        return cls(**values)
+
+    def __getitem__(self, column):
+        try:
+            attribute = self.COLUMNS[column]
+        except KeyError:
+            raise KeyError(column) from None
+        return _column_value(getattr(self, attribute))
+
+    def __iter__(self):
+        return iter(self.COLUMNS)
+
+    def __len__(self):
+        return len(self.COLUMNS)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, dict(self))
+
+
+class Meeting(Record):
+    """A meeting on a commission listing page."""
+    __slots__ = ('date', 'title', 'description', 'view_link', 'watch_link', 'id', 'commission', 'meeting_date')
+
+    COLUMNS = {'date': 'date', 'title': 'title', 'description': 'description', 'view_link': 'view_link',
+               'watch_link': 'watch_link', 'ID': 'id', 'commission': 'commission', 'meeting_date': 'meeting_date'}
+
+    def __init__(self, date=None, title=None, description=None, view_link=None, watch_link=None, id=None,
+                 commission=None, meeting_date=None):
+        self.date = to_text(date)
+        self.title = to_text(title)
+        self.description = to_text(description)
+        self.view_link = to_text(view_link)
+        self.watch_link = to_text(watch_link)
+        self.id = to_id(id)
+        self.commission = to_category(commission)
+        # Parsed from the Dutch date only for scraped rows (and files from before the column)
+        self.meeting_date = to_day(meeting_date) or parse_dutch_day(self.date)
+
+
+class AgendaItem(Record):
+    """An agenda item card on a meeting page."""
+    __slots__ = ('meeting_id', 'tag', 'title', 'document_number', 'author', 'verslag_link', 'id')
+
+    COLUMNS = {'meeting_ID': 'meeting_id', 'card__tag': 'tag', 'card__title': 'title',
+               'card__document_number': 'document_number', 'card__author': 'author',
+               'verslag_link': 'verslag_link', 'ID': 'id', 'data_type': 'data_type'}
+    # Agenda items follow the meeting rows in the meetings CSV, marked by data_type
+    data_type = 'agenda_item'
+
+    def __init__(self, meeting_id=None, tag=None, title=None, document_number=None, author=None,
+                 verslag_link=None, id=None):
+        self.meeting_id = to_id(meeting_id)
+        self.tag = to_category(tag)
+        self.title = to_text(title)
+        self.document_number = to_text(document_number)
+        self.author = to_text(author)
+        self.verslag_link = to_text(verslag_link)
+        self.id = to_id(id)
+
+
+class Question(Record):
+    """The question (or interpellation) page of an agenda item."""
+    __slots__ = ('titel', 'link', 'id', 'original_id', 'commission')
+
+    COLUMNS = {'titel': 'titel', 'link': 'link', 'ID': 'id', 'original_ID': 'original_id',
+               'content_type': 'content_type', 'commission': 'commission'}
+    content_type = 'question'
+
+    def __init__(self, titel=None, link=None, id=None, original_id=None, commission=None):
+        self.titel = to_text(titel)
+        self.link = to_text(link)
+        self.id = to_id(id)
+        self.original_id = to_id(original_id)
+        self.commission = to_category(commission)
+
+
+class Speech(Record):
+    """One speech on a verslag page."""
+    __slots__ = ('titel', 'spreker', 'sprekertekst', 'datum', 'question_id', 'speech_link', 'commission',
+                 'speech_date')
+
+    COLUMNS = {'titel': 'titel', 'spreker': 'spreker', 'sprekertekst': 'sprekertekst', 'datum': 'datum',
+               'question_id': 'question_id', 'content_type': 'content_type', 'speech_link': 'speech_link',
+               'commission': 'commission', 'speech_date': 'speech_date'}
+    content_type = 'speech'
+
+    def __init__(self, titel=None, spreker=None, sprekertekst=None, datum=None, question_id=None,
+                 speech_link=None, commission=None, speech_date=None):
+        self.titel = to_text(titel)
+        self.spreker = to_category(spreker)
+        self.sprekertekst = to_text(sprekertekst)
+        self.datum = to_text(datum)
+        self.question_id = to_id(question_id)
+        self.speech_link = to_text(speech_link)
+        self.commission = to_category(commission)
+        self.speech_date = to_day(speech_date) or parse_dutch_day(self.datum)
+
+
+def read_csv(path, **kwargs):
+    """Read a meetings or content CSV with the column types of CSV_DTYPES."""
+    return pd.read_csv(path, dtype=CSV_DTYPES, **kwargs)
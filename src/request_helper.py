@@ -1,34 +1,140 @@
 # request_helper.py
-import requests
-import time
 import random
+import time
+import requests
 import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-def make_request(url):
+import config
+
+from http_cache import get_cache
+from http_client import HEADERS, get_client
+from rate_limiter import get_limiter, request_slot
+from metrics import get_metrics
+
+# Statuses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_after_seconds(response):
+    """Return the wait a 429/503 response asks for in its Retry-After header, or None."""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), config.RETRY_AFTER_MAX)
+
+def backoff_delay(attempt, retry_after=None):
+    """Jittered exponential backoff before retry `attempt` (0-based), at least `retry_after`."""
+    delay = random.uniform(0, min(config.RETRY_BACKOFF_MAX, config.RETRY_BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+def send_request(url, session=None):
     """
-    Make an HTTP request with a random delay and proper headers.
-    
+    Perform the HTTP GET for a URL. The caller has taken a rate limit token
+    for the first attempt; retries take their own.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried up to
+    config.RETRY_ATTEMPTS times with jittered exponential backoff, waiting
+    at least as long as a Retry-After header asks. Every outcome is fed back
+    into the adaptive rate limit, and while the host's circuit breaker is
+    open no request is sent at all. Stale cache entries are revalidated and
+    fresh responses are stored in the response cache.
+
     Args:
         url: The URL to request
-        
+        session: Optional requests session to use instead of the shared client
+
     Returns:
         Response object on success, None on failure
     """
-    # Add a random delay between requests to be respectful to the server
-    time.sleep(random.uniform(1, 3))
-    
-    # Add a proper user-agent header
-    headers = {
-        'User-Agent': 'Vlaams Parlement Scraper/1.0 (Educational/Research Use)',
-        'Accept': 'text/html,application/xhtml+xml,application/xml',
-        'Accept-Language': 'en-US,en;q=0.5'
-    }
-    
     logging.info("Fetching URL: %s", url)
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+    cache = get_cache()
+    # Revalidate a stale cache entry with a conditional GET
+    headers = cache.conditional_headers(url) if cache else {}
+    limiter = get_limiter()
+    metrics = get_metrics()
+    for attempt in range(config.RETRY_ATTEMPTS + 1):
+        if not limiter.allow(url):
+            logging.error("Not fetching %s: the host looks down (circuit open)", url)
+            metrics.inc('requests', outcome='circuit_open')
+            return None
+        try:
+            # Stay within the global number of requests in flight
+            with request_slot():
+                started = time.perf_counter()
+                if session is not None:
+                    response = session.get(url, headers={**HEADERS, **headers})
+                    response.raise_for_status()
+                else:
+                    # The shared client reuses pooled keep-alive connections
+                    response = get_client().get(url, headers=headers)
+        except requests.RequestException as e:
+            elapsed = time.perf_counter() - started
+            failed = getattr(e, 'response', None)
+            status = failed.status_code if failed is not None else None
+            retry_after = retry_after_seconds(failed) if status in (429, 503) else None
+            metrics.record_request(elapsed, str(status) if status else 'error')
+            limiter.record(url, elapsed, status, retry_after)
+            if (status is not None and status not in RETRY_STATUSES) or attempt == config.RETRY_ATTEMPTS:
+                logging.error("Failed to retrieve %s: %s", url, e)
+                return None
+            delay = backoff_delay(attempt, retry_after)
+            logging.warning("Retrying %s in %.1fs (attempt %d of %d): %s",
+                            url, delay, attempt + 1, config.RETRY_ATTEMPTS, e)
+            metrics.inc('retries')
+            time.sleep(delay)
+            # A retry is a request like any other
+            metrics.add_phase('sleep', delay + limiter.acquire(url))
+            continue
+        elapsed = time.perf_counter() - started
+        metrics.record_request(elapsed, str(response.status_code), len(response.content))
+        limiter.record(url, elapsed, response.status_code)
+        if cache is None:
+            return response
+        response = cache.handle_response(url, response)
+        if response is None and headers and attempt < config.RETRY_ATTEMPTS:
+            # The 304 has no cached body to go with it: fetch the page in full
+            headers = {}
+            metrics.add_phase('sleep', limiter.acquire(url))
+            continue
+        return response
+    return None
+
+def cached_response(url, max_age=None):
+    """Return a fresh response from the on-disk cache, or None."""
+    cache = get_cache()
+    response = cache.get_fresh(url, max_age) if cache else None
+    if response is not None:
+        get_metrics().inc('cache_hits')
+    return response
+
+def make_request(url, session=None, max_age=None):
+    """
+    Make an HTTP request within the per-host rate limit and with proper headers.
+    Fresh cached responses are returned without touching the network.
+
+    Args:
+        url: The URL to request
+        session: Optional requests session to use instead of the shared client
+        max_age: Seconds a cached response may be old to be returned as is,
+            for callers that need fresher pages than the TTL (0 revalidates every time)
+
+    Returns:
+        Response object on success, None on failure
+    """
+    response = cached_response(url, max_age)
+    if response is not None:
         return response
-    except requests.RequestException as e:
-        logging.error("Failed to retrieve %s: %s", url, e)
-        return None
\ No newline at end of file
+    
+    # Wait for a slot in the per-host budget to be respectful to the server
+    get_metrics().add_phase('sleep', get_limiter().acquire(url))
+    return send_request(url, session=session)
@@ -1,44 +1,96 @@
 # scrapers.py
+import logging
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+import config
+from html_parser import SoupNode
+from extraction_specs import LISTING_SPEC, last_path_segment
+from records import Meeting
+from parse_memo import extract_page
+from request_helper import make_request
 from utils import safe_get_text
+from metrics import timed_stage
+
+LISTING_FIELDNAMES = ['date', 'title', 'description', 'view_link', 'watch_link', 'ID']
 
 class BaseScraper:
     def __init__(self, soup):
-        self.soup = soup
+        # Accept a parsed html_parser.Node, or a BeautifulSoup object as before
+        self.soup = SoupNode(soup) if isinstance(soup, BeautifulSoup) else soup
 
     def extract_id(self, link):
         """Extract the ID from a URL (the portion after the final '/')"""
-        return link.rstrip('/').split('/')[-1] if link else ''
+        return last_path_segment(link)
 
 
 class CommissionScraper(BaseScraper):
-    """Generic scraper for commission meetings"""
+    """
+    Generic scraper for commission meetings, from a parsed listing page or
+    from its HTML (content), which goes through the parse memo.
+    """
+    next_page = ""
+
+    def __init__(self, soup=None, content=None):
+        super().__init__(soup)
+        self.content = content
+
+    @timed_stage('listing', rows=lambda result: len(result[0]))
     def scrape(self):
-        data = []
-        cards = self.soup.select('article.card.meeting-card')
-        for card in cards:
-            header = card.find('header', class_='card__header')
-            date_text = safe_get_text(header.find('span', class_='card__date')) if header else ''
-            h4 = header.find('h4', class_='card__title') if header else None
-            h5 = header.find('h5', class_='card__title') if header else None
-            title1 = safe_get_text(h4)
-            title2 = safe_get_text(h5)
-            full_title = title1 + ((" - " + title2) if title2 else "")
-            description = safe_get_text(card.select_one('div.card__description p'))
-            view_link_tag = card.select_one('li.card__link.card__link-view a')
-            view_link = view_link_tag.get('href', '') if view_link_tag else ''
-            watch_link_tag = card.select_one('li.card__link.card__link-watch a')
-            watch_link = watch_link_tag.get('href', '') if watch_link_tag else ''
-            extracted_id = self.extract_id(view_link)
-            data.append({
-                'date': date_text,
-                'title': full_title,
-                'description': description,
-                'view_link': view_link,
-                'watch_link': watch_link,
-                'ID': extracted_id
-            })
-        fieldnames = ['date', 'title', 'description', 'view_link', 'watch_link', 'ID']
-        return data, fieldnames
+        if self.content is not None:
+            page = extract_page(LISTING_SPEC, self.content)
+        else:
+            page = LISTING_SPEC.extract(self.soup)
+        # Link to the next page of the listing, empty on the last page
+        self.next_page = page.fields['next_page']
+        return [Meeting.from_row(item) for item in page.items], list(LISTING_FIELDNAMES)
+
+
+def scrape_listing(url, max_pages=None, max_age=None):
+    """
+    Scrape a commission listing and all its following pages.
+
+    Meetings that show up on more than one page (the listing shifted while
+    it was paged through) are kept once.
+
+    Args:
+        url: URL of the first listing page
+        max_pages: Maximum number of pages to follow (default: config.LISTING_MAX_PAGES)
+        max_age: Seconds a cached listing page may be old (default: its cache TTL)
+
+    Returns:
+        tuple: (meetings, fieldnames, complete). meetings is None when the
+        first page could not be loaded; complete is False when a later page
+        could not be loaded or max_pages was reached.
+    """
+    max_pages = max_pages or config.LISTING_MAX_PAGES
+    meetings = []
+    seen_ids = set()
+    visited = set()
+    pages = 0
+    while url:
+        if pages >= max_pages:
+            logging.warning("Stopped following the listing after %d pages at %s", pages, url)
+            return meetings, list(LISTING_FIELDNAMES), False
+        response = make_request(url, max_age=max_age)
+        if response is None:
+            if pages == 0:
+                return None, list(LISTING_FIELDNAMES), False
+            logging.error("Failed to load listing page %d: %s", pages + 1, url)
+            return meetings, list(LISTING_FIELDNAMES), False
+        pages += 1
+        visited.add(url)
+        scraper = CommissionScraper(content=response.content)
+        page_meetings, _ = scraper.scrape()
+        for meeting in page_meetings:
+            if meeting['ID'] not in seen_ids:
+                seen_ids.add(meeting['ID'])
+                meetings.append(meeting)
+        next_url = urljoin(url, scraper.next_page) if scraper.next_page else None
+        url = next_url if next_url not in visited else None
+    if pages > 1:
+        logging.info("Followed %d listing pages: %d meetings", pages, len(meetings))
+    return meetings, list(LISTING_FIELDNAMES), True
 
 
 # Keep these for backward compatibility or if you want to process other types
@@ -47,9 +99,9 @@ class VragenOmgevingScraper(BaseScraper):
         data = []
         cards = self.soup.select('article.card.card--document')
         for card in cards:
-            title = safe_get_text(card.find(class_='card__title'))
-            author = safe_get_text(card.find(class_='card__author'))
-            status = safe_get_text(card.find(class_='card__status'))
+            title = safe_get_text(card.select_one('.card__title'))
+            author = safe_get_text(card.select_one('.card__author'))
+            status = safe_get_text(card.select_one('.card__status'))
             view_link_tag = card.select_one('.card__link.card__link-view a')
             view_link = view_link_tag.get('href', '') if view_link_tag else ''
             download_tag = card.select_one('.card__link.card__link-download a')
@@ -0,0 +1,437 @@
+# search_index.py
+"""
+Full-text search over the speeches in all content CSV files.
+
+The speeches are indexed in an SQLite FTS5 table (SEARCH_DB) on their text,
+speaker and title, with the commission and date as filter columns. The index
+is updated incrementally at the end of each run: only content files that are
+new or changed since they were indexed (by size and modification time) are
+read.
+
+    python src/search_index.py query "klimaat NEAR(subsidie)" --commission omgeving --since 2024-01-01
+    python src/search_index.py query "spreker:Demir windenergie" --order date --limit 50
+    python src/search_index.py update      # index new and changed content files
+    python src/search_index.py rebuild     # index all content files from scratch
+    python src/search_index.py stats
+
+Queries use the FTS5 query syntax: words (matched without accents and case),
+"phrases", prefix*, AND/OR/NOT, NEAR(a b) and column filters (titel:,
+spreker:, sprekertekst:). Words FTS5 would read as syntax, such as
+klimaat-subsidie or a lone AND, are searched as phrases; --raw passes the
+query to FTS5 as it is. Results are ranked with BM25, weighting matches in
+the title and the speaker above matches in the text.
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import config
+from blob_store import get_blob_store, is_ref
+from metrics import get_metrics
+from utils import parse_dutch_date
+
+# Content rows can hold very long speeches
+csv.field_size_limit(2 ** 31 - 1)
+
+# BM25 weights of the indexed columns: titel, spreker, sprekertekst
+RANK_WEIGHTS = (5.0, 2.0, 1.0)
+
+SEARCH_COLUMNS = ('titel', 'spreker', 'sprekertekst')
+_QUERY_TOKENS = re.compile(r'"[^"]*"\*?|[(),]|[^\s(),"]+')
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+def _is_bareword(word):
+    # FTS5 barewords: ASCII letters, digits and '_', and any non-ASCII character
+    return all(not char.isascii() or char.isalnum() or char == '_' for char in word)
+
+
+def _term(word):
+    prefix = word.endswith('*')
+    word = word.rstrip('*')
+    if not any(char.isalnum() for char in word):
+        return None
+    if not _is_bareword(word):
+        word = '"%s"' % word.replace('"', '""')
+    return word + ('*' if prefix else '')
+
+
+def fts_query(query):
+    """
+    Turn a search as people type it into a valid FTS5 query: words with
+    characters FTS5 reads as syntax ('klimaat-subsidie', 'art.5') become
+    phrases, and AND/OR/NOT only act as operators between two terms.
+    Phrases, prefix*, NEAR(...), parentheses and column filters are kept.
+    """
+    tokens = _QUERY_TOKENS.findall(query)
+    output = []
+    near_depth = depth = 0
+
+    def operand(token, group=False):
+        # FTS5 only joins phrases implicitly; a (group) needs an explicit AND
+        previous = output[-1] if output else None
+        ends_operand = previous is not None and previous not in ('(', ',', 'NEAR') + _OPERATORS
+        if ends_operand and (group or previous == ')'):
+            output.append('AND')
+        output.append(token)
+
+    for position, token in enumerate(tokens):
+        following = tokens[position + 1] if position + 1 < len(tokens) else None
+        previous = output[-1] if output else None
+        if token.startswith('"'):
+            operand(token)
+        elif token == '(':
+            if previous == 'NEAR':
+                near_depth = depth + 1
+                output.append(token)
+            else:
+                operand(token, group=True)
+            depth += 1
+        elif token == ')':
+            if not depth:
+                continue
+            if near_depth == depth:
+                near_depth = 0
+            depth -= 1
+            output.append(token)
+        elif token == ',':
+            # Only the distance of NEAR(a b, 10) has a comma
+            if near_depth and near_depth == depth:
+                output.append(token)
+        elif token == 'NEAR' and following == '(':
+            operand(token, group=True)
+        elif token in _OPERATORS:
+            if previous not in (None, '(', 'NEAR') + _OPERATORS and following not in (None, ')'):
+                output.append(token)
+            else:
+                operand('"%s"' % token)
+        else:
+            column, _, word = token.partition(':')
+            if word and column in SEARCH_COLUMNS:
+                term = _term(word)
+                if term is not None:
+                    operand(column + ':' + term)
+            else:
+                term = _term(token)
+                if term is not None:
+                    operand(term)
+    output += [')'] * depth
+    return " ".join(output).replace("NEAR (", "NEAR(").replace("( ", "(").replace(" )", ")").replace(" ,", ",")
+
+
+class SearchIndex:
+    """
+    FTS5 index of speeches, kept in sync with the content CSV files.
+
+    Each indexed file is recorded with its size and modification time; a
+    changed file has its speeches replaced, a removed file has them deleted.
+    A speech found in several runs (e.g. after a --full run) is indexed once.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                speeches INTEGER,
+                indexed_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS speeches (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                path TEXT NOT NULL,
+                commission TEXT,
+                run_date TEXT,
+                date TEXT,
+                datum TEXT,
+                titel TEXT,
+                spreker TEXT,
+                sprekertekst TEXT,
+                question_id TEXT,
+                speech_link TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_speeches_path ON speeches (path);
+            CREATE INDEX IF NOT EXISTS idx_speeches_commission_date ON speeches (commission, date);
+            CREATE INDEX IF NOT EXISTS idx_speeches_date ON speeches (date);
+            CREATE VIRTUAL TABLE IF NOT EXISTS speeches_fts USING fts5(
+                titel, spreker, sprekertekst,
+                content = 'speeches', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS speeches_ai AFTER INSERT ON speeches BEGIN
+                INSERT INTO speeches_fts (rowid, titel, spreker, sprekertekst)
+                VALUES (new.id, new.titel, new.spreker, new.sprekertekst);
+            END;
+            CREATE TRIGGER IF NOT EXISTS speeches_ad AFTER DELETE ON speeches BEGIN
+                INSERT INTO speeches_fts (speeches_fts, rowid, titel, spreker, sprekertekst)
+                VALUES ('delete', old.id, old.titel, old.spreker, old.sprekertekst);
+            END;
+        """)
+        self._db.commit()
+
+    # --- Indexing ------------------------------------------------------------
+
+    @staticmethod
+    def _fingerprint(csv_path):
+        stat = os.stat(csv_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def update(self, data_dir, full=False):
+        """
+        Index the content files under data_dir that are new or changed.
+
+        Args:
+            data_dir: Base directory containing all commission data
+            full: Drop the index and index every file again
+
+        Returns:
+            dict: Number of files indexed, removed and skipped and speeches added
+        """
+        started = time.perf_counter()
+        if full:
+            with self._lock:
+                self._db.execute("DELETE FROM speeches")
+                self._db.execute("DELETE FROM files")
+                self._db.commit()
+        paths = {os.path.abspath(path)
+                 for path in glob.glob(os.path.join(data_dir, '**', '*_content.csv'), recursive=True)}
+        with self._lock:
+            indexed = {path: (size, mtime_ns) for path, size, mtime_ns
+                       in self._db.execute("SELECT path, size, mtime_ns FROM files")}
+        removed = [path for path in indexed if path not in paths]
+        if removed:
+            # Speeches of a removed file may also be in other files, which then
+            # have to be read again to index them
+            with self._lock:
+                self._db.executemany("DELETE FROM speeches WHERE path = ?", [(path,) for path in removed])
+                self._db.execute("DELETE FROM files")
+                self._db.commit()
+            indexed = {}
+
+        result = {"files": 0, "removed": len(removed), "unchanged": 0, "speeches": 0}
+        for path in sorted(paths):
+            try:
+                fingerprint = self._fingerprint(path)
+            except OSError:
+                continue
+            if indexed.get(path) == fingerprint:
+                result["unchanged"] += 1
+                continue
+            result["speeches"] += self._index_file(path, data_dir, fingerprint)
+            result["files"] += 1
+        if full and result["files"]:
+            # Merge the index into one segment; incremental updates rely on FTS5's automerge
+            with self._lock:
+                self._db.execute("INSERT INTO speeches_fts (speeches_fts) VALUES ('optimize')")
+                self._db.commit()
+        get_metrics().inc('rows_written', result["speeches"], sink='search_index')
+        logging.info("Search index updated in %.2fs: %d files indexed (%d speeches), %d unchanged, %d removed",
+                     time.perf_counter() - started, result["files"], result["speeches"], result["unchanged"],
+                     len(removed))
+        return result
+
+    def _index_file(self, path, data_dir, fingerprint):
+        """Replace the speeches of one content file; return the number of speeches added."""
+        # data/<commission>/<run date>/<commission>_content.csv
+        parts = os.path.relpath(path, data_dir).split(os.sep)
+        path_commission = parts[0] if len(parts) >= 3 else ''
+        run_date = parts[-2] if len(parts) >= 3 else ''
+        rows = []
+        store = get_blob_store()
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                text = row.get('sprekertekst') or ''
+                if is_ref(text):
+                    try:
+                        text = store.resolve(text)
+                    except KeyError as e:
+                        logging.warning("Not indexing a speech of %s: %s", path, e)
+                        continue
+                text = text.strip()
+                if not text:
+                    continue
+                spreker = row.get('spreker') or ''
+                link = row.get('speech_link') or row.get('link') or ''
+                key = hashlib.sha1("\x1f".join((link, spreker, text)).encode('utf-8')).hexdigest()
+                datum = row.get('datum') or ''
+                # Content files written before the speech_date column only have the Dutch date
+                speech_date = row.get('speech_date') or parse_dutch_date(datum)
+                rows.append((key, path, row.get('commission') or path_commission, run_date,
+                             speech_date or run_date, datum, row.get('titel') or '', spreker, text,
+                             row.get('question_id') or '', link))
+        with self._lock:
+            self._db.execute("DELETE FROM speeches WHERE path = ?", (path,))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO speeches (key, path, commission, run_date, date, datum, titel, spreker, "
+                "sprekertekst, question_id, speech_link) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self._db.execute("SELECT COUNT(*) FROM speeches WHERE path = ?", (path,)).fetchone()[0]
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                             (path, fingerprint[0], fingerprint[1], added,
+                              datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+        return added
+
+    # --- Queries -------------------------------------------------------------
+
+    def search(self, query, commission=None, speaker=None, since=None, until=None, order='rank', limit=20,
+               offset=0, raw=False):
+        """
+        Search the speeches.
+
+        Args:
+            query: Search query (see fts_query)
+            commission: Only speeches of this commission
+            speaker: Only speakers whose name contains this text (case-insensitive)
+            since: Only speeches on or after this date ('YYYY-MM-DD')
+            until: Only speeches on or before this date ('YYYY-MM-DD')
+            order: 'rank' (best match first) or 'date' (newest first)
+            limit: Maximum number of results
+            offset: Results to skip (for paging)
+            raw: Pass the query to FTS5 as it is
+
+        Returns:
+            list: dicts with commission, date, datum, spreker, titel, snippet, score, speech_link
+        """
+        if not raw:
+            query = fts_query(query)
+            if not query:
+                return []
+        conditions = ["speeches_fts MATCH ?"]
+        params = [query]
+        if commission:
+            conditions.append("s.commission = ?")
+            params.append(commission)
+        if speaker:
+            conditions.append("s.spreker LIKE ?")
+            params.append('%' + speaker + '%')
+        if since:
+            conditions.append("s.date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("s.date <= ?")
+            params.append(until)
+        order_by = "s.date DESC, score" if order == 'date' else "score"
+        # CROSS JOIN: always look up the matches in the FTS index first, never
+        # test every speech of a commission or period against the query
+        ranked = (
+            "SELECT s.id, s.commission, s.date, s.datum, s.spreker, s.titel, "
+            "bm25(speeches_fts, %s) AS score, s.speech_link "
+            "FROM speeches_fts CROSS JOIN speeches s ON s.id = speeches_fts.rowid "
+            "WHERE %s ORDER BY %s LIMIT ? OFFSET ?"
+            % (", ".join(str(weight) for weight in RANK_WEIGHTS), " AND ".join(conditions), order_by))
+        params += [limit, offset]
+        with self._lock:
+            cursor = self._db.execute(ranked, params)
+            columns = [column[0] for column in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            # Snippets only for the page of results, not for every match
+            snippets = {}
+            if results:
+                snippets = dict(self._db.execute(
+                    "SELECT rowid, snippet(speeches_fts, 2, '[', ']', ' ... ', 16) FROM speeches_fts "
+                    "WHERE speeches_fts MATCH ? AND rowid IN (%s)" % ", ".join("?" * len(results)),
+                    [query] + [result["id"] for result in results]).fetchall())
+        for result in results:
+            result["snippet"] = snippets.get(result.pop("id"), "")
+        return results
+
+    def stats(self):
+        with self._lock:
+            speeches, commissions, first, last = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT commission), MIN(NULLIF(date, '')), MAX(date) FROM speeches"
+            ).fetchone()
+            files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {"files": files, "speeches": speeches, "commissions": commissions, "first_date": first,
+                "last_date": last}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_search_index():
+    """Open the search index at SEARCH_DB."""
+    return SearchIndex(config.SEARCH_DB)
+
+
+def update_search_index(data_dir=None, full=False):
+    """Bring the search index up to date with the content files under data_dir (default: DATA_DIR)."""
+    index = open_search_index()
+    try:
+        return index.update(data_dir or config.DATA_DIR, full=full)
+    finally:
+        index.close()
+
+
+def _print_results(results, elapsed):
+    for number, result in enumerate(results, 1):
+        print("%3d. %s  %-10s  %s" % (number, result["date"] or "?", result["commission"], result["spreker"]))
+        print("     %s" % result["titel"])
+        print("     %s" % " ".join(result["snippet"].split()))
+    print("%d results in %.1f ms" % (len(results), elapsed * 1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help="search the speeches")
+    query.add_argument('query', help="search query (FTS5 syntax)")
+    query.add_argument('--raw', action='store_true', help="pass the query to FTS5 as it is")
+    query.add_argument('--commission', help="only speeches of this commission")
+    query.add_argument('--speaker', help="only speakers whose name contains this text")
+    query.add_argument('--since', help="only speeches on or after this date (YYYY-MM-DD)")
+    query.add_argument('--until', help="only speeches on or before this date (YYYY-MM-DD)")
+    query.add_argument('--order', choices=('rank', 'date'), default='rank',
+                       help="best match first or newest first (default: %(default)s)")
+    query.add_argument('--limit', type=int, default=20, help="maximum number of results (default: %(default)s)")
+    query.add_argument('--offset', type=int, default=0, help="results to skip (default: %(default)s)")
+    query.add_argument('--json', action='store_true', help="print the results as JSON lines")
+    commands.add_parser('update', help="index new and changed content files")
+    commands.add_parser('rebuild', help="index all content files from scratch")
+    commands.add_parser('stats', help="show what the index holds")
+    args = parser.parse_args(argv)
+
+    index = open_search_index()
+    try:
+        if args.command == 'query':
+            started = time.perf_counter()
+            try:
+                results = index.search(args.query, args.commission, args.speaker, args.since, args.until,
+                                       args.order, args.limit, args.offset, raw=args.raw)
+            except sqlite3.OperationalError as e:
+                print("Invalid query %r: %s" % (args.query, e), file=sys.stderr)
+                return 2
+            elapsed = time.perf_counter() - started
+            if args.json:
+                for result in results:
+                    print(json.dumps(result, ensure_ascii=False))
+            else:
+                _print_results(results, elapsed)
+        elif args.command in ('update', 'rebuild'):
+            print(json.dumps(index.update(config.DATA_DIR, full=args.command == 'rebuild')))
+        else:
+            print(json.dumps(index.stats(), indent=2))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main())
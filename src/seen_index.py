@@ -0,0 +1,262 @@
+# seen_index.py
+import glob
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+import config
+
+
+def link_key(link):
+    """Normalize a relative or absolute page link to its path, e.g. '/nl/...'."""
+    if not isinstance(link, str) or not link:
+        return ""
+    return '/' + urlsplit(link).path.lstrip('/')
+
+
+def meeting_fingerprint(row):
+    """Fingerprint of the listing fields of a meeting, used to detect changes."""
+    values = []
+    for field in ("date", "title", "description"):
+        value = row.get(field, "")
+        values.append("" if pd.isna(value) else str(value))
+    return hashlib.sha1("\x1f".join(values).encode('utf-8')).hexdigest()
+
+
+def _as_id(value):
+    """Normalize an ID read from CSV (e.g. 1873396.0) to a string."""
+    if pd.isna(value) or value == "":
+        return ""
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class SeenIndex:
+    """
+    Persistent index of meetings, agenda items and speech pages that earlier
+    runs already captured completely.
+
+    Completeness is tracked bottom-up:
+    - a speech link is complete once speeches were extracted from it;
+    - an agenda item is complete once its question page gave a verslag link
+      and that link is complete;
+    - a meeting is complete when its listing fields are unchanged and all
+      of its agenda items are complete.
+    Incomplete items (e.g. a verslag that was not published yet) are
+    fetched again by the next run. With `full=True` nothing is skipped, but
+    the index is still updated.
+    """
+    def __init__(self, db_path, full=False):
+        self.full = full
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meetings (
+                meeting_id TEXT PRIMARY KEY,
+                commission TEXT,
+                fingerprint TEXT,
+                run_date TEXT
+            );
+            CREATE TABLE IF NOT EXISTS agenda_items (
+                item_id TEXT PRIMARY KEY,
+                meeting_id TEXT,
+                commission TEXT,
+                link_key TEXT,
+                inferred INTEGER NOT NULL DEFAULT 0,
+                run_date TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_agenda_items_meeting ON agenda_items (meeting_id);
+            CREATE TABLE IF NOT EXISTS speech_links (
+                link_key TEXT PRIMARY KEY,
+                commission TEXT,
+                run_date TEXT
+            );
+            CREATE TABLE IF NOT EXISTS scanned_runs (
+                run_dir TEXT PRIMARY KEY,
+                scanned_at TEXT
+            );
+        """)
+        self._db.commit()
+
+    # --- Queries -----------------------------------------------------------
+
+    def _complete_items_sql(self):
+        return ("SELECT a.item_id FROM agenda_items a WHERE a.inferred = 1 OR EXISTS "
+                "(SELECT 1 FROM speech_links s WHERE s.link_key = a.link_key AND a.link_key != '')")
+
+    def is_meeting_complete(self, meeting_id, fingerprint=None):
+        with self._lock:
+            row = self._db.execute("SELECT fingerprint FROM meetings WHERE meeting_id = ?",
+                                   (meeting_id,)).fetchone()
+            if row is None or (fingerprint and row[0] and row[0] != fingerprint):
+                return False
+            counts = self._db.execute(
+                "SELECT COUNT(*), SUM(item_id IN (%s)) FROM agenda_items WHERE meeting_id = ?"
+                % self._complete_items_sql(), (meeting_id,)).fetchone()
+        total, complete = counts[0], counts[1] or 0
+        return total > 0 and total == complete
+
+    def new_meetings(self, meetings):
+        """
+        Filter (meeting_id, fingerprint) pairs down to the meetings that still need scraping.
+
+        Returns:
+            list of meeting IDs
+        """
+        if self.full:
+            return [meeting_id for meeting_id, _ in meetings]
+        return [meeting_id for meeting_id, fingerprint in meetings
+                if not self.is_meeting_complete(meeting_id, fingerprint)]
+
+    def new_agenda_items(self, item_ids):
+        """Filter agenda item IDs down to the ones whose question/speeches are not captured yet."""
+        if self.full:
+            return list(item_ids)
+        with self._lock:
+            complete = {row[0] for row in self._db.execute(self._complete_items_sql())}
+        return [item_id for item_id in item_ids if item_id not in complete]
+
+    def new_speech_links(self, links):
+        """Filter question links down to the verslag pages whose speeches are not captured yet."""
+        if self.full:
+            return list(links)
+        with self._lock:
+            complete = {row[0] for row in self._db.execute("SELECT link_key FROM speech_links")}
+        return [link for link in links if link_key(link) not in complete]
+
+    # --- Updates -----------------------------------------------------------
+
+    def record_meeting(self, meeting_id, fingerprint, commission="", run_date=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO meetings (meeting_id, commission, fingerprint, run_date) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(meeting_id) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "run_date = excluded.run_date",
+                (meeting_id, commission, fingerprint, run_date or config.get_run_date()))
+            self._db.commit()
+
+    def record_agenda_items(self, meeting_id, item_ids, commission="", run_date=None):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO agenda_items (item_id, meeting_id, commission, run_date) "
+                "VALUES (?, ?, ?, ?)",
+                [(item_id, meeting_id, commission, run_date or config.get_run_date())
+                 for item_id in item_ids if item_id])
+            self._db.commit()
+
+    def record_question(self, item_id, link):
+        """Store the verslag link found on the question page of an agenda item."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO agenda_items (item_id, link_key, run_date) VALUES (?, ?, ?) "
+                "ON CONFLICT(item_id) DO UPDATE SET link_key = excluded.link_key",
+                (item_id, link_key(link), config.get_run_date()))
+            self._db.commit()
+
+    def record_speech_link(self, link, commission="", run_date=None):
+        """Mark a verslag page as complete after its speeches were extracted."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO speech_links (link_key, commission, run_date) VALUES (?, ?, ?)",
+                (link_key(link), commission, run_date or config.get_run_date()))
+            self._db.commit()
+
+    # --- Rebuilding from earlier runs ----------------------------------------
+
+    def refresh_from_runs(self, data_dir, exclude_run_date=None):
+        """
+        Add the results of run directories that were not indexed yet.
+
+        Args:
+            data_dir: Base directory containing all commission data
+            exclude_run_date: Run date to skip (the run in progress)
+
+        Returns:
+            int: Number of run directories scanned
+        """
+        with self._lock:
+            scanned = {row[0] for row in self._db.execute("SELECT run_dir FROM scanned_runs")}
+        scanned_count = 0
+        for meetings_csv in sorted(glob.glob(os.path.join(data_dir, '*', '*', '*_meetings.csv'))):
+            run_dir = os.path.dirname(meetings_csv)
+            run_date = os.path.basename(run_dir)
+            rel_dir = os.path.relpath(run_dir, data_dir)
+            if rel_dir in scanned or run_date == exclude_run_date:
+                continue
+            commission = os.path.basename(os.path.dirname(run_dir))
+            content_csv = meetings_csv.replace('_meetings.csv', '_content.csv')
+            try:
+                self._index_run(meetings_csv, content_csv, commission, run_date)
+            except Exception as e:
+                logging.error("Error indexing run directory %s: %s", run_dir, e)
+                continue
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO scanned_runs VALUES (?, ?)",
+                                 (rel_dir, datetime.now().isoformat(timespec='seconds')))
+                self._db.commit()
+            scanned_count += 1
+        if scanned_count:
+            logging.info("Indexed %d earlier run directories", scanned_count)
+        return scanned_count
+
+    def _index_run(self, meetings_csv, content_csv, commission, run_date):
+        speech_links = set()
+        if os.path.exists(content_csv):
+            content_df = pd.read_csv(content_csv)
+            if 'speech_link' in content_df.columns:
+                speech_links = {link_key(link) for link in content_df['speech_link'].dropna()}
+        for link in speech_links:
+            self.record_speech_link(link, commission, run_date)
+
+        meetings_df = pd.read_csv(meetings_csv)
+        if 'data_type' in meetings_df.columns and 'meeting_ID' in meetings_df.columns:
+            is_agenda = meetings_df['data_type'] == 'agenda_item'
+        else:
+            is_agenda = pd.Series(False, index=meetings_df.index)
+        agenda_df = meetings_df[is_agenda]
+        if agenda_df.empty:
+            return
+        for _, row in meetings_df[~is_agenda].iterrows():
+            meeting_id = _as_id(row.get('ID'))
+            if not meeting_id:
+                continue
+            item_ids = [_as_id(value) for value in agenda_df.loc[
+                agenda_df['meeting_ID'].map(_as_id) == meeting_id, 'ID']]
+            if not item_ids:
+                continue
+            self.record_meeting(meeting_id, meeting_fingerprint(row), commission, run_date)
+            self.record_agenda_items(meeting_id, item_ids, commission, run_date)
+            # Question rows are removed by the cleaning step, so the verslag link
+            # of each agenda item is unknown here. Treat the items as complete when
+            # speeches of this meeting's verslag were captured in the same run.
+            prefix = '/nl/parlementair-werk/commissies/commissievergaderingen/%s/verslag/' % meeting_id
+            if any(link.startswith(prefix) for link in speech_links):
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE agenda_items SET inferred = 1 WHERE meeting_id = ? AND link_key IS NULL",
+                        (meeting_id,))
+                    self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "meetings": self._db.execute("SELECT COUNT(*) FROM meetings").fetchone()[0],
+                "agenda_items": self._db.execute("SELECT COUNT(*) FROM agenda_items").fetchone()[0],
+                "speech_links": self._db.execute("SELECT COUNT(*) FROM speech_links").fetchone()[0],
+            }
+
+
+def open_seen_index(full=False):
+    """Open the seen index under STATE_DIR and index any new run directories."""
+    index = SeenIndex(os.path.join(config.STATE_DIR, 'seen_index.sqlite'), full=full)
+    index.refresh_from_runs(config.DATA_DIR, exclude_run_date=config.RUN_DATE)
+    return index
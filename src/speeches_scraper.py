@@ -3,166 +3,199 @@ import os
 import csv
 import logging
 import pandas as pd
-from bs4 import BeautifulSoup
-from utils import safe_get_text, write_csv, append_to_csv
-from request_helper import make_request
+from parse_memo import extract_page
+from extraction_specs import VERSLAG_SPEC
+from utils import BufferedCsvWriter, read_header
+from fetch_engine import iter_fetch
+from metrics import timed_stage
+from checkpoint import split_completed
+from clean_content import filter_rows
+from records import Speech, read_csv
+
+INPUT_COLUMNS = ('content_type', 'link', 'ID')
+SPEECH_FIELDNAMES = ["titel", "spreker", "sprekertekst", "datum", "question_id", "content_type", "speech_link",
+                     "commission", "speech_date"]
+
+
+def question_links(df):
+    """
+    Map the verslag link of every question row in a content DataFrame to its question ID.
+    
+    Works on whole columns instead of row by row, so it scales to content
+    files with hundreds of thousands of rows.
+    
+    Args:
+        df: Content DataFrame with 'content_type', 'link' and (optionally) 'ID' columns
+    
+    Returns:
+        dict: link -> question ID ('' when the ID column is missing), in order
+        of first appearance; the first question wins for duplicate links
+    """
+    if 'content_type' not in df.columns or 'link' not in df.columns:
+        return {}
+    questions = df[df['content_type'] == 'question']
+    links = questions['link']
+    if not (pd.api.types.is_object_dtype(links) or pd.api.types.is_string_dtype(links)):
+        return {}  # e.g. an all-NaN column
+    # Only non-empty string links; other values give NaN from .str
+    questions = questions[links.str.len().gt(0)].drop_duplicates('link')
+    ids = questions['ID'] if 'ID' in questions.columns else [''] * len(questions)
+    return dict(zip(questions['link'], ids))
+
 
 class SpeechesScraper:
-    def __init__(self, input_csv, output_csv, base_url_prefix):
+    def __init__(self, input_csv, output_csv, base_url_prefix, seen_index=None, commission_name="",
+                 storage=None, journal=None):
         self.input_csv = input_csv
         self.output_csv = output_csv
         self.base_url_prefix = base_url_prefix
-        self.output_data = []
+        self.seen_index = seen_index
+        self.commission_name = commission_name
+        # With a storage backend questions are read from and speeches are
+        # upserted into it instead of the content CSV
+        self.storage = storage
+        # Verslag pages completed by an interrupted run are taken from the journal
+        self.journal = journal
+    
+    def extract_speeches(self, full_url, content, question_id):
+        """Extract the speech rows from the HTML of a verslag page."""
+        page = extract_page(VERSLAG_SPEC, content)
+        titel, datum = page.fields["titel"], page.fields["datum"]
+        if not titel:
+            logging.warning("No titel found on %s", full_url)
+        if not datum:
+            logging.warning("No datum found on %s", full_url)
+        if page.items is None:
+            logging.warning("No meeting speeches container found on %s; skipping speeches.", full_url)
+            return []
+        if not page.items:
+            logging.info("No meeting speeches found on %s.", full_url)
+            return []
+        return [Speech(titel=titel, spreker=speech["spreker"], sprekertekst=speech["sprekertekst"], datum=datum,
+                       question_id=question_id, speech_link=full_url, commission=self.commission_name)
+                for speech in page.items]
+    
+    def full_url(self, link):
+        """Return the absolute URL of a verslag link."""
+        return self.base_url_prefix + link if not link.startswith('http') else link
     
+    @timed_stage('speeches', rows=lambda count: count)
     def scrape(self):
-        if not os.path.exists(self.input_csv):
+        """
+        Scrape the speeches of the verslag pages of the questions.
+        
+        Returns:
+            int: Number of speeches scraped or taken from the journal
+        """
+        if self.storage is None and not os.path.exists(self.input_csv):
             logging.error("Input CSV file not found: %s", self.input_csv)
-            return []
+            return 0
         
-        # Read the content CSV to get question links
+        # Read the content CSV (or storage) to get question links
         try:
-            df = pd.read_csv(self.input_csv)
-            # Filter for question content types that have links
+            if self.storage is not None:
+                df = pd.DataFrame(self.storage.question_links(self.commission_name), columns=['link', 'ID'])
+                df['content_type'] = 'question'
+            else:
+                # Only the columns needed to map links to questions
+                df = read_csv(self.input_csv, usecols=lambda column: column in INPUT_COLUMNS,
+                                 low_memory=False)
+            # Map each question's verslag link to its question ID
             if 'content_type' in df.columns and 'question' in df['content_type'].values:
-                questions_df = df[df['content_type'] == 'question']
-                # Get unique links to process
-                links_to_process = []
-                for _, row in questions_df.iterrows():
-                    if 'link' in row and row['link'] and isinstance(row['link'], str):
-                        links_to_process.append(row['link'])
-                links_to_process = list(set(links_to_process))  # Remove duplicates
+                question_ids = question_links(df)
             else:
-                links_to_process = []
+                question_ids = {}
                 logging.warning("No question data found in content CSV")
+            links_to_process = list(question_ids)
         except Exception as e:
             logging.error("Error reading input CSV %s: %s", self.input_csv, e)
-            return []
+            return 0
         
         if not links_to_process:
             logging.warning("No links found to process in %s", self.input_csv)
-            return []
+            return 0
         
-        # Scrape speeches for each question link
-        for link in links_to_process:
-            full_url = self.base_url_prefix + link if not link.startswith('http') else link
-            logging.info("Scraping speeches from page: %s", full_url)
-            
-            # Use the request helper to make the request with a delay
-            response = make_request(full_url)
-            if not response:
-                continue  # Skip this link if request failed
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            # Extract title from header
-            titel = ""
-            header = soup.find("header", class_="card__header")
-            if header:
-                p_title = header.find("p", class_="card__title")
-                if p_title:
-                    hidden_span = p_title.find("span", class_="visually-hidden")
-                    if hidden_span:
-                        hidden_span.decompose()
-                    titel = safe_get_text(p_title)
-            if not titel:
-                logging.warning("No titel found on %s", full_url)
-            
-            datum = ""
-            datum_elem = soup.find("date", class_="meeting-header__date-full")
-            if datum_elem:
-                datum = safe_get_text(datum_elem)
-            if not datum:
-                logging.warning("No datum found on %s", full_url)
-            
-            # Find question ID to link speeches back to the question
-            question_id = ""
-            for _, row in questions_df.iterrows():
-                if row.get('link') == link:
-                    question_id = row.get('ID', '')
-                    break
-            
-            speeches_container = soup.find("div", class_="meeting-speeches__list")
-            if not speeches_container:
-                logging.warning("No meeting speeches container found on %s; skipping speeches.", full_url)
-                continue
-            speeches = speeches_container.find_all("div", class_=lambda x: x and "meeting-speech" in x)
-            if not speeches:
-                logging.info("No meeting speeches found on %s.", full_url)
-                continue
-            
-            for speech in speeches:
-                spreker = ""
-                title_div = speech.find("div", class_="meeting-speech__title")
-                if title_div:
-                    a_elem = title_div.find("a")
-                    spreker = safe_get_text(a_elem) if a_elem else safe_get_text(title_div)
-                sprekertekst = ""
-                value_div = speech.find("div", class_="meeting-speech__value")
-                if value_div:
-                    sprekertekst = value_div.get_text(" ", strip=True)
-                self.output_data.append({
-                    "titel": titel,
-                    "spreker": spreker,
-                    "sprekertekst": sprekertekst,
-                    "datum": datum,
-                    "question_id": question_id,
-                    "content_type": "speech",
-                    "speech_link": full_url
-                })
+        # Verslag pages this run already completed before it was interrupted
+        all_links = links_to_process
+        journaled, links_to_process = split_completed(self.journal, 'speeches', all_links, self.full_url)
         
-        if self.output_data:
-            # Check if the output file already exists
-            file_exists = os.path.exists(self.output_csv)
-            
-            if file_exists:
-                try:
-                    # Read existing headers to match columns
-                    existing_df = pd.read_csv(self.output_csv)
-                    
-                    # Ensure all necessary columns exist in the DataFrame
-                    required_columns = ["titel", "spreker", "sprekertekst", "datum", 
-                                       "question_id", "content_type", "speech_link", "commission"]
-                    
-                    # Get the existing columns
-                    existing_columns = existing_df.columns.tolist()
-                    
-                    # Check if we need to add any columns
-                    for col in required_columns:
-                        if col not in existing_columns:
-                            existing_df[col] = ""  # Add empty column
-                    
-                    # Save the updated DataFrame with all necessary columns
-                    existing_df.to_csv(self.output_csv, index=False)
-                    
-                    # Now update fieldnames to match the file
-                    fieldnames = existing_df.columns.tolist()
-                    mode = 'a'
-                    write_header = False
-                except Exception as e:
-                    logging.error("Error updating CSV structure: %s", e)
-                    # If we can't modify the existing file, create a new one with all needed columns
-                    fieldnames = ["titel", "spreker", "sprekertekst", "datum", 
-                                 "question_id", "content_type", "speech_link", "commission"]
-                    mode = 'w'
-                    write_header = True
-            else:
-                # If file doesn't exist, create it
-                mode = 'w'
-                fieldnames = ["titel", "spreker", "sprekertekst", "datum", 
-                             "question_id", "content_type", "speech_link", "commission"]
-                write_header = True
-            
-            # Write to CSV
-            with open(self.output_csv, mode, newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                if write_header:
-                    writer.writeheader()
-                writer.writerows(self.output_data)
-            
-            logging.info("Saved %d speeches to %s", len(self.output_data), self.output_csv)
+        # Skip verslag pages whose speeches were already captured
+        if self.seen_index is not None:
+            new_links = self.seen_index.new_speech_links(links_to_process)
+            logging.info("Skipping %d already scraped speech pages", len(links_to_process) - len(new_links))
+            links_to_process = new_links
+        
+        pages = self._iter_pages(all_links, journaled, links_to_process, question_ids)
+        if self.storage is not None:
+            count = sum(len(speeches) for speeches in pages)
+            logging.info("Stored %d speeches", count)
+            return count
+        
+        # Speeches are appended as their pages come in, one buffer at a time;
+        # rows the cleaning step would remove are not written at all
+        count = 0
+        writer = self._open_writer()
+        with writer:
+            for speeches in pages:
+                count += len(speeches)
+                writer.write(filter_rows(speeches))
+        if count:
+            logging.info("Saved %d speeches to %s (%d filtered out)", writer.rows_written, self.output_csv,
+                         count - writer.rows_written)
         else:
             logging.info("No speeches data scraped.")
+        return count
+    
+    def _open_writer(self):
+        """Return a writer that appends to the content CSV, after adding the speech columns it lacks."""
+        fieldnames = read_header(self.output_csv)
+        if not fieldnames:
+            return BufferedCsvWriter(self.output_csv, SPEECH_FIELDNAMES, append=True)
+        missing = [column for column in SPEECH_FIELDNAMES if column not in fieldnames]
+        if missing:
+            try:
+                # Rewrite the file with the new (empty) columns, row by row
+                fieldnames = fieldnames + missing
+                with open(self.output_csv, newline='', encoding='utf-8') as f, \
+                        BufferedCsvWriter(self.output_csv, fieldnames) as rewriter:
+                    for row in csv.DictReader(f):
+                        rewriter.write([row])
+            except Exception as e:
+                logging.error("Error updating CSV structure: %s", e)
+                # If we can't modify the existing file, create a new one with all needed columns
+                return BufferedCsvWriter(self.output_csv, SPEECH_FIELDNAMES)
+        return BufferedCsvWriter(self.output_csv, fieldnames, append=True)
+    
+    def _iter_pages(self, all_links, journaled, fetch_links, question_ids):
+        """
+        Yield the speeches of each verslag page in question order, whether
+        they come from the journal or the site.
         
-        return self.output_data
+        The pages are fetched as they are needed; the fetch engine keeps
+        several requests in flight within the per-host rate limit.
+        """
+        fetched_links = set(fetch_links)
+        responses = iter_fetch([self.full_url(link) for link in fetch_links])
+        for link in all_links:
+            if link in journaled:
+                yield journaled[link]
+                continue
+            if link not in fetched_links:
+                continue
+            full_url, response = next(responses)
+            logging.info("Scraping speeches from page: %s", full_url)
+            if not response:
+                continue  # Skip this link if request failed
+            
+            # Link the speeches back to the question
+            speeches = self.extract_speeches(full_url, response.content, question_ids[link])
+            if self.storage is not None:
+                self.storage.upsert_speeches(self.commission_name, speeches)
+            if self.seen_index is not None and speeches:
+                self.seen_index.record_speech_link(full_url, self.commission_name)
+            if self.journal is not None:
+                self.journal.record('speeches', full_url, speeches)
+            yield speeches
 
 if __name__ == '__main__':
     import config
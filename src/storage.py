@@ -0,0 +1,324 @@
+# storage.py
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+
+import config
+from metrics import get_metrics
+from utils import BufferedCsvWriter, parse_dutch_date
+from clean_content import filter_rows, get_ledger
+from records import AgendaItem, Meeting, Question, Speech, to_text
+
+MEETING_FIELDNAMES = ['date', 'title', 'description', 'view_link', 'watch_link', 'ID', 'commission', 'meeting_date']
+AGENDA_FIELDNAMES = ['meeting_ID', 'card__tag', 'card__title', 'card__document_number',
+                     'card__author', 'verslag_link', 'ID']
+# Columns of the meetings CSV once the agenda items follow the meeting rows
+COMBINED_FIELDNAMES = (MEETING_FIELDNAMES
+                       + [column for column in AGENDA_FIELDNAMES if column not in MEETING_FIELDNAMES]
+                       + ['data_type'])
+CONTENT_FIELDNAMES = ["titel", "link", "ID", "original_ID", "content_type", "commission",
+                      "spreker", "sprekertekst", "datum", "question_id", "speech_link", "speech_date"]
+
+
+class SqliteStorage:
+    """
+    SQLite storage for meetings, agenda items, questions and speeches.
+
+    Rows are stored per commission and run date, so every run directory can
+    still be exported as the usual meetings and content CSVs. Writes are
+    idempotent upserts on the natural keys of each table, so a write costs
+    O(new rows) instead of a read and rewrite of the whole CSV file, and
+    rerunning a stage does not duplicate rows.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS meetings (
+                run_date TEXT NOT NULL,
+                commission TEXT NOT NULL,
+                meeting_id TEXT NOT NULL,
+                date TEXT,
+                title TEXT,
+                description TEXT,
+                view_link TEXT,
+                watch_link TEXT,
+                meeting_date TEXT,
+                PRIMARY KEY (run_date, commission, meeting_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_meetings_meeting_id ON meetings (meeting_id);
+            CREATE TABLE IF NOT EXISTS agenda_items (
+                run_date TEXT NOT NULL,
+                commission TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                meeting_id TEXT NOT NULL,
+                card_tag TEXT,
+                card_title TEXT,
+                card_document_number TEXT,
+                card_author TEXT,
+                verslag_link TEXT,
+                PRIMARY KEY (run_date, commission, meeting_id, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_agenda_items_meeting_id ON agenda_items (meeting_id);
+            CREATE INDEX IF NOT EXISTS idx_agenda_items_commission ON agenda_items (commission, run_date);
+            CREATE TABLE IF NOT EXISTS questions (
+                run_date TEXT NOT NULL,
+                commission TEXT NOT NULL,
+                original_id TEXT NOT NULL,
+                question_id TEXT,
+                titel TEXT,
+                link TEXT,
+                PRIMARY KEY (run_date, commission, original_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_questions_question_id ON questions (question_id);
+            CREATE INDEX IF NOT EXISTS idx_questions_commission ON questions (commission, run_date);
+            CREATE TABLE IF NOT EXISTS speeches (
+                run_date TEXT NOT NULL,
+                commission TEXT NOT NULL,
+                speech_link TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                question_id TEXT,
+                titel TEXT,
+                spreker TEXT,
+                sprekertekst TEXT,
+                datum TEXT,
+                speech_date TEXT,
+                PRIMARY KEY (run_date, commission, speech_link, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_speeches_question_id ON speeches (question_id);
+        """)
+        self._add_date_columns()
+        # Date ranges and ordering need the ISO dates; the Dutch date texts do not sort
+        self._db.executescript("""
+            DROP INDEX IF EXISTS idx_meetings_commission_date;
+            DROP INDEX IF EXISTS idx_speeches_commission_date;
+            CREATE INDEX IF NOT EXISTS idx_meetings_commission_meeting_date ON meetings (commission, meeting_date);
+            CREATE INDEX IF NOT EXISTS idx_speeches_commission_speech_date ON speeches (commission, speech_date);
+        """)
+        self._db.commit()
+
+    def _add_date_columns(self):
+        """Add the ISO date columns to a database from before them, filled from the Dutch dates."""
+        for table, column, source in (('meetings', 'meeting_date', 'date'), ('speeches', 'speech_date', 'datum')):
+            if column in [row[1] for row in self._db.execute("PRAGMA table_info(%s)" % table)]:
+                continue
+            self._db.execute("ALTER TABLE %s ADD COLUMN %s TEXT" % (table, column))
+            rows = self._db.execute("SELECT rowid, %s FROM %s" % (source, table)).fetchall()
+            self._db.executemany("UPDATE %s SET %s = ? WHERE rowid = ?" % (table, column),
+                                 [(parse_dutch_date(text), rowid) for rowid, text in rows])
+            logging.info("Added %s to the %d rows of %s", column, len(rows), table)
+
+    def _upsert(self, sql, rows):
+        if not rows:
+            return 0
+        metrics = get_metrics()
+        with metrics.phase('write'), self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+        metrics.inc('rows_written', len(rows), sink='sqlite')
+        return len(rows)
+
+    # --- Writes --------------------------------------------------------------
+
+    def upsert_meetings(self, commission, meetings, run_date=None):
+        """Store the meetings found on a commission listing page."""
+        run_date = run_date or config.get_run_date()
+        return self._upsert(
+            "INSERT INTO meetings (run_date, commission, meeting_id, date, title, description, "
+            "view_link, watch_link, meeting_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_date, commission, meeting_id) DO UPDATE SET date = excluded.date, "
+            "title = excluded.title, description = excluded.description, "
+            "view_link = excluded.view_link, watch_link = excluded.watch_link, "
+            "meeting_date = excluded.meeting_date",
+            [(run_date, commission, to_text(row.get('ID')), to_text(row.get('date')), to_text(row.get('title')),
+              to_text(row.get('description')), to_text(row.get('view_link')), to_text(row.get('watch_link')),
+              to_text(row.get('meeting_date')))
+             for row in meetings if to_text(row.get('ID'))])
+
+    def upsert_agenda_items(self, commission, items, run_date=None):
+        """Store agenda items (rows as produced by AgendaScraper.extract_agenda_items)."""
+        run_date = run_date or config.get_run_date()
+        return self._upsert(
+            "INSERT INTO agenda_items (run_date, commission, item_id, meeting_id, card_tag, card_title, "
+            "card_document_number, card_author, verslag_link) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_date, commission, meeting_id, item_id) DO UPDATE SET "
+            "card_tag = excluded.card_tag, card_title = excluded.card_title, "
+            "card_document_number = excluded.card_document_number, "
+            "card_author = excluded.card_author, verslag_link = excluded.verslag_link",
+            [(run_date, commission, to_text(item.get('ID')), to_text(item.get('meeting_ID')),
+              to_text(item.get('card__tag')), to_text(item.get('card__title')),
+              to_text(item.get('card__document_number')), to_text(item.get('card__author')),
+              to_text(item.get('verslag_link')))
+             for item in items])
+
+    def upsert_questions(self, commission, questions, run_date=None):
+        """Store question rows (as produced by QuestionsScraper.extract_question)."""
+        run_date = run_date or config.get_run_date()
+        return self._upsert(
+            "INSERT INTO questions (run_date, commission, original_id, question_id, titel, link) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_date, commission, original_id) DO UPDATE SET "
+            "question_id = excluded.question_id, titel = excluded.titel, link = excluded.link",
+            [(run_date, commission, to_text(question.get('original_ID')), to_text(question.get('ID')),
+              to_text(question.get('titel')), to_text(question.get('link')))
+             for question in questions])
+
+    def upsert_speeches(self, commission, speeches, run_date=None):
+        """
+        Store the speech rows of one or more verslag pages.
+
+        Speeches are keyed by their page and their position on it, so the
+        rows of a page must be passed in page order.
+        """
+        run_date = run_date or config.get_run_date()
+        positions = {}
+        rows = []
+        for speech in speeches:
+            link = to_text(speech.get('speech_link'))
+            position = positions.get(link, 0)
+            positions[link] = position + 1
+            rows.append((run_date, commission, link, position, to_text(speech.get('question_id')),
+                         to_text(speech.get('titel')), to_text(speech.get('spreker')),
+                         to_text(speech.get('sprekertekst')), to_text(speech.get('datum')),
+                         to_text(speech.get('speech_date'))))
+        return self._upsert(
+            "INSERT INTO speeches (run_date, commission, speech_link, position, question_id, titel, "
+            "spreker, sprekertekst, datum, speech_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_date, commission, speech_link, position) DO UPDATE SET "
+            "question_id = excluded.question_id, titel = excluded.titel, spreker = excluded.spreker, "
+            "sprekertekst = excluded.sprekertekst, datum = excluded.datum, speech_date = excluded.speech_date",
+            rows)
+
+    # --- Reads ---------------------------------------------------------------
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def meetings(self, commission, run_date=None):
+        """Return the meetings of a run as Meeting records."""
+        rows = self._query(
+            "SELECT date, title, description, view_link, watch_link, meeting_id, commission, meeting_date "
+            "FROM meetings WHERE run_date = ? AND commission = ? ORDER BY rowid",
+            (run_date or config.get_run_date(), commission))
+        return [Meeting.from_row(dict(zip(MEETING_FIELDNAMES, row))) for row in rows]
+
+    def agenda_items(self, commission, run_date=None):
+        """Return the agenda items of a run as AgendaItem records."""
+        rows = self._query(
+            "SELECT meeting_id, card_tag, card_title, card_document_number, card_author, "
+            "verslag_link, item_id FROM agenda_items WHERE run_date = ? AND commission = ? ORDER BY rowid",
+            (run_date or config.get_run_date(), commission))
+        return [AgendaItem.from_row(dict(zip(AGENDA_FIELDNAMES, row))) for row in rows]
+
+    def question_links(self, commission, run_date=None):
+        """Return (link, question ID) pairs of the questions of a run that have a verslag link."""
+        return self._query(
+            "SELECT link, question_id FROM questions WHERE run_date = ? AND commission = ? "
+            "AND link != '' ORDER BY rowid",
+            (run_date or config.get_run_date(), commission))
+
+    def _iter_query(self, sql, params, batch_rows=None):
+        """
+        Yield the rows of a query in batches of batch_rows (default:
+        config.WRITE_BUFFER_ROWS), on a connection of its own, so a long read
+        neither holds all rows in memory nor blocks the writers.
+        """
+        db = sqlite3.connect(self.db_path)
+        try:
+            cursor = db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_rows or config.WRITE_BUFFER_ROWS)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            db.close()
+
+    def iter_content_rows(self, commission, run_date=None, batch_rows=None):
+        """Yield the questions and then the speeches of a run as batches of Question and Speech records."""
+        params = (run_date or config.get_run_date(), commission)
+        for rows in self._iter_query(
+                "SELECT titel, link, question_id, original_id, commission FROM questions "
+                "WHERE run_date = ? AND commission = ? ORDER BY rowid", params, batch_rows):
+            yield [Question(*row) for row in rows]
+        for rows in self._iter_query(
+                "SELECT titel, spreker, sprekertekst, datum, question_id, speech_link, commission, speech_date "
+                "FROM speeches WHERE run_date = ? AND commission = ? ORDER BY rowid", params, batch_rows):
+            yield [Speech(*row) for row in rows]
+
+    def content_rows(self, commission, run_date=None):
+        """Return the questions and speeches of a run as Question and Speech records."""
+        return [row for rows in self.iter_content_rows(commission, run_date) for row in rows]
+
+    # --- CSV export ----------------------------------------------------------
+
+    def export_csv(self, commission, meetings_csv, content_csv, run_date=None, questions_csv=None):
+        """
+        Write the meetings and content CSVs of a run in the format the CSV
+        workflow produces (content already cleaned), for existing consumers
+        of those files. With questions_csv the questions, which cleaning
+        removes from the content, are also written to that file.
+
+        Returns:
+            tuple: (number of meeting and agenda rows, number of content rows) written
+        """
+        meetings = self.meetings(commission, run_date)
+        agenda_items = self.agenda_items(commission, run_date)
+        with BufferedCsvWriter(meetings_csv, COMBINED_FIELDNAMES if agenda_items else MEETING_FIELDNAMES) as writer:
+            writer.write(meetings)
+            writer.write(agenda_items)
+        meeting_rows = writer.rows_written
+
+        # The content is read and written one buffer of rows at a time. The
+        # export is the final content file, so it is cleaned on the way out.
+        content_rows = 0
+        questions = BufferedCsvWriter(questions_csv, list(Question.COLUMNS)) if questions_csv else nullcontext()
+        with BufferedCsvWriter(content_csv, CONTENT_FIELDNAMES) as writer, questions:
+            for rows in self.iter_content_rows(commission, run_date):
+                content_rows += len(rows)
+                writer.write(filter_rows(rows))
+                if questions_csv and rows and isinstance(rows[0], Question):
+                    questions.write(rows)
+        if writer.rows_written:
+            get_ledger().mark_clean(content_csv)
+        logging.info("Exported %d meeting rows and %d content rows for %s",
+                     meeting_rows, content_rows, commission)
+        return meeting_rows, content_rows
+
+    def stats(self):
+        with self._lock:
+            return {table: self._db.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+                    for table in ("meetings", "agenda_items", "questions", "speeches")}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_storage():
+    """Open the configured storage backend, or return None for plain CSV files."""
+    if config.STORAGE_BACKEND == 'csv':
+        return None
+    if config.STORAGE_BACKEND != 'sqlite':
+        raise ValueError("Unknown storage backend: %s" % config.STORAGE_BACKEND)
+    return SqliteStorage(config.STORAGE_DB)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Export runs from the SQLite storage to CSV files")
+    parser.add_argument('commissions', nargs='*', help="commissions to export (default: all configured)")
+    parser.add_argument('--run-date', default=config.RUN_DATE, help="run date to export (default: %(default)s)")
+    args = parser.parse_args()
+    storage = SqliteStorage(config.STORAGE_DB)
+    config.RUN_DATE = args.run_date
+    for commission_name in args.commissions or list(config.COMMISSIONS):
+        storage.export_csv(commission_name, config.get_meetings_csv_path(commission_name),
+                           config.get_content_csv_path(commission_name), run_date=args.run_date,
+                           questions_csv=config.get_questions_csv_path(commission_name))
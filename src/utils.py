@@ -2,10 +2,15 @@
 import os
 import csv
 import logging
-import requests
-import time
-import random
+import re
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
 from bs4 import BeautifulSoup
+from request_helper import make_request
+from html_parser import parse_html
+from metrics import get_metrics
+import config
 
 # Configure logging.
 logging.basicConfig(
@@ -14,41 +19,151 @@ logging.basicConfig(
 )
 
 def safe_get_text(tag, default=""):
-    """Return the stripped text of a BeautifulSoup tag, or a default value."""
+    """Return the stripped text of a BeautifulSoup tag or html_parser.Node, or a default value."""
     return tag.get_text(strip=True) if tag else default
 
 def load_soup(url, session=None):
     """Fetch a URL and return a BeautifulSoup object, or None on error."""
-    # Add a random delay between requests to be respectful to the server
-    time.sleep(random.uniform(1, 3))
-    
-    sess = session or requests
-    logging.info("Fetching URL: %s", url)
+    # Wait for a slot in the per-host rate limit to be respectful to the server
+    response = make_request(url, session=session)
+    if response is None:
+        return None
+    with get_metrics().phase('parse'):
+        return BeautifulSoup(response.content, 'html.parser')
+
+def load_document(url, page_type=None, session=None):
+    """
+    Fetch a URL and parse it with the configured HTML parser backend.
     
-    # Add a proper user-agent header
-    headers = {
-        'User-Agent': 'Vlaams Parlement Scraper/1.0 (Educational/Research Use)',
-        'Accept': 'text/html,application/xhtml+xml,application/xml',
-        'Accept-Language': 'en-US,en;q=0.5'
-    }
+    Args:
+        url: The URL to fetch
+        page_type: Page type from html_parser.PAGE_SUBTREES to parse only the relevant subtrees
+        session: Optional requests session to use instead of the shared client
     
-    try:
-        response = sess.get(url, headers=headers)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error("Error fetching %s: %s", url, e)
+    Returns:
+        html_parser.Node for the document, or None on error
+    """
+    response = make_request(url, session=session)
+    if response is None:
         return None
-    return BeautifulSoup(response.content, 'html.parser')
+    return parse_html(response.content, page_type=page_type)
 
-def write_csv(output_path, data, fieldnames):
-    """Write data (a list of dictionaries) to a CSV file."""
+@contextmanager
+def atomic_output(output_path):
+    """
+    Yield a temporary path next to output_path that replaces it once the
+    block completes, so readers (and a rerun after a crash) never see a
+    half-written file.
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
+    tmp_path = output_path + '.tmp'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_csv(output_path, data, fieldnames):
+    """Write data (a list of dictionaries) to a CSV file, replacing it atomically."""
+    metrics = get_metrics()
+    with metrics.phase('write'), atomic_output(output_path) as tmp_path, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(data)
+    metrics.inc('rows_written', len(data), sink='csv')
     logging.info("Data successfully saved to: %s", output_path)
 
+def read_header(csv_path):
+    """Return the column names of a CSV file, or None if it does not exist or is empty."""
+    if not os.path.exists(csv_path):
+        return None
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        return next(csv.reader(csvfile), None)
+
+class BufferedCsvWriter:
+    """
+    CSV writer for rows that arrive page by page.
+
+    Rows are buffered and written WRITE_BUFFER_ROWS at a time, so a stage
+    holds at most one buffer of rows however many it produces. A new file
+    is written next to output_path and replaces it when the writer is
+    closed without an error; with append=True rows are appended to the
+    existing file (header included when it does not exist yet). Nothing is
+    written when no rows arrive.
+
+    Use as a context manager:
+
+        with BufferedCsvWriter(path, fieldnames) as writer:
+            for page in pages:
+                writer.write(rows_of(page))
+    """
+    def __init__(self, output_path, fieldnames, append=False, buffer_rows=None):
+        self.output_path = output_path
+        self.fieldnames = list(fieldnames)
+        self.append = append
+        self.buffer_rows = buffer_rows or config.WRITE_BUFFER_ROWS
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+        self._writer = None
+        self._tmp_path = output_path + '.tmp'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(discard=exc_type is not None and not self.append)
+        return False
+
+    def write(self, rows):
+        """Add rows (dicts or records); a full buffer is written out."""
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        write_header = True
+        if self.append:
+            write_header = not os.path.exists(self.output_path)
+            self._file = open(self.output_path, 'a', newline='', encoding='utf-8')
+        else:
+            self._file = open(self._tmp_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        if write_header:
+            self._writer.writeheader()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        metrics = get_metrics()
+        with metrics.phase('write'):
+            if self._file is None:
+                self._open()
+            self._writer.writerows(self._buffer)
+            self._file.flush()
+        metrics.inc('rows_written', len(self._buffer), sink='csv')
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self, discard=False):
+        """Write the buffered rows and move the new file into place (or drop it with discard=True)."""
+        if not discard:
+            self.flush()
+        self._buffer = []
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self.append:
+            return
+        if discard:
+            os.remove(self._tmp_path)
+        else:
+            os.replace(self._tmp_path, self.output_path)
+
 def append_to_csv(output_path, data, fieldnames=None):
     """Append data to an existing CSV file or create a new one."""
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -61,11 +176,13 @@ def append_to_csv(output_path, data, fieldnames=None):
             fieldnames = reader.fieldnames
     
     mode = 'a' if file_exists else 'w'
-    with open(output_path, mode, newline='', encoding='utf-8') as csvfile:
+    metrics = get_metrics()
+    with metrics.phase('write'), open(output_path, mode, newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         if not file_exists:
             writer.writeheader()
         writer.writerows(data)
+    metrics.inc('rows_written', len(data), sink='csv')
     
     logging.info("%s %d rows to %s", 
                 "Appended" if file_exists else "Wrote", 
@@ -73,6 +190,29 @@ def append_to_csv(output_path, data, fieldnames=None):
                 output_path)
     return True
 
+DUTCH_MONTHS = {
+    'januari': 1, 'februari': 2, 'maart': 3, 'april': 4, 'mei': 5, 'juni': 6,
+    'juli': 7, 'augustus': 8, 'september': 9, 'oktober': 10, 'november': 11, 'december': 12,
+}
+_DUTCH_DATE = re.compile(r'(\d{1,2})\s+([a-z]+)\s+(\d{4})')
+
+@lru_cache(maxsize=4096)
+def parse_dutch_day(text):
+    """Turn 'donderdag 27 februari 2025' or '20 februari 2025 9 uur - ...' into a date (None if it is not one)."""
+    match = _DUTCH_DATE.search((text or '').lower())
+    if not match or match.group(2) not in DUTCH_MONTHS:
+        return None
+    day, month, year = int(match.group(1)), DUTCH_MONTHS[match.group(2)], int(match.group(3))
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+def parse_dutch_date(text):
+    """Turn a date like 'donderdag 27 februari 2025' into '2025-02-27' ('' if it is not one)."""
+    day = parse_dutch_day(text)
+    return day.isoformat() if day else ''
+
 def get_commission_directory(base_dir, commission_name):
     """Get the directory for a specific commission, creating it if needed."""
     commission_dir = os.path.join(base_dir, commission_name)